@@ -0,0 +1,46 @@
+"""Add cheese search indexes
+
+Revision ID: 3b1f2a9c4d10
+Revises: ccf0e03ba7a5
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b1f2a9c4d10'
+down_revision: Union[str, None] = 'ccf0e03ba7a5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Выражение индекса должно совпадать с db.search.search_vector()
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_cheese_search_vector',
+        'cheese',
+        [sa.text(
+            "(setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B'))"
+        )],
+        postgresql_using='gin',
+        schema='public'
+    )
+    op.create_index(
+        'ix_cheese_name_trgm',
+        'cheese',
+        ['name'],
+        postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'},
+        schema='public'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cheese_name_trgm', table_name='cheese', schema='public')
+    op.drop_index('ix_cheese_search_vector', table_name='cheese', schema='public')
@@ -0,0 +1,26 @@
+"""Add cheese image key
+
+Revision ID: 5c7e1b9d3f42
+Revises: 8d4e6c2a7b31
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c7e1b9d3f42'
+down_revision: Union[str, None] = '8d4e6c2a7b31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('cheese', sa.Column('image_key', sa.String(length=64), nullable=True), schema='public')
+
+
+def downgrade() -> None:
+    op.drop_column('cheese', 'image_key', schema='public')
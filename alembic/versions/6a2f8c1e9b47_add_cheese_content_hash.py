@@ -0,0 +1,103 @@
+"""Add cheese content hash
+
+Revision ID: 6a2f8c1e9b47
+Revises: 5c7e1b9d3f42
+Create Date: 2026-10-18 15:00:00.000000
+
+Первая, расширяющая половина замены uq_cheese_name_description на ключ
+content_hash. Выполняется без длительных блокировок при работающем приложении:
+
+    alembic upgrade 6a2f8c1e9b47    колонка, триггер, заполнение и индекс
+    (выкладка кода, который пишет content_hash и делает upsert по нему)
+    alembic upgrade head            7b3d9e2f0c58: NOT NULL и удаление старого ограничения
+
+Пока работают процессы со старым кодом, content_hash заполняет триггер.
+Существующие строки заполняются пачками по первичному ключу, каждая пачка в
+своей транзакции. Уникальный индекс строится CONCURRENTLY.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a2f8c1e9b47'
+down_revision: Union[str, None] = '5c7e1b9d3f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def content_hash(prefix: str = '') -> str:
+    # Должно совпадать с db.models.cheese_content_hash
+    return (
+        "left(encode(sha256(convert_to("
+        "char_length({0}name)::text || ':' || {0}name || coalesce({0}description, ''), 'UTF8'"
+        ")), 'hex'), 32)"
+    ).format(prefix)
+
+
+def upgrade() -> None:
+    op.add_column('cheese', sa.Column('content_hash', sa.String(length=32), nullable=True), schema='public')
+    op.execute(
+        "CREATE OR REPLACE FUNCTION public.cheese_content_hash() RETURNS trigger AS $$ "
+        "BEGIN NEW.content_hash := {0}; RETURN NEW; END "
+        "$$ LANGUAGE plpgsql".format(content_hash('NEW.'))
+    )
+    op.execute(
+        'CREATE TRIGGER cheese_content_hash BEFORE INSERT OR UPDATE OF name, description '
+        'ON public.cheese FOR EACH ROW EXECUTE FUNCTION public.cheese_content_hash()'
+    )
+
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        after = None
+        while True:
+            # Граница пачки по первичному ключу: каждая пачка - поиск по индексу, а не просмотр таблицы
+            upper = connection.execute(
+                sa.text(
+                    'SELECT id FROM public.cheese WHERE (CAST(:after AS uuid) IS NULL OR id > :after) '
+                    'ORDER BY id OFFSET :offset LIMIT 1'
+                ),
+                {'after': after, 'offset': BATCH_SIZE - 1}
+            ).scalar()
+            connection.execute(
+                sa.text(
+                    'UPDATE public.cheese SET content_hash = {0} '
+                    'WHERE (CAST(:after AS uuid) IS NULL OR id > :after) '
+                    'AND (CAST(:upper AS uuid) IS NULL OR id <= :upper) '
+                    'AND content_hash IS NULL'.format(content_hash())
+                ),
+                {'after': after, 'upper': upper}
+            )
+            if upper is None:
+                break
+            after = upper
+
+        # Старое ограничение считало строки с NULL в описании разными; по новому
+        # ключу это один сыр, и остается строка с меньшим id
+        connection.execute(sa.text(
+            'DELETE FROM public.cheese a USING public.cheese b '
+            'WHERE a.content_hash = b.content_hash AND a.id > b.id'
+        ))
+
+        # Недействительный индекс от прерванной попытки мешает повторному созданию
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS public.uq_cheese_content_hash')
+        op.create_index(
+            'uq_cheese_content_hash',
+            'cheese',
+            ['content_hash'],
+            unique=True,
+            postgresql_concurrently=True,
+            schema='public'
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('uq_cheese_content_hash', table_name='cheese', postgresql_concurrently=True, schema='public')
+    op.execute('DROP TRIGGER IF EXISTS cheese_content_hash ON public.cheese')
+    op.execute('DROP FUNCTION IF EXISTS public.cheese_content_hash()')
+    op.drop_column('cheese', 'content_hash', schema='public')
@@ -0,0 +1,55 @@
+"""Replace cheese name and description unique constraint
+
+Revision ID: 7b3d9e2f0c58
+Revises: 6a2f8c1e9b47
+Create Date: 2026-10-18 15:30:00.000000
+
+Вторая, сужающая половина замены uq_cheese_name_description на content_hash.
+Выполняется после того, как все процессы приложения пишут content_hash сами
+(см. 6a2f8c1e9b47). NOT NULL ставится через проверенное CHECK-ограничение:
+проверка идет без блокировки записи, а SET NOT NULL использует ее результат
+вместо повторного просмотра таблицы.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3d9e2f0c58'
+down_revision: Union[str, None] = '6a2f8c1e9b47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Каждая команда в своей транзакции, чтобы короткие блокировки ALTER TABLE
+    # не удерживались на время проверки строк
+    with op.get_context().autocommit_block():
+        op.execute(
+            'ALTER TABLE public.cheese ADD CONSTRAINT ck_cheese_content_hash_not_null '
+            'CHECK (content_hash IS NOT NULL) NOT VALID'
+        )
+        op.execute('ALTER TABLE public.cheese VALIDATE CONSTRAINT ck_cheese_content_hash_not_null')
+        op.alter_column('cheese', 'content_hash', existing_type=sa.String(length=32), nullable=False, schema='public')
+        op.drop_constraint('ck_cheese_content_hash_not_null', 'cheese', schema='public')
+        op.drop_constraint('uq_cheese_name_description', 'cheese', schema='public')
+        op.execute('DROP TRIGGER IF EXISTS cheese_content_hash ON public.cheese')
+        op.execute('DROP FUNCTION IF EXISTS public.cheese_content_hash()')
+
+
+def downgrade() -> None:
+    op.execute(
+        "CREATE OR REPLACE FUNCTION public.cheese_content_hash() RETURNS trigger AS $$ "
+        "BEGIN NEW.content_hash := left(encode(sha256(convert_to("
+        "char_length(NEW.name)::text || ':' || NEW.name || coalesce(NEW.description, ''), 'UTF8'"
+        ")), 'hex'), 32); RETURN NEW; END "
+        "$$ LANGUAGE plpgsql"
+    )
+    op.execute(
+        'CREATE TRIGGER cheese_content_hash BEFORE INSERT OR UPDATE OF name, description '
+        'ON public.cheese FOR EACH ROW EXECUTE FUNCTION public.cheese_content_hash()'
+    )
+    op.alter_column('cheese', 'content_hash', existing_type=sa.String(length=32), nullable=True, schema='public')
+    op.create_unique_constraint('uq_cheese_name_description', 'cheese', ['name', 'description'], schema='public')
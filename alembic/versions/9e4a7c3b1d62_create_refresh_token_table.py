@@ -0,0 +1,50 @@
+"""Create refresh token table
+
+Revision ID: 9e4a7c3b1d62
+Revises: 7b3d9e2f0c58
+Create Date: 2026-10-18 17:00:00.000000
+
+Токены обновления, выданные до этой ревизии, не содержат jti и перестают
+приниматься: API-клиентам нужно один раз получить токены заново.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4a7c3b1d62'
+down_revision: Union[str, None] = '7b3d9e2f0c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('refresh_token',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('family_id', sa.UUID(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('used_at', sa.DateTime(), nullable=True),
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(
+        ['user_id'], ['public.user.id'],
+        name=op.f('fk_refresh_token_user_id_user'),
+        ondelete='CASCADE'
+    ),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_refresh_token')),
+    schema='public'
+    )
+    op.create_index('ix_refresh_token_family_id', 'refresh_token', ['family_id'], schema='public')
+    op.create_index(
+        'ix_refresh_token_user_id_expires_at',
+        'refresh_token',
+        ['user_id', 'expires_at'],
+        schema='public'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_refresh_token_user_id_expires_at', table_name='refresh_token', schema='public')
+    op.drop_index('ix_refresh_token_family_id', table_name='refresh_token', schema='public')
+    op.drop_table('refresh_token', schema='public')
@@ -1,29 +1,97 @@
-import smtplib
+import datetime
+import json
+import math
+import mimetypes
+import os
+import uuid
+import zlib
 
-from flask import (Flask, flash, jsonify, redirect, render_template, request,
+from flask import (Blueprint, Flask, Response, abort, flash, jsonify,
+                   redirect, render_template, request, send_from_directory,
                    session, url_for)
-from flask_bootstrap import Bootstrap
 from flask_login import (LoginManager, current_user, login_required,
                          login_user, logout_user)
+from jwt import InvalidTokenError
 from loguru import logger
-from sqlalchemy.orm import Session
-from werkzeug.security import check_password_hash
-
-from common.utils import (generate_token, send_email_message, smtp_generator,
-                          token_required)
-from config import Config, UserConfig
-from db.crud import create_user
-from db.models import Cheese, User
-from db.session import get_db
-from forms import *
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-app = Flask('cheese_shop')
-app.config.from_object(Config)
+from common.assets import asset_manifest, select_encoding
+from common.cache import catalog_cache
+from common.fragments import FragmentCacheExtension, fragment_cache
+from common.hashing import verify_password
+from common.identity import UserIdentity, user_identities
+from common.lazy import LazyResource
+from common.mailer import mail_outbox
+from common.media import VARIANTS, VARIANT_FORMAT
+from common.metrics import init_app as init_metrics
+from common.pagination import decode_cursor, encode_cursor, parse_limit
+from common.payload import EncodedPayload
+from common.ratelimit import auth_limiter
+from common.utils import generate_token, token_required, verify_token
+from config import Config
+from db.crud import (create_refresh_token, create_user, get_cheese_page,
+                     iter_cheese_batches, rotate_refresh_token)
+from db.instrumentation import init_app as init_instrumentation
+from db.models import User
+from db.search import search_cheese
+from db.session import SessionLocal, get_request_db, init_app as init_db_session
+from forms import *
 
-bootstrap = Bootstrap(app)
+# Маршруты магазина; приложение собирается в create_app
+shop = Blueprint('shop', __name__)
 
 login_manager = LoginManager()
-login_manager.init_app(app)
+
+
+def create_app() -> Flask:
+    """
+    Создает и настраивает экземпляр приложения.
+
+    Returns:
+        Flask: Приложение с маршрутами магазина, учетом SQL-запросов и метриками.
+
+    Notes:
+        Импорт модуля не создает приложение и не обращается к базе данных,
+        SMTP-серверу и файлам: механизмы базы данных и рассылка инвалидации
+        каталога создаются при первом обращении, а Flask-Bootstrap импортируется
+        здесь. Письма отправляет отдельный процесс mail_worker.py. Время и состав
+        импорта проверяет check_import_time.py.
+    """
+    from flask_bootstrap import Bootstrap
+
+    app = Flask('cheese_shop')
+    app.config.from_object(Config)
+
+    Bootstrap(app)
+
+    init_db_session(app)
+    init_instrumentation(app)
+    init_metrics(app)
+
+    login_manager.init_app(app)
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = fragment_cache
+    app.jinja_env.globals['image_variants'] = VARIANTS
+    app.jinja_env.globals['asset_url'] = asset_manifest.url
+
+    if Config.PROXY_FIX_X_FOR:
+        # Адрес клиента нужен ограничителю входа; за прокси это X-Forwarded-For
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_FIX_X_FOR)
+
+    app.register_blueprint(shop)
+    return app
+
+
+_default_app = LazyResource(create_app)
+
+
+def __getattr__(name: str):
+    # Экземпляр по умолчанию для 'gunicorn app:app' и 'from app import app'
+    # создается при первом обращении, а не при импорте модуля
+    if name != 'app':
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    return _default_app.get()
 
 
 @login_manager.user_loader
@@ -35,27 +103,100 @@ def load_user(user_id):
         user_id: Идентификатор пользователя.
 
     Returns:
-        User: Объект пользователя, если найден в базе данных, иначе None.
+        UserIdentity: Снимок пользователя, если он найден в кэше или в базе данных, иначе None.
+    """
+    try:
+        user_id = uuid.UUID(user_id)
+    except ValueError:
+        return None
+    return user_identities.get(user_id, lambda: get_request_db(read_only=True).get(User, user_id))
+
+
+def load_catalog_page(limit: int, after):
+    """
+    Возвращает снимок страницы каталога из кэша каталога.
+
+    Args:
+        limit (int): Количество сыров на странице.
+        after (Optional[uuid.UUID]): Идентификатор последней записи предыдущей страницы.
+
+    Returns:
+        tuple: Кортеж словарей с сырами и курсор следующей страницы (или None).
+    """
+    def loader():
+        db = get_request_db(read_only=True)
+        cheeses, last_id = get_cheese_page(db, limit, after)
+        return (
+            tuple(cheese.to_dict() for cheese in cheeses),
+            encode_cursor(last_id) if last_id else None
+        )
+    return catalog_cache.get(('page', limit, after), loader)
+
+
+def load_search_results(query: str, limit: int):
+    """
+    Возвращает снимок результатов поиска из кэша каталога.
+
+    Args:
+        query (str): Поисковый запрос.
+        limit (int): Максимальное количество результатов.
+
+    Returns:
+        tuple: Кортеж словарей с найденными сырами.
     """
-    db = next(get_db())
-    return db.query(User).get(user_id)
+    def loader():
+        db = get_request_db(read_only=True)
+        return tuple(cheese.to_dict() for cheese in search_cheese(db, query, limit))
+    return catalog_cache.get(('search', query.lower(), limit), loader)
 
 
-@app.route('/')
+@shop.route('/')
 def index():
     """
     Обработчик маршрута '/' (главная страница).
 
+    Query Args:
+        limit: Количество сыров на странице.
+        after: Курсор следующей страницы.
+        q: Поисковый запрос; если задан, выводятся только найденные сыры.
+
     Returns:
         str: HTML-шаблон для главной страницы.
+
+    Notes:
+        Сетка каталога кэшируется в fragment_cache по версии каталога и
+        параметрам страницы; шапка с данными пользователя рендерится на каждый запрос.
     """
-    db = next(get_db())
-    cheese = db.query(Cheese).all()
-    return render_template('index.html', cheese=cheese)
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        after = decode_cursor(request.args.get('after'))
+    except ValueError:
+        abort(400)
+    query = request.args.get('q', '').strip()
+    if query:
+        cheese = load_search_results(query, Config.SEARCH_MAX_RESULTS)
+        return render_template(
+            'index.html',
+            cheese=cheese,
+            limit=limit,
+            after=None,
+            next_cursor=None,
+            is_first_page=False,
+            query=query
+        )
+    cheese, next_cursor = load_catalog_page(limit, after)
+    return render_template(
+        'index.html',
+        cheese=cheese,
+        limit=limit,
+        after=after,
+        next_cursor=next_cursor,
+        is_first_page=after is None
+    )
 
 
 @login_required
-@app.route('/profile', methods=['GET', 'POST'])
+@shop.route('/profile', methods=['GET', 'POST'])
 def profile():
     """
     Обработчик маршрута '/profile' (профиль пользователя).
@@ -67,66 +208,111 @@ def profile():
     if request.method == 'POST' and form.validate_on_submit():
         email = form.email.data
         try:
-            with smtp_generator(
-                smtplib.SMTP(
-                    "smtp.{0}".format(UserConfig.DOMAIN),
-                    UserConfig.PORT
-                )
-            ) as email_server:
-                send_email_message(email_server, current_user.username, email)
+            mail_outbox.enqueue(get_request_db(), current_user.username, email)
         except Exception as err:
             logger.error(
-                "{0}\nПроверьте логин или пароль!".format(err)
+                "{0}\nНе удалось поставить письмо в очередь!".format(err)
             )
             flash(f'Произошла ошибка во время отправки! {err}', 'danger')
         else:
-            flash('Сообщение успешно отправлено!', 'success')
+            flash('Сообщение принято и скоро будет отправлено!', 'success')
     return render_template('profile.html', user=current_user, form=form)
 
 
-@app.route('/login', methods=['GET', 'POST'])
-def login(db: Session = next(get_db())):
+def check_user_password(db, user: User, password: str) -> bool:
+    """
+    Проверяет пароль пользователя и обновляет хэш, созданный устаревшими параметрами.
+
+    Args:
+        db (Session): Сессия базы данных.
+        user (User): Пользователь.
+        password (str): Введенный пароль.
+
+    Returns:
+        bool: True, если пароль верный.
+    """
+    is_valid, new_hash = verify_password(password, user.password)
+    if is_valid and new_hash:
+        user.password = new_hash
+        db.commit()
+    return is_valid
+
+
+def retry_after_header(retry_after: float) -> dict:
+    """
+    Формирует заголовок Retry-After для ответа 429.
+
+    Args:
+        retry_after (float): Время до следующей разрешенной попытки в секундах.
+
+    Returns:
+        dict: Заголовок с целым числом секунд, не меньше 1.
+    """
+    return {'Retry-After': str(max(1, math.ceil(retry_after)))}
+
+
+@shop.route('/login', methods=['GET', 'POST'])
+def login():
     """
     Обработчик маршрута '/login' (вход пользователя).
 
     Returns:
         str: HTML-шаблон для страницы входа.
+
+    Notes:
+        Попытка тратит лимит имени пользователя и адреса до запроса к базе
+        данных и проверки пароля; при исчерпанном лимите возвращается 429.
     """
     form = LoginForm()
     if form.validate_on_submit():
+        retry_after = auth_limiter.acquire('login', form.username.data, request.remote_addr)
+        if retry_after:
+            flash('Слишком много попыток входа! Повторите через {0} с.'.format(math.ceil(retry_after)), 'danger')
+            return render_template('login.html', form=form), 429, retry_after_header(retry_after)
+        db = get_request_db()
         user = db.query(User).filter_by(username=form.username.data).first()
-        if user and check_password_hash(user.password, form.password.data):
+        if user and check_user_password(db, user, form.password.data):
+            auth_limiter.reset_user(user.username)
             login_user(user)
+            user_identities.put(UserIdentity.from_user(user))
             token = generate_token(user.id)
             session['token'] = token
             flash('Вы успешно вошли!', 'success')
-            return redirect(url_for('index'))
+            return redirect(url_for('shop.index'))
         flash('Вы не смогли войти! Проверьте ваши данные.', 'danger')
     return render_template('login.html', form=form)
 
 
-@app.route('/register', methods=['GET', 'POST'])
-def register(db: Session = next(get_db())):
+@shop.route('/register', methods=['GET', 'POST'])
+def register():
     """
     Обработчик маршрута '/register' (регистрация пользователя).
 
     Returns:
         str: HTML-шаблон для страницы регистрации.
+
+    Notes:
+        Лимит попыток проверяется до create_user, то есть до запросов к базе
+        данных и хэширования пароля.
     """
     form = RegistrationForm()
     if form.validate_on_submit():
+        retry_after = auth_limiter.acquire('register', form.username.data, request.remote_addr)
+        if retry_after:
+            flash('Слишком много попыток регистрации! Повторите через {0} с.'.format(math.ceil(retry_after)), 'danger')
+            return render_template('register.html', form=form), 429, retry_after_header(retry_after)
         user = User(username=form.username.data, password=form.password.data)
         try:
-            create_user(db, user)
+            create_user(get_request_db(), user)
         except Exception as err:
             flash(f'Произошла ошибка во время регистрации! {err}', 'danger')
-            return redirect(url_for('register'))
+            return redirect(url_for('shop.register'))
         flash('Регистрация успешна! Теперь вы можете войти.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('shop.login'))
     return render_template('register.html', form=form)
 
 
-@app.route('/logout')
+@shop.route('/logout')
 @login_required
 def logout():
     """
@@ -138,30 +324,241 @@ def logout():
     logout_user()
     session.pop('token', None)
     flash('Вы успешно вышли!', 'success')
-    return redirect(url_for('index'))
+    return redirect(url_for('shop.index'))
 
 
-@app.route('/cheese/api')
+def issue_api_tokens(db, user_id, family_id=None) -> dict:
+    """
+    Выдает API-клиенту долгоживущий токен доступа и одноразовый токен обновления.
+
+    Args:
+        db: Сессия базы данных запроса.
+        user_id: Идентификатор пользователя.
+        family_id: Цепочка ротации погашенного токена обновления; None при входе.
+
+    Returns:
+        dict: Токены и время жизни токена доступа в секундах.
+    """
+    lifetime = datetime.timedelta(minutes=Config.API_ACCESS_TOKEN_LIFETIME)
+    refresh_lifetime = datetime.timedelta(minutes=Config.REFRESH_TOKEN_LIFETIME)
+    token_id = create_refresh_token(db, user_id, refresh_lifetime, family_id)
+    db.commit()
+    return {
+        'access_token': generate_token(user_id, lifetime=lifetime),
+        'refresh_token': generate_token(user_id, token_type='refresh', lifetime=refresh_lifetime, token_id=token_id),
+        'token_type': 'Bearer',
+        'expires_in': int(lifetime.total_seconds())
+    }
+
+
+@shop.route('/api/token', methods=['POST'])
+def api_token():
+    """
+    Обработчик маршрута '/api/token' для выдачи токенов API-клиентам.
+
+    Принимает JSON или данные формы с полями username и password.
+
+    Returns:
+        JSON: Токен доступа и токен обновления либо сообщение об ошибке.
+    """
+    data = request.get_json(silent=True) or request.form
+    username, password = data.get('username'), data.get('password')
+    if not username or not password:
+        return jsonify({'message': 'Укажите логин и пароль!'}), 400
+    retry_after = auth_limiter.acquire('api_token', username, request.remote_addr)
+    if retry_after:
+        return jsonify({'message': 'Слишком много попыток входа!'}), 429, retry_after_header(retry_after)
+    db = get_request_db()
+    user = db.query(User).filter_by(username=username).first()
+    if not user or not check_user_password(db, user, password):
+        return jsonify({'message': 'Неверный логин или пароль!'}), 401
+    auth_limiter.reset_user(user.username)
+    return jsonify(issue_api_tokens(db, user.id))
+
+
+@shop.route('/api/token/refresh', methods=['POST'])
+def api_token_refresh():
+    """
+    Обработчик маршрута '/api/token/refresh' для обновления токенов без повторного входа.
+
+    Принимает JSON или данные формы с полем refresh_token.
+
+    Returns:
+        JSON: Новая пара токенов либо сообщение об ошибке.
+
+    Notes:
+        Токен обновления одноразовый: при обмене он погашается, а его повторное
+        предъявление отзывает всю цепочку токенов, выданных после того же входа.
+    """
+    data = request.get_json(silent=True) or request.form
+    try:
+        payload = verify_token(data.get('refresh_token') or '', token_type='refresh')
+        user_id = uuid.UUID(payload['sub'])
+        token_id = uuid.UUID(payload['jti'])
+    except (InvalidTokenError, KeyError, ValueError):
+        return jsonify({'message': 'Недействительный токен обновления!'}), 401
+    db = get_request_db()
+    family_id = rotate_refresh_token(db, token_id, user_id)
+    if family_id is None:
+        return jsonify({'message': 'Токен обновления уже использован или отозван!'}), 401
+    if db.get(User, user_id) is None:
+        return jsonify({'message': 'Пользователь не найден!'}), 401
+    return jsonify(issue_api_tokens(db, user_id, family_id))
+
+
+@shop.route('/cheese/api')
 @token_required
 def cheese_api():
     """
     Обработчик маршрута '/cheese/api' для получения данных о сырах в формате JSON.
 
+    Query Args:
+        limit: Количество сыров на странице.
+        after: Курсор следующей страницы.
+
+    Returns:
+        JSON: Страница каталога и курсор следующей страницы (`next`).
+
+    Notes:
+        Тело ответа сериализуется и сжимается один раз на версию каталога. Запрос
+        с совпадающим If-None-Match получает 304 без обращения к базе данных.
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        after = decode_cursor(request.args.get('after'))
+    except ValueError as err:
+        return jsonify({'message': str(err)}), 400
+
+    def loader():
+        cheeses, next_cursor = load_catalog_page(limit, after)
+        return EncodedPayload({
+            "items": cheeses,
+            "limit": limit,
+            "next": next_cursor
+        })
+    return catalog_cache.get(('api', limit, after), loader).to_response()
+
+
+@shop.route('/cheese/api/export')
+@token_required
+def cheese_api_export():
+    """
+    Обработчик маршрута '/cheese/api/export' для потоковой выгрузки всего каталога.
+
     Returns:
-        JSON: Данные о сырах в формате JSON.
+        Response: Каталог в формате NDJSON (одна JSON-запись на строку), сжатый
+        gzip на лету, если клиент его поддерживает.
+
+    Notes:
+        Строки читаются серверным курсором и отправляются клиенту по мере чтения,
+        поэтому потребление памяти не зависит от размера каталога.
+    """
+    use_gzip = bool(request.accept_encodings['gzip'])
+
+    def generate():
+        db = SessionLocal()
+        compressor = zlib.compressobj(wbits=31) if use_gzip else None
+        try:
+            for batch in iter_cheese_batches(db, Config.EXPORT_BATCH_SIZE):
+                chunk = ''.join(
+                    json.dumps(cheese, ensure_ascii=False, separators=(',', ':')) + '\n' for cheese in batch
+                ).encode('utf-8')
+                if compressor is not None:
+                    chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                yield chunk
+            if compressor is not None:
+                yield compressor.flush()
+        finally:
+            db.close()
+
+    headers = {'Cache-Control': 'no-store', 'Vary': 'Accept-Encoding'}
+    if use_gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return Response(generate(), mimetype='application/x-ndjson', headers=headers)
+
+
+@shop.route('/cheese/search')
+def cheese_search():
+    """
+    Обработчик маршрута '/cheese/search' для поиска сыров по мере ввода.
+
+    Query Args:
+        q: Поисковый запрос.
+        limit: Максимальное количество результатов (не больше SEARCH_MAX_RESULTS).
+
+    Returns:
+        JSON: Найденные сыры, отсортированные по релевантности.
+    """
+    query = request.args.get('q', '').strip()
+    try:
+        limit = min(
+            int(request.args.get('limit', Config.SEARCH_MAX_RESULTS)),
+            Config.SEARCH_MAX_RESULTS
+        )
+    except ValueError as err:
+        return jsonify({'message': str(err)}), 400
+    return jsonify({
+        "query": query,
+        "items": load_search_results(query, max(limit, 1))
+    })
+
+
+@shop.route('/media/<variant>/<filename>')
+def media(variant: str, filename: str):
+    """
+    Обработчик маршрута '/media/<variant>/<filename>' для локальных копий изображений.
+
+    Args:
+        variant (str): Имя варианта изображения (thumb, card или full).
+        filename (str): Имя файла вида '<хэш содержимого>.webp'.
+
+    Returns:
+        Response: Файл изображения.
+
+    Notes:
+        Имя файла зависит только от содержимого, поэтому ответ кэшируется
+        браузером и CDN без повторной проверки.
+    """
+    if variant not in VARIANTS or not filename.endswith('.' + VARIANT_FORMAT):
+        abort(404)
+    response = send_from_directory(
+        os.path.join(Config.MEDIA_ROOT, variant), filename, max_age=Config.MEDIA_MAX_AGE
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@shop.route('/assets/<filename>')
+def assets(filename: str):
+    """
+    Обработчик маршрута '/assets/<filename>' для собранных бандлов стилей.
+
+    Args:
+        filename (str): Имя файла с хэшем содержимого, например 'index.<хэш>.css'.
+
+    Returns:
+        Response: Бандл, сжатый brotli или gzip заранее, если клиент это поддерживает.
+
+    Notes:
+        Содержимое файла с данным именем никогда не меняется, поэтому ответ
+        кэшируется браузером и CDN без повторной проверки.
     """
-    db = next(get_db())
-    cheeses = db.query(Cheese).all()
-    cheese_data = [
-        {
-            "name": cheese.name,
-            "description": cheese.description,
-            "image_path": cheese.image_path
-        }
-        for cheese in cheeses
-    ]
-    return jsonify(cheese_data)
+    if not asset_manifest.is_built(filename):
+        abort(404)
+    send_name, encoding = select_encoding(filename, Config.ASSETS_ROOT, request.accept_encodings)
+    response = send_from_directory(
+        Config.ASSETS_ROOT, send_name,
+        mimetype=mimetypes.guess_type(filename)[0],
+        max_age=Config.ASSETS_MAX_AGE
+    )
+    if encoding is not None:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,175 @@
+"""
+ASGI-точка входа с асинхронными обработчиками чтения каталога.
+
+Запуск:
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+
+Маршруты '/cheese/api' (с токеном в заголовке Authorization) и '/cheese/search'
+обслуживаются корутинами поверх асинхронного механизма SQLAlchemy: пока запрос ждет базу данных,
+процесс принимает и обрабатывает другие. Остальные запросы, в том числе
+'/cheese/api' с токеном из сессии, передаются синхронному приложению Flask,
+которое выполняется в пуле из WEB_THREADS потоков, как и в рабочем процессе gthread.
+"""
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, Tuple
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from jwt import ExpiredSignatureError
+from werkzeug.http import parse_accept_header
+
+from common.cache import catalog_cache
+from common.lazy import LazyResource
+from common.metrics import REQUEST_LATENCY, REQUESTS, record_token_failure
+from common.pagination import decode_cursor, encode_cursor, parse_limit
+from common.payload import EncodedPayload
+from common.utils import verify_token
+from config import Config
+from db.async_session import async_read_session, dispose_async_engines
+from db.crud import get_cheese_page_async
+from db.search import search_cheese_async
+
+
+def _create_wsgi_application() -> WSGIMiddleware:
+    # Приложение Flask создается при первом запросе к нему, а не при импорте модуля
+    from app import app as flask_app
+    return WSGIMiddleware(flask_app, workers=int(os.environ.get('WEB_THREADS', 4)))
+
+
+wsgi_application = LazyResource(_create_wsgi_application)
+
+Handler = Callable[[Dict[str, str], Dict[str, list]], Awaitable[Tuple[int, Dict[str, str], bytes]]]
+
+
+def _json(status: int, data) -> Tuple[int, Dict[str, str], bytes]:
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    return status, {'Content-Type': 'application/json'}, body
+
+
+async def cheese_api(headers: Dict[str, str], args: Dict[str, list]) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    Асинхронный вариант маршрута '/cheese/api'.
+
+    Args:
+        headers (Dict[str, str]): Заголовки запроса в нижнем регистре.
+        args (Dict[str, list]): Параметры строки запроса.
+
+    Returns:
+        Tuple[int, Dict[str, str], bytes]: Код ответа, заголовки и тело.
+
+    Notes:
+        Использует тот же ключ кэша каталога, что и синхронный маршрут, поэтому
+        снимки страниц разделяются между обоими путями.
+    """
+    token = headers['authorization'][len('Bearer '):].strip()
+    try:
+        verify_token(token)
+    except ExpiredSignatureError:
+        record_token_failure('expired')
+        return _json(401, {'message': 'Токен просрочен!'})
+    except Exception:
+        record_token_failure('invalid')
+        return _json(401, {'message': 'Недействительный токен!'})
+    try:
+        limit = parse_limit(args.get('limit', [None])[0])
+        after = decode_cursor(args.get('after', [None])[0])
+    except ValueError as err:
+        return _json(400, {'message': str(err)})
+
+    async def loader():
+        async with async_read_session() as db:
+            cheeses, last_id = await get_cheese_page_async(db, limit, after)
+            return EncodedPayload({
+                "items": [cheese.to_dict() for cheese in cheeses],
+                "limit": limit,
+                "next": encode_cursor(last_id) if last_id else None
+            })
+
+    payload = await catalog_cache.get_async(('api', limit, after), loader)
+    status, response_headers, body = payload.negotiate(
+        parse_accept_header(headers.get('accept-encoding')), headers.get('if-none-match')
+    )
+    if status == 200:
+        response_headers['Content-Type'] = 'application/json'
+    return status, response_headers, body
+
+
+async def cheese_search(headers: Dict[str, str], args: Dict[str, list]) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    Асинхронный вариант маршрута '/cheese/search'.
+
+    Args:
+        headers (Dict[str, str]): Заголовки запроса в нижнем регистре.
+        args (Dict[str, list]): Параметры строки запроса.
+
+    Returns:
+        Tuple[int, Dict[str, str], bytes]: Код ответа, заголовки и тело.
+    """
+    query = args.get('q', [''])[0].strip()
+    try:
+        limit = max(min(int(args.get('limit', [Config.SEARCH_MAX_RESULTS])[0]), Config.SEARCH_MAX_RESULTS), 1)
+    except ValueError as err:
+        return _json(400, {'message': str(err)})
+
+    async def loader():
+        async with async_read_session() as db:
+            return tuple(cheese.to_dict() for cheese in await search_cheese_async(db, query, limit))
+
+    items = await catalog_cache.get_async(('search', query.lower(), limit), loader)
+    return _json(200, {"query": query, "items": items})
+
+
+ASYNC_ROUTES: Dict[str, Handler] = {
+    '/cheese/api': cheese_api,
+    '/cheese/search': cheese_search
+}
+
+
+def _async_handler(scope: dict, headers: Dict[str, str]):
+    if scope['method'] not in ('GET', 'HEAD'):
+        return None
+    handler = ASYNC_ROUTES.get(scope['path'])
+    # Токен из cookie-сессии проверяет только приложение Flask
+    if handler is cheese_api and not headers.get('authorization', '').startswith('Bearer '):
+        return None
+    return handler
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await dispose_async_engines()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """
+    ASGI-приложение: асинхронные маршруты чтения и Flask для остальных.
+    """
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    headers = {}
+    if scope['type'] == 'http':
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+    handler = _async_handler(scope, headers) if scope['type'] == 'http' else None
+    if handler is None:
+        return await wsgi_application.get()(scope, receive, send)
+
+    started = time.perf_counter()
+    args = parse_qs(scope['query_string'].decode('latin-1'))
+    status, response_headers, body = await handler(headers, args)
+    response_headers['Content-Length'] = str(len(body))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in response_headers.items()]
+    })
+    await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+    REQUEST_LATENCY.labels(scope['path'], scope['method']).observe(time.perf_counter() - started)
+    REQUESTS.labels(scope['path'], scope['method'], str(status)).inc()
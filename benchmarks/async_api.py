@@ -0,0 +1,375 @@
+"""
+Бенчмарк одновременных запросов к API каталога: синхронный и асинхронный путь.
+
+Запуск:
+    python benchmarks/async_api.py --concurrency 4 16 64 256 --db-latency-ms 20
+    python benchmarks/async_api.py --threads 8 --pool-size 32 --output results.json
+    python benchmarks/async_api.py --variants --fanout-queries 200 --fanout-limits 1 4 16
+
+Бенчмарк запускает один рабочий процесс gunicorn в двух вариантах: синхронный
+gthread с --threads потоками (app:app) и асинхронный UvicornWorker (asgi:application).
+Оба обслуживают '/cheese/api' с токеном в заголовке на одной и той же базе
+(по умолчанию SQLite из benchmarks/load.py), кэш каталога отключен, чтобы каждый
+запрос доходил до базы данных.
+
+Задержка сервера базы данных имитируется паузой --db-latency-ms на каждый SELECT
+внутри драйвера: для sqlite3 она занимает поток приложения, для aiosqlite только
+поток соединения, как и ожидание ответа PostgreSQL.
+
+Для каждого уровня параллелизма в JSON записываются пропускная способность,
+задержки и число одновременно обслуживаемых запросов in_flight: пропускная
+способность, умноженная на задержку без очереди (средняя задержка первого уровня).
+Полная задержка для этого не подходит: при постоянном числе клиентов по закону
+Литтла она всегда дает число клиентов. Итог по варианту - наибольший уровень,
+при котором нет ошибок и p99 не превышает --slo-ms.
+
+Первым в --concurrency должен идти уровень не выше --threads, чтобы задержка
+первого уровня не включала ожидание в очереди.
+
+С --fanout-queries отдельно измеряется веерный запрос одного обработчика:
+--fanout-queries поисковых запросов через gather_bounded с каждым ограничением
+из --fanout-limits. В JSON записываются время, наибольшее число одновременно
+выполняемых запросов и наибольшее число занятых соединений пула.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load import (REPO_ROOT, Client, Workload, _child_env, _free_port,  # noqa: E402
+                             _git_revision, _wait_for_server, percentile)
+
+VARIANTS = {
+    'sync': ('gthread', 'benchmarks.async_api:sync_app()'),
+    'async': ('uvicorn.workers.UvicornWorker', 'benchmarks.async_api:async_app()')
+}
+
+
+def _delay_selects(seconds: float):
+    def trace(statement: str):
+        if statement.lstrip()[:6].upper() == 'SELECT':
+            time.sleep(seconds)
+    return trace
+
+
+def _install_latency(engine, is_async: bool):
+    from sqlalchemy import event
+
+    seconds = float(os.environ.get('BENCH_DB_LATENCY_MS', 0)) / 1000
+    if not seconds or engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_trace(dbapi_connection, connection_record):
+        # Трассировка sqlite3 вызывается в потоке, который выполняет запрос
+        if is_async:
+            dbapi_connection.await_(dbapi_connection._connection.set_trace_callback(_delay_selects(seconds)))
+        else:
+            dbapi_connection.set_trace_callback(_delay_selects(seconds))
+
+
+def _prepare_app():
+    from app import app
+    from db.session import get_engine
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    _install_latency(get_engine(), is_async=False)
+    return app
+
+
+def sync_app():
+    """
+    Фабрика WSGI-приложения для варианта sync.
+    """
+    return _prepare_app()
+
+
+def async_app():
+    """
+    Фабрика ASGI-приложения для варианта async.
+    """
+    _prepare_app()
+    from asgi import application
+    from db.async_session import get_async_engine
+
+    _install_latency(get_async_engine().sync_engine, is_async=True)
+    return application
+
+
+def _variant_env(args) -> dict:
+    env = _child_env(args, args.size)
+    env.update({
+        'CATALOG_CACHE_SIZE': '0',
+        'DB_POOL_SIZE': str(args.pool_size),
+        'DB_MAX_OVERFLOW': '0',
+        'BENCH_DB_LATENCY_MS': str(args.db_latency_ms),
+        'WEB_THREADS': str(args.threads)
+    })
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, 'benchmarks', 'load.py'), '--seed', str(args.size)],
+        env=env, cwd=REPO_ROOT, check=True
+    )
+    return env
+
+
+async def _fanout(size: int, queries: int, limit: int) -> dict:
+    from db.async_session import async_read_session, dispose_async_engines, gather_bounded, get_async_engine
+    from db.search import search_cheese_async
+
+    engine = get_async_engine()
+    _install_latency(engine.sync_engine, is_async=True)
+    in_flight = {'now': 0, 'peak': 0, 'peak_connections': 0}
+
+    async def query(number: int) -> int:
+        in_flight['now'] += 1
+        in_flight['peak'] = max(in_flight['peak'], in_flight['now'])
+        try:
+            async with async_read_session() as db:
+                found = await search_cheese_async(db, 'Cheese {0:07d}'.format(number % size), 10)
+                in_flight['peak_connections'] = max(in_flight['peak_connections'], engine.pool.checkedout())
+                return len(found)
+        finally:
+            in_flight['now'] -= 1
+
+    started = time.perf_counter()
+    try:
+        found = await gather_bounded((query(number) for number in range(queries)), limit)
+    finally:
+        await dispose_async_engines()
+    return {
+        'limit': limit,
+        'queries': queries,
+        'found': sum(found),
+        'seconds': round(time.perf_counter() - started, 3),
+        'peak_in_flight': in_flight['peak'],
+        'peak_connections': in_flight['peak_connections']
+    }
+
+
+def run_fanout(args) -> list:
+    """
+    Измеряет веерный запрос через gather_bounded с каждым ограничением из --fanout-limits.
+
+    Args:
+        args: Аргументы командной строки.
+
+    Returns:
+        list: Время и наибольший параллелизм для каждого ограничения.
+
+    Notes:
+        Каждое ограничение измеряется в отдельном процессе, чтобы пул соединений
+        и кэши не переходили из одного измерения в другое.
+    """
+    env = _variant_env(args)
+    results = []
+    for limit in args.fanout_limits:
+        completed = subprocess.run(
+            [
+                sys.executable, os.path.abspath(__file__), '--size', str(args.size),
+                '--fanout-child', str(args.fanout_queries), str(limit)
+            ],
+            env=env, cwd=REPO_ROOT, check=True, stdout=subprocess.PIPE
+        )
+        result = json.loads(completed.stdout)
+        results.append(result)
+        print(
+            'fanout limit={0:<4} {1:>8.3f}s  in-flight={2:<4} connections={3}'.format(
+                limit, result['seconds'], result['peak_in_flight'], result['peak_connections']
+            ),
+            file=sys.stderr
+        )
+    return results
+
+
+def run_level(workload: Workload, concurrency: int, requests: int) -> dict:
+    """
+    Нагружает '/cheese/api' заданным количеством одновременных клиентов.
+
+    Args:
+        workload (Workload): Пользователь и токен бенчмарка.
+        concurrency (int): Количество одновременных клиентов.
+        requests (int): Общее количество измеряемых запросов.
+
+    Returns:
+        dict: Пропускная способность, задержки и ошибки.
+    """
+    remaining = [requests]
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    start = threading.Barrier(concurrency + 1)
+
+    def worker():
+        client = Client(workload.port)
+        local_latencies = []
+        local_errors = 0
+        # Соединение открывается до старта, чтобы не измерять установку TCP
+        try:
+            client.request('GET', '/cheese/api?limit=1', headers={'Authorization': 'Bearer junk'})
+        except Exception:
+            client.close()
+        start.wait()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                ok = workload.call(client, 'cheese_api')
+            except Exception:
+                ok = False
+            local_latencies.append(time.perf_counter() - started)
+            local_errors += not ok
+        client.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    mean = sum(latencies) / len(latencies) if latencies else 0.0
+    throughput = len(latencies) / elapsed if elapsed else 0.0
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(throughput, 2),
+        'latency_ms': {
+            'mean': round(mean * 1000, 3),
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3) if latencies else 0.0
+        }
+    }
+
+
+def run_variant(args, variant: str) -> dict:
+    """
+    Запускает рабочий процесс варианта и прогоняет все уровни параллелизма.
+
+    Args:
+        args: Аргументы командной строки.
+        variant (str): sync или async.
+
+    Returns:
+        dict: Результаты по уровням и наибольший уровень в пределах SLO.
+    """
+    worker_class, target = VARIANTS[variant]
+    env = _variant_env(args)
+
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+            '--bind', '127.0.0.1:{0}'.format(port), '--workers', '1', '--threads', str(args.threads),
+            '--worker-class', worker_class, '--access-logfile', os.devnull, '--backlog', '2048', target
+        ],
+        env=env, cwd=REPO_ROOT, start_new_session=True
+    )
+    try:
+        _wait_for_server(process, port)
+        workload = Workload(port, args.size)
+        workload.prepare()
+        levels = []
+        for concurrency in args.concurrency:
+            result = run_level(workload, concurrency, max(args.requests, concurrency * 4))
+            service_time = levels[0]['latency_ms']['mean'] if levels else result['latency_ms']['mean']
+            result['in_flight'] = round(result['throughput_rps'] * service_time / 1000, 2)
+            levels.append(result)
+            print(
+                '{0:<5} c={1:<4} {2:>8.1f} rps  in-flight={3:<6} p50={4:.1f}ms p99={5:.1f}ms errors={6}'.format(
+                    variant, concurrency, result['throughput_rps'], result['in_flight'],
+                    result['latency_ms']['p50'], result['latency_ms']['p99'], result['errors']
+                ),
+                file=sys.stderr
+            )
+        within_slo = [
+            level for level in levels
+            if not level['errors'] and level['latency_ms']['p99'] <= args.slo_ms
+        ]
+        return {
+            'variant': variant,
+            'worker_class': worker_class,
+            'max_concurrency_within_slo': max((level['concurrency'] for level in within_slo), default=0),
+            'peak_in_flight': max((level['in_flight'] for level in levels), default=0.0),
+            'peak_throughput_rps': max((level['throughput_rps'] for level in levels), default=0.0),
+            'levels': levels
+        }
+    finally:
+        if process.poll() is None:
+            os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=10000, help='Размер синтетического каталога')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[4, 16, 64, 256])
+    parser.add_argument('--requests', type=int, default=1000, help='Количество измеряемых запросов на уровень')
+    parser.add_argument('--threads', type=int, default=4, help='Потоки синхронного процесса и пула Flask')
+    parser.add_argument('--pool-size', type=int, default=32, help='Размер пула соединений обоих вариантов')
+    parser.add_argument('--db-latency-ms', type=float, default=20.0, help='Имитируемая задержка SELECT')
+    parser.add_argument('--slo-ms', type=float, default=500.0, help='Допустимый p99 для итога')
+    parser.add_argument('--variants', nargs='*', choices=tuple(VARIANTS), default=list(VARIANTS))
+    parser.add_argument('--database-url', help='База данных вместо SQLite; должна быть одноразовой')
+    parser.add_argument('--data-dir', default=os.path.join(REPO_ROOT, '.bench'), help='Каталог подготовленных баз SQLite')
+    parser.add_argument('--output', help='Файл для JSON-результата; по умолчанию stdout')
+    parser.add_argument('--fanout-queries', type=int, default=0, help='Запросов в веерном запросе; 0 - не измерять')
+    parser.add_argument('--fanout-limits', type=int, nargs='+', default=[1, 4, 16], help='Ограничения gather_bounded')
+    parser.add_argument('--fanout-child', type=int, nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.fanout_child:
+        queries, limit = args.fanout_child
+        json.dump(asyncio.run(_fanout(args.size, queries, limit)), sys.stdout)
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = [run_variant(args, variant) for variant in args.variants]
+    fanout = run_fanout(args) if args.fanout_queries else []
+    report = {
+        'meta': {
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'catalog_size': args.size,
+            'threads': args.threads,
+            'pool_size': args.pool_size,
+            'db_latency_ms': args.db_latency_ms,
+            'slo_ms': args.slo_ms,
+            'fanout_queries': args.fanout_queries,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        },
+        'results': results,
+        'fanout': fanout
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
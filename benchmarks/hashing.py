@@ -0,0 +1,66 @@
+"""
+Микробенчмарк схем хэширования паролей.
+
+Запуск:
+    python benchmarks/hashing.py --seconds 5 --bcrypt-rounds 10 12 --pbkdf2-iterations 600000
+
+Для каждой схемы и стоимости в одном процессе (то есть на одном ядре) считается
+количество хэшей и проверок в секунду. Результат выводится в JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.hashing import BcryptHasher, WerkzeugHasher  # noqa: E402
+
+
+def measure(func, seconds: float) -> float:
+    """
+    Возвращает количество вызовов func в секунду за отведенное время.
+
+    Args:
+        func: Измеряемая функция без аргументов.
+        seconds (float): Длительность измерения.
+
+    Returns:
+        float: Количество вызовов в секунду.
+    """
+    func()
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        func()
+        calls += 1
+    return calls / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--bcrypt-rounds', type=int, nargs='*', default=[10, 12])
+    parser.add_argument('--pbkdf2-iterations', type=int, nargs='*', default=[600000])
+    args = parser.parse_args()
+
+    hashers = [BcryptHasher(rounds) for rounds in args.bcrypt_rounds]
+    hashers += [WerkzeugHasher(iterations) for iterations in args.pbkdf2_iterations]
+    password = 'correct horse battery staple'
+    results = []
+    for hasher in hashers:
+        hashed = hasher.hash(password)
+        results.append({
+            'scheme': hasher.name,
+            'cost': getattr(hasher, 'rounds', None) or getattr(hasher, 'iterations', None),
+            'hashes_per_sec_per_core': round(measure(lambda: hasher.hash(password), args.seconds), 2),
+            'verifies_per_sec_per_core': round(measure(lambda: hasher.verify(password, hashed), args.seconds), 2)
+        })
+    json.dump({'cpu_count': os.cpu_count(), 'results': results}, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+Сборка бандлов стилей.
+
+Запуск:
+    python build_assets.py
+
+Стили из static/styles объединяются и минифицируются в бандлы, описанные в
+common/assets.py. Результат с хэшем содержимого в имени, его .gz и .br копии
+и manifest.json записываются в static/dist.
+"""
+import argparse
+import json
+
+from loguru import logger
+
+from common.assets import build_assets
+from config import Config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', default=Config.ASSETS_SOURCE_DIR, help='Каталог исходных стилей')
+    parser.add_argument('--output', default=Config.ASSETS_ROOT, help='Каталог результата')
+    args = parser.parse_args()
+
+    manifest = build_assets(args.source, args.output)
+    logger.info("Стили собраны: {0}".format(json.dumps(manifest)))
+
+
+if __name__ == '__main__':
+    main()
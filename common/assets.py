@@ -0,0 +1,229 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+from loguru import logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from config import Config
+
+# Бандлы стилей: логическое имя -> исходные файлы в порядке подключения
+BUNDLES: Dict[str, tuple] = {
+    'index.css': ('header.css', 'index.css', 'footer.css'),
+    'login.css': ('header.css', 'login.css'),
+    'profile.css': ('header.css', 'profile.css'),
+    'register.css': ('header.css', 'register.css')
+}
+MANIFEST_NAME = 'manifest.json'
+# Манифест прошлой сборки: его файлы еще запрашивают страницы, отданные до выкладки
+PREVIOUS_MANIFEST_NAME = 'manifest.previous.json'
+# Варианты сжатия в порядке предпочтения: кодировка -> расширение файла
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Комментарии удаляются, строки и url(...) переносятся без изменений
+_TOKENS = re.compile(r'''(/\*.*?\*/)|("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|url\([^)]*\))''', re.S | re.I)
+_WHITESPACE = re.compile(r'\s+')
+_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def _minify_code(css: str) -> str:
+    css = _WHITESPACE.sub(' ', css)
+    css = _PUNCTUATION.sub(r'\1', css)
+    return css.replace(': ', ':').replace(';}', '}')
+
+
+def minify_css(css: str) -> str:
+    """
+    Удаляет из CSS комментарии и лишние пробелы.
+
+    Args:
+        css (str): Исходный CSS.
+
+    Returns:
+        str: Минифицированный CSS.
+
+    Notes:
+        Содержимое строк в кавычках и url(...) не меняется.
+    """
+    parts = []
+    code = []
+    position = 0
+    for match in _TOKENS.finditer(css):
+        code.append(css[position:match.start()])
+        position = match.end()
+        if match.group(2) is not None:
+            parts.append(_minify_code(''.join(code)))
+            parts.append(match.group(2))
+            code = []
+    code.append(css[position:])
+    parts.append(_minify_code(''.join(code)))
+    return ''.join(parts).strip()
+
+
+def _write(path: str, data: bytes):
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as target:
+        target.write(data)
+    os.replace(tmp_path, path)
+
+
+def _read_manifest(path: str) -> Optional[Dict[str, str]]:
+    try:
+        with open(path, encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return None
+
+
+def build_assets(source_dir: Optional[str] = None, output_dir: Optional[str] = None) -> Dict[str, str]:
+    """
+    Собирает бандлы стилей с хэшем содержимого в имени и сжатыми копиями.
+
+    Args:
+        source_dir (Optional[str]): Каталог исходных стилей (по умолчанию ASSETS_SOURCE_DIR).
+        output_dir (Optional[str]): Каталог результата (по умолчанию ASSETS_ROOT).
+
+    Returns:
+        Dict[str, str]: Манифест: логическое имя бандла -> имя собранного файла.
+
+    Notes:
+        Рядом с каждым бандлом записываются .gz и .br (если установлен brotli).
+        Файлы прошлых сборок не удаляются, чтобы страницы, отданные старыми
+        процессами во время выкладки, продолжали получать свои стили; манифест
+        прошлой сборки сохраняется в PREVIOUS_MANIFEST_NAME.
+    """
+    source_dir = source_dir or Config.ASSETS_SOURCE_DIR
+    output_dir = output_dir or Config.ASSETS_ROOT
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(source_dir, source), encoding='utf-8') as source_file:
+                parts.append(minify_css(source_file.read()))
+        data = '\n'.join(parts).encode('utf-8')
+        stem, extension = os.path.splitext(name)
+        filename = '{0}.{1}{2}'.format(stem, hashlib.sha256(data).hexdigest()[:16], extension)
+        path = os.path.join(output_dir, filename)
+        if not os.path.exists(path):
+            _write(path, data)
+            _write(path + '.gz', gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                _write(path + '.br', brotli.compress(data, quality=11))
+        manifest[name] = filename
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = _read_manifest(manifest_path)
+    if previous is not None and previous != manifest:
+        _write(os.path.join(output_dir, PREVIOUS_MANIFEST_NAME), json.dumps(previous, indent=2).encode('utf-8'))
+    _write(manifest_path, json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+
+class AssetManifest:
+    """
+    Сопоставление логических имен бандлов и собранных файлов.
+
+    Манифест читается один раз на процесс. Если сборки еще нет, она выполняется
+    при первом обращении, поэтому приложение работает и без отдельного шага сборки.
+
+    Attributes:
+        root (str): Каталог собранных файлов.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._manifest: Optional[Dict[str, str]] = None
+        self._built: frozenset = frozenset()
+        self._lock = threading.Lock()
+
+    def _built_names(self) -> frozenset:
+        names = set()
+        for manifest_name in (MANIFEST_NAME, PREVIOUS_MANIFEST_NAME):
+            manifest = _read_manifest(os.path.join(self.root, manifest_name))
+            if manifest is not None:
+                names.update(manifest.values())
+        return frozenset(names)
+
+    def _load(self) -> Dict[str, str]:
+        with self._lock:
+            if self._manifest is None:
+                self._manifest = _read_manifest(os.path.join(self.root, MANIFEST_NAME))
+                if self._manifest is None:
+                    logger.info("Манифест стилей не найден, выполняется сборка")
+                    self._manifest = build_assets(output_dir=self.root)
+                self._built = self._built_names()
+            return self._manifest
+
+    def url(self, name: str) -> str:
+        """
+        Возвращает URL собранного бандла.
+
+        Args:
+            name (str): Логическое имя бандла, например 'index.css'.
+
+        Returns:
+            str: URL вида '/assets/index.<хэш>.css'.
+
+        Raises:
+            KeyError: Если бандл с таким именем не описан.
+        """
+        return '/assets/{0}'.format(self._load()[name])
+
+    def is_built(self, filename: str) -> bool:
+        """
+        Проверяет, что файл относится к текущей или прошлой сборке.
+
+        Args:
+            filename (str): Имя файла из URL.
+
+        Returns:
+            bool: True, если имя есть в текущем или прошлом манифесте и файл существует.
+
+        Notes:
+            Сжатые копии и прочие файлы каталога сборки не отдаются по своему имени.
+            Неизвестное имя перечитывает манифесты с диска: во время выкладки
+            старый процесс получает запросы стилей, собранных после его запуска.
+        """
+        self._load()
+        if filename not in self._built:
+            with self._lock:
+                self._built = self._built_names()
+            if filename not in self._built:
+                return False
+        return os.path.isfile(os.path.join(self.root, filename))
+
+    def reload(self):
+        """
+        Сбрасывает прочитанный манифест, например после пересборки.
+        """
+        with self._lock:
+            self._manifest = None
+
+
+def select_encoding(filename: str, root: str, accept_encodings) -> tuple:
+    """
+    Выбирает заранее сжатую копию файла по заголовку Accept-Encoding.
+
+    Args:
+        filename (str): Имя собранного файла.
+        root (str): Каталог собранных файлов.
+        accept_encodings: Разобранный заголовок Accept-Encoding (request.accept_encodings).
+
+    Returns:
+        tuple: Имя файла для отправки и кодировка (None для несжатого файла).
+    """
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding] and os.path.isfile(os.path.join(root, filename + suffix)):
+            return filename + suffix, encoding
+    return filename, None
+
+
+asset_manifest = AssetManifest(Config.ASSETS_ROOT)
@@ -0,0 +1,323 @@
+import fcntl
+import os
+import select
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import sqlalchemy as sa
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from common.lazy import LazyResource
+from common.metrics import record_cache_lookup, record_catalog_invalidation
+from config import Config
+from db.session import get_engine, replica_router
+
+
+class FileNotifier:
+    """
+    Локальная замена LISTEN/NOTIFY для баз без уведомлений (например, SQLite).
+
+    Писатель увеличивает счетчик в общем файле, а фоновый поток каждого процесса
+    периодически проверяет файл и сообщает об изменении каталога.
+
+    Attributes:
+        path (str): Путь к файлу с версией каталога.
+        poll_interval (float): Интервал проверки файла в секундах.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.5):
+        self.path = path
+        self.poll_interval = poll_interval
+
+    def _read(self) -> tuple:
+        try:
+            with open(self.path) as version_file:
+                counter, pid = version_file.read().split(':')
+                return int(counter), int(pid)
+        except (FileNotFoundError, ValueError):
+            return 0, 0
+
+    def publish(self, db_session: Session):
+        """
+        Сообщает всем процессам об изменении каталога.
+
+        Args:
+            db_session (Session): Сессия, в которой было выполнено изменение (не используется).
+
+        Notes:
+            Чтение и увеличение счетчика выполняются под flock на файле path.lock,
+            иначе два писателя могли записать одно и то же значение и слушатель,
+            уже видевший его, пропустил бы второе изменение. Новое значение
+            пишется во временный файл с уникальным именем и атомарно заменяет path.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path) + '.')
+                try:
+                    with os.fdopen(fd, 'w') as version_file:
+                        version_file.write('{0}:{1}'.format(self._read()[0] + 1, os.getpid()))
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def listen(self, callback: Callable[[], None]):
+        """
+        Блокирующий цикл ожидания изменений, вызывает callback при каждом изменении.
+
+        Args:
+            callback (Callable[[], None]): Функция, сбрасывающая локальный кэш.
+        """
+        seen = self._read()
+        while True:
+            time.sleep(self.poll_interval)
+            current = self._read()
+            if current != seen:
+                seen = current
+                # Свой процесс уже сбросил кэш в publish_change
+                if current[1] != os.getpid():
+                    callback()
+
+
+class PostgresNotifier:
+    """
+    Рассылка инвалидации каталога между процессами через PostgreSQL LISTEN/NOTIFY.
+
+    Attributes:
+        channel (str): Имя канала уведомлений.
+        reconnect_delay (float): Пауза перед повторным подключением слушателя.
+    """
+
+    def __init__(self, channel: str, reconnect_delay: float = 1.0):
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+
+    def publish(self, db_session: Session):
+        """
+        Отправляет NOTIFY в канал каталога.
+
+        Args:
+            db_session (Session): Сессия базы данных, через которую отправляется уведомление.
+        """
+        db_session.execute(sa.select(sa.func.pg_notify(self.channel, str(os.getpid()))))
+        db_session.commit()
+
+    def listen(self, callback: Callable[[], None]):
+        """
+        Блокирующий цикл LISTEN на отдельном соединении с переподключением при сбоях.
+
+        Args:
+            callback (Callable[[], None]): Функция, сбрасывающая локальный кэш.
+        """
+        while True:
+            connection = None
+            try:
+                # Отдельное соединение вне пула, чтобы не занимать слот пула навсегда
+                engine = get_engine()
+                connect_args, connect_kwargs = engine.dialect.create_connect_args(engine.url)
+                connection = engine.dialect.dbapi.connect(*connect_args, **connect_kwargs)
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute('LISTEN "{0}"'.format(self.channel))
+                # Уведомления могли быть пропущены, пока слушатель был отключен
+                callback()
+                while True:
+                    if select.select([connection], [], [], 5.0)[0]:
+                        connection.poll()
+                        own_pid = str(os.getpid())
+                        foreign = [n for n in connection.notifies if n.payload != own_pid]
+                        connection.notifies.clear()
+                        # Свой процесс уже сбросил кэш в publish_change
+                        if foreign:
+                            callback()
+            except Exception as err:
+                logger.warning("Слушатель каталога отключился: {0}".format(err))
+                if connection is not None:
+                    connection.close()
+                time.sleep(self.reconnect_delay)
+
+
+class CatalogCache:
+    """
+    Внутрипроцессный кэш снимков каталога, привязанных к версии каталога.
+
+    Значения должны быть независимы от ORM (словари, кортежи), чтобы их можно было
+    безопасно отдавать из разных потоков. Запись считается устаревшей, если версия
+    каталога изменилась или она хранится дольше max_staleness секунд: последнее
+    ограничивает устаревание даже при потере уведомления.
+
+    Attributes:
+        notifier: Рассылка инвалидации (FileNotifier или PostgresNotifier); создается
+            при первом обращении, так как выбор зависит от механизма базы данных.
+        max_entries (int): Максимальное количество снимков в кэше.
+        max_staleness (float): Максимальный возраст снимка в секундах.
+        version (int): Текущая версия каталога в этом процессе.
+        hits (int): Количество попаданий в кэш.
+        misses (int): Количество промахов кэша.
+        invalidations (int): Количество сбросов кэша.
+    """
+
+    def __init__(self, notifier_factory: Callable[[], Any], max_entries: int, max_staleness: float):
+        self._notifier = LazyResource(notifier_factory)
+        self.max_entries = max_entries
+        self.max_staleness = max_staleness
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener_pid: Optional[int] = None
+
+    @property
+    def notifier(self) -> Any:
+        return self._notifier.get()
+
+    def _ensure_listener(self):
+        # Проверка pid перезапускает слушателя в дочерних процессах после fork
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._entries.clear()
+        threading.Thread(
+            target=self.notifier.listen,
+            args=(self.invalidate,),
+            name='catalog-cache-listener',
+            daemon=True
+        ).start()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Возвращает снимок из кэша или загружает его через loader.
+
+        Args:
+            key (Hashable): Ключ снимка (например, параметры страницы).
+            loader (Callable[[], Any]): Функция загрузки снимка из базы данных.
+
+        Returns:
+            Any: Снимок каталога для текущей версии.
+        """
+        hit, value, version, now = self._lookup(key)
+        if hit:
+            return value
+        value = loader()
+        self._store(key, version, now, value)
+        return value
+
+    async def get_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Асинхронный вариант get для загрузчиков-корутин.
+
+        Args:
+            key (Hashable): Ключ снимка.
+            loader (Callable[[], Awaitable[Any]]): Корутина загрузки снимка из базы данных.
+
+        Returns:
+            Any: Снимок каталога для текущей версии.
+        """
+        hit, value, version, now = self._lookup(key)
+        if hit:
+            return value
+        value = await loader()
+        self._store(key, version, now, value)
+        return value
+
+    def _lookup(self, key: Hashable) -> tuple:
+        self._ensure_listener()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None and entry[0] == self.version and now - entry[1] <= self.max_staleness
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                result = True, entry[2], entry[0], now
+            else:
+                self.misses += 1
+                result = False, None, self.version, now
+        record_cache_lookup('catalog', hit)
+        return result
+
+    def _store(self, key: Hashable, version: int, now: float, value: Any):
+        with self._lock:
+            # Если каталог изменился во время загрузки, снимок не сохраняется
+            if version == self.version:
+                self._entries[key] = (version, now, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """
+        Увеличивает версию каталога и сбрасывает все снимки этого процесса.
+
+        Notes:
+            Пока реплики могут не содержать изменение, процесс читает с основной
+            базы, иначе в кэш попал бы снимок со старыми данными и новой версией.
+        """
+        replica_router.note_write()
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            self._entries.clear()
+        record_catalog_invalidation()
+
+    def publish_change(self, db_session: Session):
+        """
+        Сообщает об изменении каталога всем процессам, включая текущий.
+
+        Вызывается писателями каталога после фиксации транзакции.
+
+        Args:
+            db_session (Session): Сессия, в которой было выполнено изменение.
+        """
+        self.invalidate()
+        try:
+            self.notifier.publish(db_session)
+        except Exception as err:
+            logger.warning(
+                "Не удалось разослать инвалидацию каталога: {0}".format(err)
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает счетчики кэша.
+
+        Returns:
+            Dict[str, int]: Версия, размер, попадания, промахи и сбросы кэша.
+        """
+        with self._lock:
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
+
+
+def _create_notifier():
+    if get_engine().dialect.name == 'postgresql':
+        return PostgresNotifier(Config.CATALOG_NOTIFY_CHANNEL)
+    return FileNotifier(
+        Config.CATALOG_VERSION_FILE
+        or os.path.join(tempfile.gettempdir(), 'cheese_catalog.version')
+    )
+
+
+catalog_cache = CatalogCache(
+    _create_notifier,
+    max_entries=Config.CATALOG_CACHE_SIZE,
+    max_staleness=Config.CATALOG_CACHE_MAX_STALENESS
+)
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from common.cache import catalog_cache
+from common.metrics import record_cache_lookup
+from config import Config
+
+
+class FragmentCache:
+    """
+    LRU-кэш отрендеренных фрагментов шаблонов с ограничением по размеру в байтах.
+
+    Фрагменты привязаны к версии каталога: при ее изменении кэш очищается
+    целиком, а возраст фрагмента, как и у снимков каталога, не превышает max_age.
+
+    Attributes:
+        max_bytes (int): Максимальный суммарный размер фрагментов в байтах (UTF-8).
+        max_age (float): Максимальный возраст фрагмента в секундах.
+        size (int): Текущий суммарный размер фрагментов в байтах.
+        hits (int): Количество попаданий в кэш.
+        misses (int): Количество промахов кэша.
+    """
+
+    def __init__(self, max_bytes: int, max_age: float, version: Callable[[], int]):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._version = version
+        self._entries_version: Optional[int] = None
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def get(self, key: Hashable, render: Callable[[], str]) -> Markup:
+        """
+        Возвращает фрагмент из кэша или рендерит его.
+
+        Args:
+            key (Hashable): Ключ фрагмента (имя шаблона и параметры страницы).
+            render (Callable[[], str]): Функция рендеринга фрагмента.
+
+        Returns:
+            Markup: HTML фрагмента.
+        """
+        version = self._version()
+        now = time.monotonic()
+        with self._lock:
+            if self._entries_version != version:
+                self._clear()
+                self._entries_version = version
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.max_age:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache_lookup('fragment', True)
+                return entry[1]
+            self.misses += 1
+        record_cache_lookup('fragment', False)
+        value = Markup(render())
+        size = len(value.encode('utf-8'))
+        current_version = self._version()
+        with self._lock:
+            # Фрагмент, отрендеренный по устаревшему каталогу, не сохраняется
+            if current_version == version == self._entries_version and size <= self.max_bytes:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self.size -= previous[2]
+                self._entries[key] = (now, value, size)
+                self.size += size
+                while self.size > self.max_bytes:
+                    self.size -= self._entries.popitem(last=False)[1][2]
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает счетчики кэша.
+
+        Returns:
+            Dict[str, int]: Размер в байтах, количество фрагментов, попадания и промахи.
+        """
+        with self._lock:
+            return {
+                'bytes': self.size,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+class FragmentCacheExtension(Extension):
+    """
+    Тег Jinja {% cache ключ, ... %} ... {% endcache %} для кэширования фрагментов.
+
+    Ключом служат имя шаблона и значения выражений после тега. Кэш задается
+    атрибутом окружения fragment_cache; если он не задан, блок рендерится всегда.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name)]
+        while parser.stream.current.type != 'block_end':
+            if len(args) > 1:
+                parser.stream.expect('comma')
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.Tuple(args, 'load')]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key: tuple, caller) -> str:
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return cache.get(key, caller)
+
+
+fragment_cache = FragmentCache(
+    max_bytes=Config.FRAGMENT_CACHE_MAX_BYTES,
+    max_age=Config.CATALOG_CACHE_MAX_STALENESS,
+    version=lambda: catalog_cache.version
+)
@@ -0,0 +1,233 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import bcrypt
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from config import Config
+
+# bcrypt учитывает только первые 72 байта пароля, а остальные молча отбрасывает
+MAX_PASSWORD_BYTES = 72
+
+
+def password_too_long(password: str) -> bool:
+    """
+    Проверяет, превышает ли пароль MAX_PASSWORD_BYTES байт в UTF-8.
+
+    Args:
+        password (str): Пароль в открытом виде.
+
+    Returns:
+        bool: True, если хэш bcrypt не учел бы часть пароля.
+    """
+    return len(password.encode('utf-8')) > MAX_PASSWORD_BYTES
+
+
+class BcryptHasher:
+    """
+    Хэширование паролей через bcrypt.
+
+    Attributes:
+        rounds (int): Логарифм количества раундов (cost).
+    """
+
+    name = 'bcrypt'
+
+    def __init__(self, rounds: int):
+        self.rounds = rounds
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith(('$2a$', '$2b$', '$2y$'))
+
+    def hash(self, password: str) -> str:
+        if password_too_long(password):
+            raise ValueError('Пароль длиннее {0} байт не может быть захэширован bcrypt'.format(MAX_PASSWORD_BYTES))
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('ascii')
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('ascii'))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return int(hashed.split('$')[2]) != self.rounds
+
+
+class WerkzeugHasher:
+    """
+    Хэширование паролей через werkzeug (pbkdf2), проверяет также хэши scrypt.
+
+    Attributes:
+        iterations (int): Количество итераций PBKDF2.
+    """
+
+    name = 'pbkdf2'
+
+    def __init__(self, iterations: int):
+        self.iterations = iterations
+        self.method = 'pbkdf2:sha256:{0}'.format(iterations)
+
+    def identify(self, hashed: str) -> bool:
+        return hashed.startswith(('pbkdf2:', 'scrypt:'))
+
+    def hash(self, password: str) -> str:
+        return generate_password_hash(password, method=self.method)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return check_password_hash(hashed, password)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return hashed.split('$', 1)[0] != self.method
+
+
+def create_hasher(name: str):
+    """
+    Создает хэшер по имени схемы с параметрами из конфигурации.
+
+    Args:
+        name (str): Имя схемы: bcrypt или pbkdf2.
+
+    Returns:
+        Хэшер выбранной схемы.
+
+    Raises:
+        ValueError: Если схема неизвестна.
+    """
+    if name == BcryptHasher.name:
+        return BcryptHasher(Config.PASSWORD_BCRYPT_ROUNDS)
+    if name == WerkzeugHasher.name:
+        return WerkzeugHasher(Config.PASSWORD_PBKDF2_ITERATIONS)
+    raise ValueError('Неизвестная схема хэширования: {0}'.format(name))
+
+
+HASHERS = {name: create_hasher(name) for name in (BcryptHasher.name, WerkzeugHasher.name)}
+default_hasher = HASHERS[Config.PASSWORD_HASHER]
+
+
+def _hash(password: str) -> str:
+    return default_hasher.hash(password)
+
+
+def _verify(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    hasher = next((h for h in HASHERS.values() if h.identify(hashed)), None)
+    if hasher is None or not hasher.verify(password, hashed):
+        return False, None
+    if hasher is not default_hasher or hasher.needs_rehash(hashed):
+        if default_hasher is HASHERS[BcryptHasher.name] and password_too_long(password):
+            # Пересчет в bcrypt обрезал бы пароль: остается прежний хэш
+            return True, None
+        return True, default_hasher.hash(password)
+    return True, None
+
+
+class HashingPool:
+    """
+    Ограниченный пул процессов для хэширования паролей.
+
+    Хэширование выполняется вне потока запроса и вне GIL процесса приложения.
+    Количество одновременно ожидающих задач ограничено, поэтому всплеск входов
+    притормаживает запросы, а не копит бесконечную очередь.
+
+    Attributes:
+        workers (int): Количество процессов; 0 означает хэширование в текущем потоке.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(workers, 1) * 2)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Пул не переживает fork, поэтому в дочернем процессе создается заново
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def run(self, func, *args):
+        """
+        Выполняет функцию хэширования в пуле процессов.
+
+        Args:
+            func: Функция уровня модуля.
+            *args: Аргументы функции.
+
+        Returns:
+            Результат функции.
+        """
+        if self.workers <= 0:
+            return func(*args)
+        with self._slots:
+            return self._get_executor().submit(func, *args).result()
+
+    def map(self, func, items: List) -> List:
+        """
+        Применяет функцию к элементам, распределяя их по всем процессам пула.
+
+        Args:
+            func: Функция уровня модуля с одним аргументом.
+            items (List): Аргументы.
+
+        Returns:
+            List: Результаты в порядке аргументов.
+
+        Notes:
+            Предназначен для пакетных задач вне запросов (загрузка пользователей):
+            ограничение одновременных задач run здесь не действует, элементы
+            передаются процессам частями, чтобы не платить за передачу каждого.
+        """
+        if self.workers <= 0 or len(items) <= 1:
+            return [func(item) for item in items]
+        chunksize = max(1, len(items) // (self.workers * 4))
+        return list(self._get_executor().map(func, items, chunksize=chunksize))
+
+
+hashing_pool = HashingPool(Config.PASSWORD_HASH_WORKERS)
+
+
+def hash_password(password: str) -> str:
+    """
+    Хэширует пароль схемой PASSWORD_HASHER.
+
+    Args:
+        password (str): Пароль в открытом виде.
+
+    Returns:
+        str: Хэш пароля.
+    """
+    return hashing_pool.run(_hash, password)
+
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """
+    Хэширует пачку паролей параллельно на всех процессах пула.
+
+    Args:
+        passwords (List[str]): Пароли в открытом виде.
+
+    Returns:
+        List[str]: Хэши в порядке паролей.
+    """
+    return hashing_pool.map(_hash, passwords)
+
+
+def verify_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Проверяет пароль и при необходимости пересчитывает хэш.
+
+    Args:
+        password (str): Пароль в открытом виде.
+        hashed (str): Сохраненный хэш пароля.
+
+    Returns:
+        Tuple[bool, Optional[str]]: Результат проверки и новый хэш, если сохраненный
+        создан другой схемой или с другой стоимостью (иначе None).
+    """
+    return hashing_pool.run(_verify, password, hashed)
@@ -0,0 +1,144 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import flask_login
+from sqlalchemy import event
+
+from common.metrics import record_cache_lookup
+from config import Config
+from db.models import User
+
+
+class UserIdentity(flask_login.UserMixin):
+    """
+    Снимок пользователя с полями, которые нужны запросам и шаблонам.
+
+    Не связан с сессией базы данных, поэтому может разделяться между потоками.
+
+    Attributes:
+        id (uuid.UUID): Идентификатор пользователя.
+        username (str): Имя пользователя.
+        is_admin (bool): Флаг администратора.
+    """
+
+    def __init__(self, id: uuid.UUID, username: str, is_admin: bool):
+        self.id = id
+        self.username = username
+        self.is_admin = bool(is_admin)
+
+    @classmethod
+    def from_user(cls, user: User) -> 'UserIdentity':
+        """
+        Создает снимок из модели пользователя.
+
+        Args:
+            user (User): Модель пользователя.
+
+        Returns:
+            UserIdentity: Снимок пользователя.
+        """
+        return cls(user.id, user.username, user.is_admin)
+
+
+class UserIdentityCache:
+    """
+    Кэш снимков пользователей процесса с ограниченным временем жизни.
+
+    Заменяет запрос к базе данных в load_user на каждый запрос авторизованного
+    пользователя. Изменения пользователя через ORM сбрасывают запись сразу, а
+    изменения из других процессов видны не позже чем через ttl секунд.
+
+    Attributes:
+        ttl (float): Время жизни записи в секундах.
+        max_size (int): Максимальное количество записей.
+        hits (int): Количество попаданий, то есть сэкономленных запросов к базе данных.
+        misses (int): Количество промахов.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: uuid.UUID, loader: Callable[[], Optional[User]]) -> Optional[UserIdentity]:
+        """
+        Возвращает снимок пользователя, загружая его при промахе.
+
+        Args:
+            user_id (uuid.UUID): Идентификатор пользователя.
+            loader (Callable[[], Optional[User]]): Функция загрузки пользователя из базы данных.
+
+        Returns:
+            Optional[UserIdentity]: Снимок пользователя или None, если пользователь не найден.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                record_cache_lookup('user_identity', True)
+                return entry[1]
+            self.misses += 1
+        record_cache_lookup('user_identity', False)
+        user = loader()
+        if user is None:
+            return None
+        identity = UserIdentity.from_user(user)
+        self.put(identity)
+        return identity
+
+    def put(self, identity: UserIdentity):
+        """
+        Сохраняет снимок пользователя.
+
+        Args:
+            identity (UserIdentity): Снимок пользователя.
+        """
+        with self._lock:
+            self._entries[identity.id] = (time.monotonic() + self.ttl, identity)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: uuid.UUID):
+        """
+        Удаляет снимок пользователя из кэша.
+
+        Args:
+            user_id (uuid.UUID): Идентификатор пользователя.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает счетчики кэша.
+
+        Returns:
+            Dict[str, int]: Размер кэша, попадания (сэкономленные запросы) и промахи.
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+user_identities = UserIdentityCache(
+    ttl=Config.USER_CACHE_TTL,
+    max_size=Config.USER_CACHE_SIZE
+)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user_identity(mapper, connection, target: User):
+    user_identities.invalidate(target.id)
@@ -0,0 +1,222 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+import sqlalchemy as sa
+from loguru import logger
+
+from common.cache import catalog_cache
+from common.media import VARIANT_FORMAT, VARIANTS
+from config import Config
+from db.models import Cheese
+from db.session import SessionLocal
+
+
+def media_path(key: str, variant: str) -> str:
+    """
+    Возвращает путь к файлу варианта изображения.
+
+    Args:
+        key (str): Хэш содержимого исходного изображения.
+        variant (str): Имя варианта из VARIANTS.
+
+    Returns:
+        str: Путь к файлу внутри MEDIA_ROOT.
+    """
+    return os.path.join(Config.MEDIA_ROOT, variant, '{0}.{1}'.format(key, VARIANT_FORMAT))
+
+
+def fetch_image(source: str) -> bytes:
+    """
+    Загружает исходное изображение по URL или из локального файла.
+
+    Args:
+        source (str): http(s)-URL, file-URL или путь к файлу.
+
+    Returns:
+        bytes: Содержимое изображения.
+
+    Raises:
+        ValueError: Если изображение больше IMAGE_MAX_BYTES.
+    """
+    scheme = urllib.parse.urlparse(source).scheme
+    if scheme in ('http', 'https'):
+        request = urllib.request.Request(source, headers={'User-Agent': 'cheese-shop-image-cache'})
+        with urllib.request.urlopen(request, timeout=Config.IMAGE_FETCH_TIMEOUT) as response:
+            data = response.read(Config.IMAGE_MAX_BYTES + 1)
+    else:
+        path = urllib.parse.urlparse(source).path if scheme == 'file' else source
+        with open(path, 'rb') as image_file:
+            data = image_file.read(Config.IMAGE_MAX_BYTES + 1)
+    if len(data) > Config.IMAGE_MAX_BYTES:
+        raise ValueError('Изображение {0} слишком большое'.format(source))
+    return data
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '{0}.{1}.tmp'.format(path, threading.get_ident())
+    with open(tmp_path, 'wb') as target:
+        target.write(data)
+    os.replace(tmp_path, path)
+
+
+def ingest_image(source: str) -> str:
+    """
+    Сохраняет изображение локально и создает его уменьшенные варианты.
+
+    Args:
+        source (str): URL или путь к исходному изображению.
+
+    Returns:
+        str: Хэш содержимого, под которым сохранены варианты.
+
+    Notes:
+        Имена файлов зависят только от содержимого, поэтому повторная загрузка
+        того же изображения не создает новых файлов, а их можно кэшировать навсегда.
+    """
+    # Pillow нужен только потокам обработки изображений, а не импорту приложения
+    from PIL import Image, ImageOps
+
+    data = fetch_image(source)
+    key = hashlib.sha256(data).hexdigest()[:32]
+    if all(os.path.exists(media_path(key, variant)) for variant in VARIANTS):
+        return key
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    for variant, width in VARIANTS.items():
+        resized = image
+        if image.width > width:
+            resized = image.resize(
+                (width, max(1, round(image.height * width / image.width))),
+                Image.LANCZOS
+            )
+        buffer = io.BytesIO()
+        resized.save(buffer, VARIANT_FORMAT, quality=Config.IMAGE_QUALITY, method=4)
+        _write_atomic(media_path(key, variant), buffer.getvalue())
+    return key
+
+
+class ImagePipeline:
+    """
+    Фоновая обработка изображений каталога.
+
+    Загрузка выполняется в пуле потоков: сетевое ожидание, а также уменьшение и
+    кодирование в Pillow отпускают GIL. Количество ожидающих задач ограничено,
+    поэтому массовая загрузка каталога не копит в памяти бесконечную очередь.
+
+    Изменение каталога публикуется не после каждого изображения, а когда очередь
+    опустела, и во время долгой загрузки не чаще раза в publish_interval секунд:
+    каждая публикация сбрасывает кэши всех процессов и на время направляет их
+    чтение на основную базу.
+
+    Attributes:
+        workers (int): Количество потоков обработки.
+        publish_interval (float): Минимальный интервал публикации изменений при непустой очереди.
+    """
+
+    def __init__(self, workers: int, publish_interval: float = 5.0):
+        self.workers = workers
+        self.publish_interval = publish_interval
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(workers * 4)
+        self._scheduled: set = set()
+        self._changed = False
+        self._last_publish = time.monotonic()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='image-pipeline')
+                self._executor_pid = os.getpid()
+                self._scheduled = set()
+            return self._executor
+
+    def _process(self, source: str):
+        changed = False
+        try:
+            key = ingest_image(source)
+            db_session = SessionLocal()
+            try:
+                result = db_session.execute(
+                    sa.update(Cheese)
+                    .where(Cheese.image_path == source)
+                    .where(sa.or_(Cheese.image_key.is_(None), Cheese.image_key != key))
+                    .values(image_key=key)
+                )
+                db_session.commit()
+                changed = result.rowcount > 0
+            finally:
+                db_session.close()
+        except Exception as err:
+            logger.warning("Не удалось обработать изображение {0}: {1}".format(source, err))
+        finally:
+            with self._lock:
+                self._scheduled.discard(source)
+                self._changed = self._changed or changed
+                now = time.monotonic()
+                publish = self._changed and (
+                    not self._scheduled or now - self._last_publish >= self.publish_interval
+                )
+                if publish:
+                    self._changed = False
+                    self._last_publish = now
+            self._slots.release()
+        if publish:
+            self._publish()
+
+    def _publish(self):
+        db_session = SessionLocal()
+        try:
+            catalog_cache.publish_change(db_session)
+        finally:
+            db_session.close()
+
+    def schedule(self, sources: Iterable[Optional[str]]) -> Dict[str, Future]:
+        """
+        Ставит изображения в очередь на загрузку и обработку.
+
+        Args:
+            sources (Iterable[Optional[str]]): Пути к изображениям из Cheese.image_path.
+
+        Returns:
+            Dict[str, Future]: Задачи по каждому новому пути.
+
+        Notes:
+            После обработки у всех сыров с этим image_path заполняется image_key;
+            изменение каталога публикуется, только если image_key действительно
+            изменился хотя бы у одного сыра.
+        """
+        executor = self._get_executor()
+        futures = {}
+        for source in sources:
+            if not source:
+                continue
+            with self._lock:
+                if source in self._scheduled:
+                    continue
+                self._scheduled.add(source)
+            self._slots.acquire()
+            futures[source] = executor.submit(self._process, source)
+        return futures
+
+    def wait(self):
+        """
+        Дожидается завершения всех поставленных задач.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+image_pipeline = ImagePipeline(Config.IMAGE_WORKERS)
@@ -0,0 +1,45 @@
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class LazyResource(Generic[T]):
+    """
+    Ресурс процесса, создаваемый при первом обращении.
+
+    Импорт модуля с таким ресурсом не открывает файлов и соединений и не
+    разбирает настройки подключения: это происходит в первом запросе или при
+    прогреве, а не при загрузке кода (в том числе в мастер-процессе gunicorn,
+    скриптах и проверке времени импорта).
+
+    Attributes:
+        factory (Callable[[], T]): Функция создания ресурса.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._created = False
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        """
+        Флаг того, что ресурс уже создан.
+        """
+        return self._created
+
+    def get(self) -> T:
+        """
+        Возвращает ресурс, создавая его при первом вызове.
+
+        Returns:
+            T: Ресурс, общий для всех потоков процесса.
+        """
+        if not self._created:
+            with self._lock:
+                if not self._created:
+                    self._value = self.factory()
+                    self._created = True
+        return self._value
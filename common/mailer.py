@@ -0,0 +1,375 @@
+import datetime
+import os
+import smtplib
+import threading
+import time
+from typing import Dict, List, Optional
+
+import sqlalchemy as sa
+from loguru import logger
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy.orm import Session
+
+from common.metrics import record_mail_outbox, register_scrape_collector
+from common.utils import send_email_message, smtp_connect, smtp_generator
+from config import UserConfig
+from db.models import EmailOutbox
+from db.session import SessionLocal
+
+# Ошибки, после которых соединение нельзя использовать повторно
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, OSError)
+
+
+class MailOutbox:
+    """
+    Надежная очередь писем в базе данных с пулом фоновых отправителей.
+
+    Запрос только сохраняет письмо в таблицу email_outbox. Отправители работают
+    в отдельном процессе mail_worker.py (или, с MAIL_SENDERS_ENABLED, в рабочих
+    процессах gunicorn), забирают письма пачками и отправляют их через
+    долгоживущие SMTP-соединения, повторяя неудачные попытки с экспоненциальной
+    задержкой.
+
+    Попыткой письма считается только ответ SMTP-сервера на это письмо. Если
+    сервер недоступен или соединение оборвалось, письма откладываются с
+    растущей, но ограниченной max_backoff задержкой без увеличения счетчика
+    попыток, поэтому простой сервера не переводит очередь в failed.
+
+    Attributes:
+        workers (int): Количество потоков-отправителей в процессе.
+        batch_size (int): Количество писем, забираемых из очереди за раз.
+        max_attempts (int): Максимальное количество попыток отправки письма.
+        retry_backoff (float): Базовая задержка повторной отправки в секундах.
+        max_backoff (float): Максимальная задержка повторной отправки в секундах.
+        claim_timeout (float): Время, после которого незавершенная отправка считается брошенной.
+        poll_interval (float): Интервал проверки очереди при отсутствии новых писем.
+        idle_timeout (float): Время простоя, после которого SMTP-соединение закрывается.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        batch_size: int,
+        max_attempts: int,
+        retry_backoff: float,
+        max_backoff: float,
+        claim_timeout: float,
+        poll_interval: float,
+        idle_timeout: float
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._started_pid: Optional[int] = None
+        # Количество подряд неудачных подключений к SMTP-серверу в процессе
+        self._outages = 0
+        self._stats: Dict[str, float] = {
+            'enqueued': 0,
+            'sent': 0,
+            'retried': 0,
+            'failed': 0,
+            'batches': 0,
+            'connections': 0,
+            'send_seconds': 0.0
+        }
+
+    def _count(self, name: str, value: float = 1):
+        with self._lock:
+            self._stats[name] += value
+        record_mail_outbox(name, value)
+
+    def enqueue(self, db_session: Session, username: str, recipient: str):
+        """
+        Ставит письмо обратной связи в очередь на отправку.
+
+        Args:
+            db_session (Session): Сессия базы данных.
+            username (str): Имя пользователя, которому отправляется сообщение.
+            recipient (str): Email-адрес получателя.
+        """
+        db_session.add(EmailOutbox(username=username, recipient=recipient))
+        db_session.commit()
+        self._count('enqueued')
+        # Будит отправителей, если они работают в этом же процессе; иначе письмо
+        # заберут в пределах poll_interval
+        self._wakeup.set()
+
+    def ensure_started(self):
+        """
+        Запускает workers отправителей в текущем процессе, если они еще не запущены.
+
+        Notes:
+            Потоки не переживают fork, поэтому проверка идет по pid процесса.
+        """
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+        for number in range(self.workers):
+            threading.Thread(
+                target=self._run,
+                name='mail-outbox-{0}'.format(number),
+                daemon=True
+            ).start()
+
+    def _claim(self) -> List[sa.Row]:
+        """
+        Забирает пачку готовых к отправке писем.
+
+        Одним UPDATE ... RETURNING письма переводятся в статус sending с арендой
+        на claim_timeout секунд; в PostgreSQL строки выбираются с SKIP LOCKED,
+        поэтому отправители из разных процессов не ждут друг друга.
+        """
+        now = datetime.datetime.utcnow()
+        outbox = EmailOutbox.__table__
+        due = (
+            sa.select(outbox.c.id)
+            .where(
+                outbox.c.status.in_(('pending', 'sending')),
+                outbox.c.next_attempt_at <= now
+            )
+            .order_by(outbox.c.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        claim = (
+            outbox.update()
+            .where(outbox.c.id.in_(due), outbox.c.next_attempt_at <= now)
+            .values(
+                status='sending',
+                next_attempt_at=now + datetime.timedelta(seconds=self.claim_timeout)
+            )
+            .returning(outbox.c.id, outbox.c.username, outbox.c.recipient, outbox.c.attempts)
+        )
+        db_session = SessionLocal()
+        try:
+            rows = db_session.execute(claim).all()
+            db_session.commit()
+            return rows
+        finally:
+            db_session.close()
+
+    def _complete(self, sent: List, failures: List[tuple]):
+        """
+        Сохраняет результаты отправки пачки одной транзакцией.
+
+        Args:
+            sent (List): Идентификаторы отправленных писем.
+            failures (List[tuple]): Кортежи (строка очереди, ошибка, постоянная ли ошибка, считать ли попытку).
+
+        Notes:
+            Незасчитанная попытка - сбой соединения, а не ответ на письмо: задержка
+            растет с количеством подряд неудачных подключений, а не с attempts.
+        """
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            outages = self._outages
+        db_session = SessionLocal()
+        try:
+            if sent:
+                db_session.execute(
+                    sa.update(EmailOutbox)
+                    .where(EmailOutbox.id.in_(sent))
+                    .values(status='sent', sent_at=now, attempts=EmailOutbox.attempts + 1)
+                )
+            for row, error, permanent, counted in failures:
+                attempts = row.attempts + 1 if counted else row.attempts
+                if permanent or attempts >= self.max_attempts:
+                    values = dict(status='failed', attempts=attempts)
+                    self._count('failed')
+                else:
+                    delay = min(
+                        self.retry_backoff * 2 ** (max(attempts - 1, 0) if counted else outages),
+                        self.max_backoff
+                    )
+                    values = dict(
+                        status='pending',
+                        attempts=attempts,
+                        next_attempt_at=now + datetime.timedelta(seconds=delay)
+                    )
+                    self._count('retried')
+                db_session.execute(
+                    sa.update(EmailOutbox)
+                    .where(EmailOutbox.id == row.id)
+                    .values(last_error=str(error)[:1000], **values)
+                )
+            db_session.commit()
+        finally:
+            db_session.close()
+
+    def _deliver(self, email_server: smtplib.SMTP, rows: List[sa.Row]):
+        """
+        Отправляет пачку писем через открытое соединение.
+
+        Raises:
+            OSError: Если соединение потеряно; результаты пачки к этому моменту уже сохранены.
+        """
+        sent, failures = [], []
+        connection_error = None
+        started = time.perf_counter()
+        for row in rows:
+            if connection_error is not None:
+                # Письмо не отправлялось, попытка не засчитывается
+                failures.append((row, connection_error, False, False))
+                continue
+            try:
+                send_email_message(email_server, row.username, row.recipient)
+            except smtplib.SMTPRecipientsRefused as err:
+                # Ответ 4xx на адрес временный (например, greylisting), навсегда отклоняет только 5xx
+                permanent = all(code >= 500 for code, _ in err.recipients.values())
+                failures.append((row, err, permanent, True))
+            except smtplib.SMTPResponseException as err:
+                failures.append((row, err, err.smtp_code >= 500, True))
+            except CONNECTION_ERRORS as err:
+                connection_error = err
+                failures.append((row, err, False, False))
+            else:
+                sent.append(row.id)
+        self._count('send_seconds', time.perf_counter() - started)
+        self._count('sent', len(sent))
+        self._count('batches')
+        self._complete(sent, failures)
+        if connection_error is not None:
+            raise connection_error
+
+    def _wait_for_rows(self, timeout: float) -> List[sa.Row]:
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self._claim()
+            remaining = deadline - time.monotonic()
+            if rows or remaining <= 0:
+                return rows
+            self._wakeup.wait(min(remaining, self.poll_interval))
+            self._wakeup.clear()
+
+    def deliver_pending(self, timeout: float) -> int:
+        """
+        Один проход отправителя: ждет готовые письма и отправляет их через одно соединение.
+
+        Args:
+            timeout (float): Время ожидания первых писем в секундах.
+
+        Returns:
+            int: Количество обработанных писем.
+
+        Raises:
+            Exception: Ошибка подключения или отправки; результаты писем к этому моменту уже сохранены.
+        """
+        rows = self._wait_for_rows(timeout)
+        processed = 0
+        try:
+            if not rows:
+                return processed
+            with smtp_generator(smtp_connect()) as email_server:
+                self._count('connections')
+                with self._lock:
+                    self._outages = 0
+                while rows:
+                    # Результаты пачки сохраняет _deliver, даже если соединение оборвалось
+                    batch, rows = rows, []
+                    processed += len(batch)
+                    self._deliver(email_server, batch)
+                    # Соединение остается открытым, пока в очереди появляются письма
+                    rows = self._wait_for_rows(self.idle_timeout)
+        except Exception as err:
+            if rows:
+                try:
+                    # Письма не дошли до сервера: попытка не засчитывается
+                    self._complete([], [(row, err, False, False) for row in rows])
+                except Exception as complete_err:
+                    logger.error("Не удалось сохранить результат отправки: {0}".format(complete_err))
+            with self._lock:
+                self._outages += 1
+            raise
+        return processed
+
+    def _run(self):
+        while True:
+            try:
+                self.deliver_pending(self.poll_interval)
+            except Exception as err:
+                logger.error("Ошибка отправки писем из очереди: {0}".format(err))
+                time.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Возвращает метрики доставки в текущем процессе.
+
+        Returns:
+            Dict[str, float]: Счетчики поставленных, отправленных, повторных и
+            неудачных писем, пачек, SMTP-соединений и суммарное время отправки.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    @staticmethod
+    def queue_depth(db_session: Session) -> Dict[str, int]:
+        """
+        Возвращает количество писем в очереди по статусам.
+
+        Args:
+            db_session (Session): Сессия базы данных.
+
+        Returns:
+            Dict[str, int]: Количество писем для каждого статуса.
+        """
+        rows = db_session.execute(
+            sa.select(EmailOutbox.status, sa.func.count())
+            .group_by(EmailOutbox.status)
+        ).all()
+        return {status: count for status, count in rows}
+
+
+mail_outbox = MailOutbox(
+    workers=UserConfig.MAIL_WORKERS,
+    batch_size=UserConfig.MAIL_BATCH_SIZE,
+    max_attempts=UserConfig.MAIL_MAX_ATTEMPTS,
+    retry_backoff=UserConfig.MAIL_RETRY_BACKOFF,
+    max_backoff=UserConfig.MAIL_MAX_RETRY_BACKOFF,
+    claim_timeout=UserConfig.MAIL_CLAIM_TIMEOUT,
+    poll_interval=UserConfig.MAIL_POLL_INTERVAL,
+    idle_timeout=UserConfig.MAIL_SMTP_IDLE_TIMEOUT
+)
+
+
+class MailQueueCollector:
+    """
+    Метрика mail_outbox_messages: количество писем в очереди по статусам.
+
+    Значение общее для всех процессов, поэтому оно вычисляется запросом к базе
+    данных при опросе /metrics, а не суммируется по процессам.
+    """
+
+    STATUSES = ('pending', 'sending', 'sent', 'failed')
+
+    def _family(self) -> GaugeMetricFamily:
+        return GaugeMetricFamily('mail_outbox_messages', 'Письма в очереди по статусам', labels=('status',))
+
+    def describe(self):
+        yield self._family()
+
+    def collect(self):
+        db_session = SessionLocal()
+        try:
+            depth = MailOutbox.queue_depth(db_session)
+        except Exception as err:
+            logger.warning("Не удалось получить длину очереди писем: {0}".format(err))
+            return
+        finally:
+            db_session.close()
+        family = self._family()
+        for status in sorted(set(self.STATUSES) | set(depth)):
+            family.add_metric((status,), depth.get(status, 0))
+        yield family
+
+
+register_scrape_collector(MailQueueCollector())
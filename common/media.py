@@ -0,0 +1,27 @@
+from typing import Dict
+
+# Ширина вариантов изображения в пикселях
+VARIANTS: Dict[str, int] = {
+    'thumb': 160,
+    'card': 480,
+    'full': 1200
+}
+VARIANT_FORMAT = 'webp'
+
+
+def media_url(key: str, variant: str) -> str:
+    """
+    Возвращает URL варианта изображения.
+
+    Args:
+        key (str): Хэш содержимого исходного изображения.
+        variant (str): Имя варианта из VARIANTS.
+
+    Returns:
+        str: URL, обслуживаемый маршрутом '/media/<variant>/<filename>'.
+
+    Notes:
+        Модуль не зависит от приложения и базы данных, поэтому его импортируют
+        и db.models, и common.images.
+    """
+    return '/media/{0}/{1}.{2}'.format(variant, key, VARIANT_FORMAT)
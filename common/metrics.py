@@ -0,0 +1,269 @@
+import os
+import threading
+import time
+
+from flask import Flask, Response, request
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry,
+                               Counter, Gauge, Histogram, generate_latest)
+from prometheus_client import multiprocess
+
+from db.session import engine_created, pool_stats, replica_router
+
+# При заданной PROMETHEUS_MULTIPROC_DIR значения пишутся в mmap-файлы этого
+# каталога, и /metrics любого процесса отдает сумму по всем процессам
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+POOL_STATS_INTERVAL = 1.0
+
+REQUESTS = Counter(
+    'http_requests_total', 'Количество HTTP-запросов', ('endpoint', 'method', 'status')
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Длительность обработки HTTP-запроса', ('endpoint', 'method'),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+SMTP_SENDS = Counter(
+    'smtp_sends_total', 'Результаты отправки писем через SMTP', ('outcome',)
+)
+TOKEN_FAILURES = Counter(
+    'token_verification_failures_total', 'Отказы в проверке JWT токена', ('reason',)
+)
+AUTH_RATE_LIMITED = Counter(
+    'auth_rate_limited_total', 'Попытки входа и регистрации, отклоненные ограничителем', ('endpoint', 'key')
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total', 'Обращения к кэшам процесса; hit - сэкономленная загрузка', ('cache', 'result')
+)
+CATALOG_INVALIDATIONS = Counter(
+    'catalog_cache_invalidations_total', 'Сбросы кэша каталога'
+)
+MAIL_OUTBOX_EVENTS = Counter(
+    'mail_outbox_events_total', 'События очереди писем: enqueued, sent, retried, failed, batches, connections',
+    ('event',)
+)
+MAIL_SEND_SECONDS = Counter(
+    'mail_outbox_send_seconds_total', 'Суммарное время отправки пачек писем'
+)
+DB_POOL = Gauge(
+    'db_pool_connections', 'Соединения пула базы данных', ('state',), multiprocess_mode='livesum'
+)
+DB_POOL_CHECKOUTS = Counter(
+    'db_pool_checkouts', 'Выдачи соединений из пула'
+)
+DB_POOL_WAIT = Counter(
+    'db_pool_wait_seconds', 'Суммарное ожидание свободного соединения'
+)
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts', 'Количество превышений pool_timeout'
+)
+DB_REPLICA_LAG = Gauge(
+    'db_replica_lag_seconds', 'Отставание реплики для чтения; -1 - реплика недоступна', ('replica',),
+    multiprocess_mode='livemax'
+)
+
+_last_pool_update = [0.0]
+# Накопленные значения пула на момент прошлого обновления: счетчики увеличиваются на разницу.
+# pid - процесс, в котором они получены: после fork пул и значения начинаются с нуля
+_last_pool_totals = {'pid': os.getpid(), 'wait_count': 0, 'wait_seconds': 0.0, 'timeouts': 0}
+_pool_totals_lock = threading.Lock()
+
+# Коллекторы, значения которых вычисляются при опросе /metrics, а не накапливаются процессами
+_scrape_collectors = []
+
+
+def record_smtp_send(outcome: str):
+    """
+    Учитывает результат отправки письма.
+
+    Args:
+        outcome (str): sent, refused, rejected или connection_error.
+    """
+    SMTP_SENDS.labels(outcome).inc()
+
+
+def record_token_failure(reason: str):
+    """
+    Учитывает отказ в проверке токена.
+
+    Args:
+        reason (str): missing, expired или invalid.
+    """
+    TOKEN_FAILURES.labels(reason).inc()
+
+
+def record_auth_rate_limited(endpoint: str, key: str):
+    """
+    Учитывает попытку, отклоненную ограничителем входа.
+
+    Args:
+        endpoint (str): login, register или api_token.
+        key (str): Исчерпанная корзина: user или ip.
+    """
+    AUTH_RATE_LIMITED.labels(endpoint, key).inc()
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """
+    Учитывает обращение к кэшу процесса.
+
+    Args:
+        cache (str): catalog, fragment или user_identity.
+        hit (bool): Значение найдено в кэше.
+    """
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_catalog_invalidation():
+    """
+    Учитывает сброс кэша каталога.
+    """
+    CATALOG_INVALIDATIONS.inc()
+
+
+def record_mail_outbox(event: str, value: float = 1):
+    """
+    Учитывает событие очереди писем.
+
+    Args:
+        event (str): enqueued, sent, retried, failed, batches, connections или
+            send_seconds (value - время отправки пачки в секундах).
+        value (float): Приращение счетчика.
+    """
+    if event == 'send_seconds':
+        MAIL_SEND_SECONDS.inc(value)
+    else:
+        MAIL_OUTBOX_EVENTS.labels(event).inc(value)
+
+
+def register_scrape_collector(collector):
+    """
+    Регистрирует коллектор, который вычисляет значения при каждом опросе /metrics.
+
+    Args:
+        collector: Объект с методами describe() и collect() в смысле prometheus_client.
+
+    Notes:
+        Подходит для величин, общих для всех процессов (например, длины очереди
+        в базе данных): их нельзя суммировать по процессам, как mmap-метрики.
+        describe() должен возвращать семейства без запросов к внешним системам.
+    """
+    _scrape_collectors.append(collector)
+    if not MULTIPROCESS:
+        REGISTRY.register(collector)
+
+
+def update_pool_metrics(force: bool = False):
+    """
+    Переносит метрики пула соединений и отставание реплик в метрики Prometheus.
+
+    Args:
+        force (bool): Обновить независимо от времени прошлого обновления.
+
+    Notes:
+        Вызывается после запросов не чаще раза в POOL_STATS_INTERVAL секунд,
+        чтобы не добавлять записи в mmap на каждый запрос. Накопленные значения
+        пула (ожидание, тайм-ауты) - счетчики: в отличие от gauge, их сумма не
+        уменьшается при завершении процесса, и rate() считается правильно.
+        Процесс, еще не обращавшийся к базе, ничего не обновляет: сбор метрик
+        не создает механизм и пул соединений.
+    """
+    if not engine_created():
+        return
+    now = time.monotonic()
+    if not force and now - _last_pool_update[0] < POOL_STATS_INTERVAL:
+        return
+    _last_pool_update[0] = now
+    stats = pool_stats()
+    DB_POOL.labels('size').set(stats['size'])
+    DB_POOL.labels('checked_out').set(stats['checked_out'])
+    DB_POOL.labels('checked_in').set(stats['checked_in'])
+    DB_POOL.labels('overflow').set(stats['overflow'])
+    with _pool_totals_lock:
+        if _last_pool_totals['pid'] != os.getpid():
+            _last_pool_totals.update(pid=os.getpid(), wait_count=0, wait_seconds=0.0, timeouts=0)
+        for name, counter in (
+            ('wait_count', DB_POOL_CHECKOUTS),
+            ('wait_seconds', DB_POOL_WAIT),
+            ('timeouts', DB_POOL_TIMEOUTS)
+        ):
+            delta = stats[name] - _last_pool_totals[name]
+            if delta > 0:
+                counter.inc(delta)
+            _last_pool_totals[name] = stats[name]
+    for index, lag in enumerate(replica_router.lags):
+        DB_REPLICA_LAG.labels(str(index)).set(-1 if lag is None else lag)
+
+
+def _endpoint() -> str:
+    # Шаблон маршрута, а не путь, чтобы число меток не зависело от URL
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def _start_request():
+    request.environ['metrics_started'] = time.perf_counter()
+
+
+def _record_response(response):
+    started = request.environ.pop('metrics_started', None)
+    if started is not None:
+        endpoint = _endpoint()
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    update_pool_metrics()
+    return response
+
+
+def _record_exception(exc=None):
+    # after_request не вызывается, если исключение не было обработано
+    started = request.environ.pop('metrics_started', None)
+    if started is not None and exc is not None:
+        endpoint = _endpoint()
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        REQUESTS.labels(endpoint, request.method, '500').inc()
+
+
+def metrics_view() -> Response:
+    """
+    Обработчик маршрута '/metrics' в текстовом формате Prometheus.
+
+    Returns:
+        Response: Метрики всех процессов приложения.
+    """
+    update_pool_metrics(force=True)
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _scrape_collectors:
+            registry.register(collector)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app: Flask):
+    """
+    Подключает сбор метрик запросов и маршрут '/metrics' к приложению.
+
+    Args:
+        app (Flask): Экземпляр приложения.
+
+    Notes:
+        Запись метрики запроса сводится к двум вызовам perf_counter, наблюдению
+        гистограммы и увеличению счетчика (единицы микросекунд). Для нескольких
+        процессов задайте PROMETHEUS_MULTIPROC_DIR и очищайте каталог при запуске.
+    """
+    app.before_request(_start_request)
+    app.after_request(_record_response)
+    app.teardown_request(_record_exception)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+
+def mark_process_dead(pid: int):
+    """
+    Удаляет live-метрики завершившегося процесса (для хука child_exit сервера).
+
+    Args:
+        pid (int): Идентификатор процесса.
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,60 @@
+import base64
+import uuid
+from typing import Optional
+
+from config import Config
+
+
+def encode_cursor(last_id: uuid.UUID) -> str:
+    """
+    Кодирует ключ последней записи страницы в непрозрачный курсор.
+
+    Args:
+        last_id (uuid.UUID): Идентификатор последней записи на странице.
+
+    Returns:
+        str: Курсор, пригодный для передачи в параметре `after`.
+    """
+    return base64.urlsafe_b64encode(last_id.bytes).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[uuid.UUID]:
+    """
+    Декодирует курсор, полученный от клиента.
+
+    Args:
+        cursor (Optional[str]): Значение параметра `after`.
+
+    Returns:
+        Optional[uuid.UUID]: Идентификатор, после которого начинается страница,
+        либо None для первой страницы.
+
+    Raises:
+        ValueError: Если курсор поврежден.
+    """
+    if not cursor:
+        return None
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        return uuid.UUID(bytes=base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeEncodeError) as exc:
+        raise ValueError('Некорректный курсор') from exc
+
+
+def parse_limit(raw_limit: Optional[str]) -> int:
+    """
+    Приводит параметр `limit` к допустимому размеру страницы.
+
+    Args:
+        raw_limit (Optional[str]): Значение параметра `limit` из запроса.
+
+    Returns:
+        int: Размер страницы в диапазоне от 1 до CATALOG_MAX_PAGE_SIZE.
+
+    Raises:
+        ValueError: Если параметр не является целым числом.
+    """
+    if not raw_limit:
+        return Config.CATALOG_PAGE_SIZE
+    limit = int(raw_limit)
+    return max(1, min(limit, Config.CATALOG_MAX_PAGE_SIZE))
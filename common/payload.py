@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Response, request
+
+from config import Config
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него отдаются только gzip и identity
+    brotli = None
+
+
+class EncodedPayload:
+    """
+    Заранее сериализованный и сжатый JSON-ответ.
+
+    Attributes:
+        body (bytes): JSON без сжатия.
+        etag (str): Хэш содержимого, общий для всех вариантов кодирования.
+        variants (Dict[str, bytes]): Сжатые варианты тела по имени Content-Encoding.
+    """
+
+    def __init__(self, data: Any):
+        self.body = json.dumps(
+            data,
+            ensure_ascii=False,
+            separators=(',', ':'),
+            sort_keys=True
+        ).encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        self.variants: Dict[str, bytes] = {}
+        compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+        if len(compressed) < len(self.body):
+            self.variants['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(self.body, quality=11)
+            if len(compressed) < len(self.body):
+                self.variants['br'] = compressed
+
+    def matches(self, if_none_match: str) -> bool:
+        """
+        Проверяет заголовок If-None-Match на совпадение с текущим содержимым.
+
+        Args:
+            if_none_match (str): Значение заголовка If-None-Match.
+
+        Returns:
+            bool: True, если у клиента уже есть актуальная версия.
+        """
+        for tag in if_none_match.split(','):
+            tag = tag.strip()
+            if tag == '*':
+                return True
+            if tag.startswith('W/'):
+                tag = tag[2:]
+            if tag.strip('"').split('-')[0] == self.etag:
+                return True
+        return False
+
+    def negotiate(self, accept_encodings, if_none_match: Optional[str]) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        Выбирает вариант тела по Accept-Encoding и проверяет If-None-Match.
+
+        Args:
+            accept_encodings: Разобранный заголовок Accept-Encoding (werkzeug Accept).
+            if_none_match (Optional[str]): Значение заголовка If-None-Match.
+
+        Returns:
+            Tuple[int, Dict[str, str], bytes]: Код ответа (200 или 304), заголовки и тело.
+        """
+        headers = {
+            'Cache-Control': 'private, max-age={0}, must-revalidate'.format(
+                Config.API_CACHE_MAX_AGE
+            ),
+            'Vary': 'Accept-Encoding'
+        }
+        encoding = next(
+            (
+                name for name in ('br', 'gzip')
+                if name in self.variants and accept_encodings[name]
+            ),
+            None
+        )
+        if encoding is None:
+            headers['ETag'] = '"{0}"'.format(self.etag)
+            body = self.body
+        else:
+            # Разные кодирования - разные представления, у них разные сильные ETag
+            headers['ETag'] = '"{0}-{1}"'.format(self.etag, encoding)
+            headers['Content-Encoding'] = encoding
+            body = self.variants[encoding]
+        if if_none_match and self.matches(if_none_match):
+            return 304, headers, b''
+        return 200, headers, body
+
+    def to_response(self) -> Response:
+        """
+        Формирует ответ с учетом If-None-Match и Accept-Encoding текущего запроса.
+
+        Returns:
+            Response: 304 Not Modified либо тело в лучшем поддерживаемом клиентом кодировании.
+        """
+        status, headers, body = self.negotiate(
+            request.accept_encodings, request.headers.get('If-None-Match')
+        )
+        if status == 304:
+            return Response(status=304, headers=headers)
+        return Response(body, mimetype='application/json', headers=headers)
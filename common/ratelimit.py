@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from loguru import logger
+
+from common.metrics import record_auth_rate_limited
+from config import Config
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS auth_buckets ('
+    'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+)
+
+
+class AuthRateLimiter:
+    """
+    Ограничение частоты входа и регистрации по имени пользователя и IP-адресу клиента.
+
+    Каждому имени и каждому адресу соответствует корзина токенов (token bucket)
+    емкостью per_user или per_ip попыток, которая полностью наполняется за period
+    секунд. Попытка тратит по токену из обеих корзин и отклоняется, если хотя бы
+    в одной их нет. Проверка выполняется до запросов к базе данных и хэширования
+    пароля, поэтому перебор паролей не занимает процессор рабочих процессов.
+
+    Состояние хранится в файле SQLite, общем для всех процессов на сервере:
+    короткая транзакция BEGIN IMMEDIATE делает проверку и списание атомарными.
+    Файл не синхронизируется с диском: после сбоя корзины просто снова полные.
+
+    Attributes:
+        path (str): Путь к файлу SQLite с корзинами.
+        per_user (int): Количество попыток на имя пользователя за period; 0 - без ограничения.
+        per_ip (int): Количество попыток с одного адреса за period; 0 - без ограничения.
+        period (float): Время полного наполнения корзины в секундах.
+        prune_interval (float): Интервал удаления полных корзин в секундах.
+    """
+
+    def __init__(self, path: str, per_user: int, per_ip: int, period: float, prune_interval: float = 60.0):
+        self.path = path
+        self.per_user = per_user
+        self.per_ip = per_ip
+        self.period = period
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_pid: Optional[int] = None
+        self._last_prune = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        # Соединение открывается при первой проверке и заново в дочерних процессах после fork
+        if self._connection_pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(SCHEMA)
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def _buckets(self, username: Optional[str], client_ip: Optional[str]) -> List[Tuple[str, str, int]]:
+        buckets = []
+        if self.per_user and username:
+            buckets.append(('user', 'user:' + username, self.per_user))
+        if self.per_ip and client_ip:
+            buckets.append(('ip', 'ip:' + client_ip, self.per_ip))
+        return buckets
+
+    def _take(self, buckets: List[Tuple[str, str, int]], now: float) -> Optional[Tuple[str, float]]:
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            levels = []
+            for _, key, capacity in buckets:
+                row = connection.execute('SELECT tokens, updated FROM auth_buckets WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    levels.append(float(capacity))
+                else:
+                    refill = max(now - row[1], 0.0) * capacity / self.period
+                    levels.append(min(float(capacity), row[0] + refill))
+            denied = [
+                (kind, (1.0 - tokens) * self.period / capacity)
+                for (kind, _, capacity), tokens in zip(buckets, levels) if tokens < 1.0
+            ]
+            if not denied:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO auth_buckets (key, tokens, updated) VALUES (?, ?, ?)',
+                    [(key, tokens - 1.0, now) for (_, key, _), tokens in zip(buckets, levels)]
+                )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            # Корзина, не тронутая period секунд, полна и ничем не отличается от отсутствующей
+            connection.execute('DELETE FROM auth_buckets WHERE updated < ?', (now - self.period,))
+        return max(denied, key=lambda item: item[1]) if denied else None
+
+    def acquire(self, endpoint: str, username: Optional[str], client_ip: Optional[str]) -> float:
+        """
+        Тратит попытку входа или регистрации.
+
+        Args:
+            endpoint (str): Маршрут для метрики отказов (login, register, api_token).
+            username (Optional[str]): Имя пользователя из запроса.
+            client_ip (Optional[str]): Адрес клиента.
+
+        Returns:
+            float: 0, если попытка разрешена, иначе время в секундах, через
+            которое появится следующий токен (для заголовка Retry-After).
+
+        Notes:
+            При ошибке файла состояния попытка разрешается: сбой ограничителя
+            не должен закрывать вход всем пользователям.
+        """
+        buckets = self._buckets(username, client_ip)
+        if not buckets:
+            return 0.0
+        try:
+            with self._lock:
+                denied = self._take(buckets, time.time())
+        except sqlite3.Error as err:
+            logger.warning("Ограничитель входа недоступен, попытка разрешена: {0}".format(err))
+            return 0.0
+        if denied is None:
+            return 0.0
+        kind, retry_after = denied
+        record_auth_rate_limited(endpoint, kind)
+        return retry_after
+
+    def reset_user(self, username: str):
+        """
+        Наполняет корзину пользователя после успешного входа.
+
+        Args:
+            username (str): Имя пользователя.
+
+        Notes:
+            Ошибки ввода пароля владельцем аккаунта не копятся между входами.
+            Корзина адреса не сбрасывается: перебор с одного адреса по многим
+            именам ограничивается и при отдельных успешных входах.
+        """
+        if not self.per_user:
+            return
+        try:
+            with self._lock:
+                self._connect().execute('DELETE FROM auth_buckets WHERE key = ?', ('user:' + username,))
+        except sqlite3.Error as err:
+            logger.warning("Не удалось сбросить ограничение входа: {0}".format(err))
+
+
+auth_limiter = AuthRateLimiter(
+    Config.AUTH_RATE_LIMIT_FILE,
+    per_user=Config.AUTH_RATE_LIMIT_PER_USER,
+    per_ip=Config.AUTH_RATE_LIMIT_PER_IP,
+    period=Config.AUTH_RATE_LIMIT_PERIOD
+)
@@ -1,16 +1,20 @@
 import datetime
 import json
 import smtplib
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
 from email.mime.text import MIMEText
 from functools import wraps
 from smtplib import SMTPResponseException, SMTPServerDisconnected
-from typing import Any, Callable
+from typing import Any, Callable, Optional
 
-from flask import make_response, session
-from jwt import ExpiredSignatureError, PyJWT
+from flask import make_response, request, session
+from jwt import ExpiredSignatureError, InvalidTokenError, PyJWT
 from loguru import logger
 
+from common.metrics import record_smtp_send, record_token_failure
 from config import Config, UserConfig
 
 
@@ -47,12 +51,41 @@ def smtp_generator(smtp: smtplib.SMTP):
             smtp.close()
 
 
+def smtp_connect() -> smtplib.SMTP:
+    """
+    Открывает аутентифицированное соединение с SMTP-сервером.
+
+    Returns:
+        smtplib.SMTP: Соединение, готовое к отправке писем. Его следует использовать
+        внутри smtp_generator, чтобы оно корректно завершалось.
+
+    Notes:
+        Эта функция устанавливает безопасное TLS-соединение (если оно не отключено
+        через SMTP_USE_TLS) и аутентифицируется на SMTP-сервере. Соединение можно
+        переиспользовать для отправки нескольких писем.
+    """
+    email_server = smtplib.SMTP(
+        UserConfig.SMTP_HOST,
+        UserConfig.PORT,
+        timeout=UserConfig.SMTP_TIMEOUT
+    )
+    try:
+        if UserConfig.SMTP_USE_TLS:
+            email_server.starttls()
+        if UserConfig.PASSWORD_SENDER:
+            email_server.login(UserConfig.SENDER, UserConfig.PASSWORD_SENDER)
+    except Exception:
+        email_server.close()
+        raise
+    return email_server
+
+
 def send_email_message(email_server: smtplib.SMTP, username: str, user_email: str):
     """
     Отправляет email-сообщение через SMTP-сервер.
 
     Args:
-        email_server (smtplib.SMTP): Объект SMTP-сервера, через который будет отправлено сообщение.
+        email_server (smtplib.SMTP): Соединение с SMTP-сервером, открытое через smtp_connect.
         username (str): Имя пользователя, которому отправляется сообщение.
         user_email (str): Email-адрес получателя.
 
@@ -60,47 +93,168 @@ def send_email_message(email_server: smtplib.SMTP, username: str, user_email: st
         None
 
     Notes:
-        Эта функция устанавливает безопасное TLS-соединение, аутентифицируется на SMTP-сервере,
-        формирует и отправляет email-сообщение с указанными параметрами. После успешной отправки
+        Эта функция формирует и отправляет email-сообщение с указанными параметрами
+        через уже аутентифицированное соединение. После успешной отправки
         сообщения, будет зарегистрировано информационное сообщение в логах.
     """
-    email_server.starttls()
-    email_server.login(UserConfig.SENDER, UserConfig.PASSWORD_SENDER)
     msg = MIMEText(
         f'Дорогой {username}, спасибо за предоставленную обратную связь,\
               в ближашее время постараемся ответить на твое обращение'
     )
     msg["Subject"] = 'Обратная связь'
-    email_server.sendmail(UserConfig.SENDER, user_email, msg.as_string())
+    try:
+        email_server.sendmail(UserConfig.SENDER, user_email, msg.as_string())
+    except smtplib.SMTPRecipientsRefused:
+        record_smtp_send('refused')
+        raise
+    except smtplib.SMTPResponseException:
+        record_smtp_send('rejected')
+        raise
+    except (smtplib.SMTPException, OSError):
+        record_smtp_send('connection_error')
+        raise
+    record_smtp_send('sent')
     logger.info(f"Сообщение для {user_email} было доставлено!")
 
 
-def generate_token(user_id: Any) -> str:
+class VerifiedTokenCache:
+    """
+    Ограниченный LRU-кэш уже проверенных JWT токенов.
+
+    Повторная проверка токена из кэша сводится к поиску в словаре и сравнению
+    времени истечения, без HMAC и разбора JSON.
+
+    Attributes:
+        max_size (int): Максимальное количество токенов в кэше.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._tokens: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        """
+        Возвращает полезную нагрузку токена из кэша.
+
+        Args:
+            token (str): JWT токен.
+
+        Returns:
+            Optional[dict]: Полезная нагрузка или None, если токена нет в кэше.
+
+        Raises:
+            ExpiredSignatureError: Если токен из кэша уже просрочен.
+        """
+        with self._lock:
+            payload = self._tokens.get(token)
+            if payload is None:
+                return None
+            if payload['exp'] <= time.time():
+                del self._tokens[token]
+                raise ExpiredSignatureError('Signature has expired')
+            self._tokens.move_to_end(token)
+            return payload
+
+    def put(self, token: str, payload: dict):
+        """
+        Сохраняет проверенный токен.
+
+        Args:
+            token (str): JWT токен.
+            payload (dict): Проверенная полезная нагрузка токена.
+        """
+        with self._lock:
+            self._tokens[token] = payload
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self.max_size:
+                self._tokens.popitem(last=False)
+
+
+_jwt = PyJWT()
+verified_tokens = VerifiedTokenCache(Config.TOKEN_CACHE_SIZE)
+
+
+def generate_token(
+    user_id: Any,
+    token_type: str = 'access',
+    lifetime: Optional[datetime.timedelta] = None,
+    token_id: Any = None
+) -> str:
     """
     Генерирует JWT токен для пользователя.
 
     Args:
         user_id (Any): Уникальный идентификатор пользователя.
+        token_type (str): Тип токена: access для доступа к API или refresh для его обновления.
+        lifetime (Optional[datetime.timedelta]): Время жизни токена; по умолчанию
+            ACCESS_TOKEN_LIFETIME или REFRESH_TOKEN_LIFETIME в зависимости от типа.
+        token_id (Any): Идентификатор токена (claim jti); нужен токенам обновления для ротации.
 
     Returns:
         str: Сгенерированный JWT токен.
     """
+    if lifetime is None:
+        lifetime = datetime.timedelta(minutes=(
+            Config.REFRESH_TOKEN_LIFETIME if token_type == 'refresh'
+            else Config.ACCESS_TOKEN_LIFETIME
+        ))
     payload = {
-        'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=30),
+        'exp': datetime.datetime.utcnow() + lifetime,
         'iat': datetime.datetime.utcnow(),
-        'sub': str(user_id)
+        'sub': str(user_id),
+        'type': token_type
     }
-    jwt_instance = PyJWT()
-    return jwt_instance.encode(
+    if token_id is not None:
+        payload['jti'] = str(token_id)
+    return _jwt.encode(
         payload,
         Config.SECRET_KEY,
         algorithm='HS256'
     )
 
 
+def verify_token(token: str, token_type: str = 'access') -> dict:
+    """
+    Проверяет JWT токен, используя кэш уже проверенных токенов.
+
+    Args:
+        token (str): JWT токен.
+        token_type (str): Ожидаемый тип токена.
+
+    Returns:
+        dict: Полезная нагрузка токена.
+
+    Raises:
+        ExpiredSignatureError: Если срок действия токена истек.
+        InvalidTokenError: Если токен поврежден, подписан другим ключом или имеет другой тип.
+    """
+    payload = verified_tokens.get(token)
+    if payload is None:
+        payload = _jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
+        verified_tokens.put(token, payload)
+    # Токены, выданные до появления типов, считаются токенами доступа
+    if payload.get('type', 'access') != token_type:
+        raise InvalidTokenError('Неверный тип токена')
+    return payload
+
+
+def get_request_token() -> Optional[str]:
+    """
+    Извлекает токен из заголовка Authorization: Bearer или из сессии пользователя.
+
+    Returns:
+        Optional[str]: Токен или None, если он не передан.
+    """
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() == 'bearer' and credentials.strip():
+        return credentials.strip()
+    return session.get('token')
+
+
 def token_required(f: Callable) -> Callable:
     """
-    Декоратор для проверки JWT токена в сессии пользователя.
+    Декоратор для проверки JWT токена из заголовка Authorization или сессии пользователя.
 
     Args:
         f (Callable): Функция, к которой применяется декоратор.
@@ -110,8 +264,9 @@ def token_required(f: Callable) -> Callable:
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = session.get('token')
+        token = get_request_token()
         if not token:
+            record_token_failure('missing')
             response = json.dumps(
                 {
                     'message': 'Отсутствует токен!'
@@ -120,9 +275,9 @@ def token_required(f: Callable) -> Callable:
             )
             return make_response(response, 401, {"Content-Type": "application/json"})
         try:
-            jwt_instance = PyJWT()
-            jwt_instance.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
+            verify_token(token)
         except ExpiredSignatureError:
+            record_token_failure('expired')
             response = json.dumps(
                 {
                     'message': 'Токен просрочен!'
@@ -131,6 +286,7 @@ def token_required(f: Callable) -> Callable:
             )
             return make_response(response, 401, {"Content-Type": "application/json"})
         except:
+            record_token_failure('invalid')
             response = json.dumps(
                 {
                     'message': 'Недействительный токен!'
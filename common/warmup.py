@@ -0,0 +1,63 @@
+import time
+from typing import Dict
+
+import sqlalchemy as sa
+from flask import Flask
+from loguru import logger
+
+from common.assets import asset_manifest
+from config import Config
+from db.session import get_engine
+
+
+def prime_connections(count: int) -> int:
+    """
+    Открывает соединения пула заранее, чтобы первые запросы не ждали подключения.
+
+    Args:
+        count (int): Количество соединений.
+
+    Returns:
+        int: Количество успешно открытых соединений.
+    """
+    connections = []
+    try:
+        for _ in range(count):
+            connection = get_engine().connect()
+            connections.append(connection)
+            connection.execute(sa.text('SELECT 1'))
+    except sa.exc.SQLAlchemyError as err:
+        logger.warning("Не удалось открыть соединение при прогреве: {0}".format(err))
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def warm_up(app: Flask) -> Dict[str, float]:
+    """
+    Прогревает процесс приложения перед приемом запросов.
+
+    Args:
+        app (Flask): Экземпляр приложения.
+
+    Returns:
+        Dict[str, float]: Количество открытых соединений, статус главной страницы
+        и время прогрева в секундах.
+
+    Notes:
+        Открывает DB_POOL_SIZE соединений, компилирует шаблоны, читает манифест
+        стилей и запрашивает главную страницу, что заполняет кэш каталога и
+        кэш фрагментов. Вызывается в каждом процессе после fork.
+    """
+    started = time.perf_counter()
+    connections = prime_connections(Config.DB_POOL_SIZE)
+    for name in app.jinja_env.list_templates(extensions=('html',)):
+        app.jinja_env.get_template(name)
+    asset_manifest.url('index.css')
+    status = app.test_client().get('/').status_code
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "Процесс прогрет за {0:.2f} с: соединений {1}, главная страница {2}".format(elapsed, connections, status)
+    )
+    return {'connections': connections, 'index_status': status, 'seconds': round(elapsed, 3)}
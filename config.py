@@ -1,45 +1,217 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def required_env(name: str) -> str:
+    """
+    Возвращает значение обязательной переменной окружения.
+
+    Args:
+        name (str): Имя переменной.
+
+    Returns:
+        str: Значение переменной.
+
+    Raises:
+        RuntimeError: Если переменная не задана.
+    """
+    value = os.environ.get(name)
+    if value is None:
+        raise RuntimeError('Не задана обязательная переменная окружения {0}'.format(name))
+    return value
+
+
+class LazySetting:
+    """
+    Настройка, которая вычисляется при каждом обращении к атрибуту класса, а не при импорте.
+
+    Attributes:
+        getter (Callable[[], Any]): Функция, возвращающая значение настройки.
+    """
+
+    def __init__(self, getter):
+        self.getter = getter
+
+    def __get__(self, instance, owner):
+        return self.getter()
+
+
+def _database_url() -> str:
+    return os.environ.get("DATABASE_URL") or 'postgresql://{0}:{1}@{2}/{3}'.format(
+        required_env("PG_USER"),
+        required_env("PG_PASSWORD"),
+        required_env("PG_HOST"),
+        required_env("DB_NAME")
+    )
+
+
 class Config:
     """
     Класс, содержащий настройки приложения.
 
+    Обязательные настройки (SQLALCHEMY_DATABASE_URI, TEMPLATE_FOLDER, SECRET_KEY)
+    читаются из окружения при обращении, поэтому импорт модулей приложения их не
+    требует; при отсутствии переменной обращение вызывает RuntimeError.
+
     Attributes:
-        SQLALCHEMY_DATABASE_URI (str): URI для подключения к базе данных.
+        SQLALCHEMY_DATABASE_URI (str): URI для подключения к базе данных. Переменная DATABASE_URL
+            позволяет переопределить его, например, на SQLite для локальных тестов.
+        ASYNC_DATABASE_URL (str): URI для асинхронного механизма; по умолчанию SQLALCHEMY_DATABASE_URI
+            с драйвером asyncpg или aiosqlite.
+        DATABASE_REPLICA_URLS (List[str]): URI реплик для чтения через запятую; пусто - все запросы к основной базе.
+        REPLICA_MAX_LAG (float): Отставание реплики в секундах, начиная с которого чтение идет с основной базы.
+        REPLICA_CHECK_INTERVAL (float): Интервал проверки отставания реплик в секундах.
         SQLALCHEMY_TRACK_MODIFICATIONS (bool): Флаг отслеживания изменений SQLAlchemy.
         TEMPLATES_AUTO_RELOAD (bool): Флаг автоматической перезагрузки шаблонов.
         TEMPLATE_FOLDER (str): Путь к папке с шаблонами.
         SECRET_KEY (str): Секретный ключ для приложения.
+        ACCESS_TOKEN_LIFETIME (int): Время жизни токена доступа, выдаваемого при входе через форму, в минутах.
+        API_ACCESS_TOKEN_LIFETIME (int): Время жизни токена доступа для API-клиентов в минутах.
+        REFRESH_TOKEN_LIFETIME (int): Время жизни токена обновления в минутах.
+        TOKEN_CACHE_SIZE (int): Количество проверенных токенов в кэше процесса.
+        USER_CACHE_TTL (float): Время жизни снимка пользователя в кэше процесса в секундах.
+        USER_CACHE_SIZE (int): Максимальное количество снимков пользователей в кэше процесса.
+        PASSWORD_HASHER (str): Схема хэширования новых паролей: bcrypt или pbkdf2.
+        PASSWORD_BCRYPT_ROUNDS (int): Стоимость bcrypt.
+        PASSWORD_PBKDF2_ITERATIONS (int): Количество итераций PBKDF2.
+        PASSWORD_HASH_WORKERS (int): Количество процессов для хэширования в каждом процессе приложения;
+            0 - хэширование в потоке запроса. Пул создается в каждом процессе сервера, поэтому всего
+            процессов хэширования WEB_CONCURRENCY * PASSWORD_HASH_WORKERS. По умолчанию CPU / WEB_CONCURRENCY,
+            но не меньше 1 (1 при WEB_CONCURRENCY по умолчанию 2 * CPU + 1).
+        AUTH_RATE_LIMIT_PER_USER (int): Количество попыток входа и регистрации на одно имя пользователя
+            за AUTH_RATE_LIMIT_PERIOD; 0 - без ограничения.
+        AUTH_RATE_LIMIT_PER_IP (int): Количество попыток входа и регистрации с одного адреса
+            за AUTH_RATE_LIMIT_PERIOD; 0 - без ограничения.
+        AUTH_RATE_LIMIT_PERIOD (float): Время в секундах, за которое лимит попыток восстанавливается полностью.
+        AUTH_RATE_LIMIT_FILE (str): Файл SQLite с состоянием ограничения, общий для процессов сервера.
+        PROXY_FIX_X_FOR (int): Количество доверенных прокси перед приложением; адрес клиента
+            берется из X-Forwarded-For. 0 - адрес соединения.
+        DB_POOL_SIZE (int): Количество постоянных соединений в пуле.
+        DB_MAX_OVERFLOW (int): Количество дополнительных соединений сверх DB_POOL_SIZE.
+        DB_POOL_TIMEOUT (float): Время ожидания свободного соединения в секундах.
+        DB_POOL_RECYCLE (int): Возраст соединения в секундах, после которого оно переоткрывается.
+        SQL_SLOW_QUERY_MS (float): Длительность SQL-запроса в миллисекундах, начиная с которой он пишется в лог.
+        SQL_N_PLUS_ONE_THRESHOLD (int): Количество повторов одного SQL-запроса за HTTP-запрос, считающееся N+1.
+        SERVER_TIMING (bool): Флаг добавления заголовка Server-Timing к ответам.
+        CATALOG_PAGE_SIZE (int): Размер страницы каталога по умолчанию.
+        CATALOG_MAX_PAGE_SIZE (int): Максимально допустимый размер страницы каталога.
+        SEARCH_MAX_RESULTS (int): Максимальное количество результатов поиска.
+        CATALOG_CACHE_SIZE (int): Максимальное количество снимков каталога в кэше процесса.
+        CATALOG_CACHE_MAX_STALENESS (float): Максимальный возраст снимка каталога в секундах.
+        CATALOG_NOTIFY_CHANNEL (str): Канал PostgreSQL LISTEN/NOTIFY для инвалидации каталога.
+        CATALOG_VERSION_FILE (str): Файл версии каталога для баз без LISTEN/NOTIFY.
+        FRAGMENT_CACHE_MAX_BYTES (int): Максимальный суммарный размер отрендеренных фрагментов шаблонов в байтах.
+        API_CACHE_MAX_AGE (int): max-age в заголовке Cache-Control ответов API каталога.
+        EXPORT_BATCH_SIZE (int): Количество строк, читаемых за раз при потоковой выгрузке каталога.
+        MEDIA_ROOT (str): Каталог локальных копий изображений и их уменьшенных вариантов.
+        MEDIA_MAX_AGE (int): max-age в заголовке Cache-Control ответов с изображениями.
+        IMAGE_WORKERS (int): Количество потоков загрузки и обработки изображений.
+        IMAGE_FETCH_TIMEOUT (float): Таймаут загрузки исходного изображения в секундах.
+        IMAGE_MAX_BYTES (int): Максимальный размер исходного изображения в байтах.
+        IMAGE_QUALITY (int): Качество сжатия вариантов изображения (WebP).
+        ASSETS_SOURCE_DIR (str): Каталог исходных стилей.
+        ASSETS_ROOT (str): Каталог собранных бандлов стилей и манифеста.
+        ASSETS_MAX_AGE (int): max-age в заголовке Cache-Control ответов с бандлами.
     """
-    SQLALCHEMY_DATABASE_URI = 'postgresql://{0}:{1}@{2}/{3}'.format(
-        os.environ["PG_USER"],
-        os.environ["PG_PASSWORD"],
-        os.environ["PG_HOST"],
-        os.environ["DB_NAME"]
-    )
+    SQLALCHEMY_DATABASE_URI = LazySetting(_database_url)
+    ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL")
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 5))
+    REPLICA_CHECK_INTERVAL = float(os.environ.get("REPLICA_CHECK_INTERVAL", 1))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     TEMPLATES_AUTO_RELOAD = True
-    TEMPLATE_FOLDER = os.environ["TEMPLATE_FOLDER"]
-    SECRET_KEY = os.environ["SECRET_KEY"]
+    TEMPLATE_FOLDER = LazySetting(lambda: required_env("TEMPLATE_FOLDER"))
+    SECRET_KEY = LazySetting(lambda: required_env("SECRET_KEY"))
+    ACCESS_TOKEN_LIFETIME = int(os.environ.get("ACCESS_TOKEN_LIFETIME", 30))
+    API_ACCESS_TOKEN_LIFETIME = int(os.environ.get("API_ACCESS_TOKEN_LIFETIME", 24 * 60))
+    REFRESH_TOKEN_LIFETIME = int(os.environ.get("REFRESH_TOKEN_LIFETIME", 30 * 24 * 60))
+    TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 10000))
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+    PASSWORD_HASHER = os.environ.get("PASSWORD_HASHER", "bcrypt")
+    PASSWORD_BCRYPT_ROUNDS = int(os.environ.get("PASSWORD_BCRYPT_ROUNDS", 12))
+    PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get("PASSWORD_PBKDF2_ITERATIONS", 600000))
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS") or max(
+        1, (os.cpu_count() or 1) // int(os.environ.get("WEB_CONCURRENCY") or os.cpu_count() or 1)
+    ))
+    AUTH_RATE_LIMIT_PER_USER = int(os.environ.get("AUTH_RATE_LIMIT_PER_USER", 5))
+    AUTH_RATE_LIMIT_PER_IP = int(os.environ.get("AUTH_RATE_LIMIT_PER_IP", 20))
+    AUTH_RATE_LIMIT_PERIOD = float(os.environ.get("AUTH_RATE_LIMIT_PERIOD", 60))
+    AUTH_RATE_LIMIT_FILE = os.environ.get("AUTH_RATE_LIMIT_FILE") or os.path.join(tempfile.gettempdir(), "cheese_auth_limits.sqlite3")
+    PROXY_FIX_X_FOR = int(os.environ.get("PROXY_FIX_X_FOR", 0))
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    SQL_SLOW_QUERY_MS = float(os.environ.get("SQL_SLOW_QUERY_MS", 200))
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_N_PLUS_ONE_THRESHOLD", 5))
+    SERVER_TIMING = os.environ.get("SERVER_TIMING", "true").lower() == "true"
+    CATALOG_PAGE_SIZE = int(os.environ.get("CATALOG_PAGE_SIZE", 24))
+    CATALOG_MAX_PAGE_SIZE = int(os.environ.get("CATALOG_MAX_PAGE_SIZE", 100))
+    SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", 20))
+    CATALOG_CACHE_SIZE = int(os.environ.get("CATALOG_CACHE_SIZE", 256))
+    CATALOG_CACHE_MAX_STALENESS = float(os.environ.get("CATALOG_CACHE_MAX_STALENESS", 30))
+    CATALOG_NOTIFY_CHANNEL = os.environ.get("CATALOG_NOTIFY_CHANNEL", "catalog_changed")
+    CATALOG_VERSION_FILE = os.environ.get("CATALOG_VERSION_FILE")
+    FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get("FRAGMENT_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+    API_CACHE_MAX_AGE = int(os.environ.get("API_CACHE_MAX_AGE", 0))
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+    MEDIA_ROOT = os.environ.get("MEDIA_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "media"))
+    MEDIA_MAX_AGE = int(os.environ.get("MEDIA_MAX_AGE", 365 * 24 * 60 * 60))
+    IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", 4))
+    IMAGE_FETCH_TIMEOUT = float(os.environ.get("IMAGE_FETCH_TIMEOUT", 10))
+    IMAGE_MAX_BYTES = int(os.environ.get("IMAGE_MAX_BYTES", 10 * 1024 * 1024))
+    IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", 80))
+    ASSETS_SOURCE_DIR = os.environ.get("ASSETS_SOURCE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "styles"))
+    ASSETS_ROOT = os.environ.get("ASSETS_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "dist"))
+    ASSETS_MAX_AGE = int(os.environ.get("ASSETS_MAX_AGE", 365 * 24 * 60 * 60))
 
 
 class UserConfig:
     """
     Класс, содержащий настройки пользователя.
 
+    Настройки SMTP-сервера и отправителя читаются из окружения при обращении,
+    то есть при первой отправке письма, а не при импорте.
+
     Attributes:
         SENDER (str): Email-адрес отправителя.
         PASSWORD_SENDER (str): Пароль отправителя.
         DOMAIN (str): Домен для настройки SMTP-сервера.
         PORT (str): Порт для настройки SMTP-сервера.
-        SCHEMA_NAME (str): Имя схемы базы данных.
+        SMTP_HOST (str): Адрес SMTP-сервера, по умолчанию smtp.<DOMAIN>.
+        SMTP_USE_TLS (bool): Флаг использования STARTTLS.
+        SMTP_TIMEOUT (float): Таймаут сетевых операций SMTP в секундах.
+        MAIL_WORKERS (int): Количество потоков-отправителей в процессе mail_worker.py.
+        MAIL_SENDERS_ENABLED (bool): Запускать отправителей и в каждом рабочем процессе gunicorn
+            (для установок без mail_worker.py).
+        MAIL_BATCH_SIZE (int): Количество писем, забираемых из очереди за раз.
+        MAIL_MAX_ATTEMPTS (int): Максимальное количество попыток отправки письма.
+        MAIL_RETRY_BACKOFF (float): Базовая задержка повторной отправки в секундах.
+        MAIL_MAX_RETRY_BACKOFF (float): Максимальная задержка повторной отправки в секундах.
+        MAIL_CLAIM_TIMEOUT (float): Время, после которого незавершенная отправка считается брошенной.
+        MAIL_POLL_INTERVAL (float): Интервал проверки очереди при отсутствии новых писем.
+        MAIL_SMTP_IDLE_TIMEOUT (float): Время простоя, после которого SMTP-соединение закрывается.
+        SCHEMA_NAME (str): Имя схемы базы данных. Пустое или отсутствующее значение означает схему
+            по умолчанию (нужно для SQLite); читается при импорте моделей.
     """
-    SENDER = os.environ["SENDER"]
-    PASSWORD_SENDER = os.environ["PASSWORD_SENDER"]
-    DOMAIN = os.environ["DOMAIN"]
-    PORT = os.environ["PORT"]
-    SCHEMA_NAME = os.environ["SCHEMA_NAME"]
+    SENDER = LazySetting(lambda: required_env("SENDER"))
+    PASSWORD_SENDER = LazySetting(lambda: required_env("PASSWORD_SENDER"))
+    DOMAIN = LazySetting(lambda: required_env("DOMAIN"))
+    PORT = LazySetting(lambda: required_env("PORT"))
+    SMTP_HOST = LazySetting(lambda: os.environ.get("SMTP_HOST") or "smtp.{0}".format(required_env("DOMAIN")))
+    SMTP_USE_TLS = os.environ.get("SMTP_USE_TLS", "true").lower() == "true"
+    SMTP_TIMEOUT = float(os.environ.get("SMTP_TIMEOUT", 30))
+    MAIL_WORKERS = int(os.environ.get("MAIL_WORKERS", 2))
+    MAIL_SENDERS_ENABLED = os.environ.get("MAIL_SENDERS_ENABLED", "false").lower() == "true"
+    MAIL_BATCH_SIZE = int(os.environ.get("MAIL_BATCH_SIZE", 20))
+    MAIL_MAX_ATTEMPTS = int(os.environ.get("MAIL_MAX_ATTEMPTS", 5))
+    MAIL_RETRY_BACKOFF = float(os.environ.get("MAIL_RETRY_BACKOFF", 30))
+    MAIL_MAX_RETRY_BACKOFF = float(os.environ.get("MAIL_MAX_RETRY_BACKOFF", 600))
+    MAIL_CLAIM_TIMEOUT = float(os.environ.get("MAIL_CLAIM_TIMEOUT", 300))
+    MAIL_POLL_INTERVAL = float(os.environ.get("MAIL_POLL_INTERVAL", 5))
+    MAIL_SMTP_IDLE_TIMEOUT = float(os.environ.get("MAIL_SMTP_IDLE_TIMEOUT", 60))
+    SCHEMA_NAME = os.environ.get("SCHEMA_NAME") or None
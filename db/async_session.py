@@ -0,0 +1,165 @@
+import asyncio
+from typing import Awaitable, Iterable, List
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from common.lazy import LazyResource
+from config import Config
+from db.session import install_sqlite_functions, replica_router
+
+# Асинхронные драйверы для синхронных URL из конфигурации
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite'
+}
+
+
+def async_database_url(url: str) -> sa.engine.URL:
+    """
+    Преобразует URL базы данных к асинхронному драйверу.
+
+    Args:
+        url (str): URL из SQLALCHEMY_DATABASE_URI.
+
+    Returns:
+        sa.engine.URL: URL с драйвером asyncpg или aiosqlite.
+    """
+    parsed = sa.engine.make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername))
+
+
+def create_pooled_async_engine(url) -> AsyncEngine:
+    """
+    Создает асинхронный механизм с общими настройками пула соединений.
+
+    Args:
+        url: URI базы данных с асинхронным драйвером.
+
+    Returns:
+        AsyncEngine: Асинхронный механизм SQLAlchemy.
+    """
+    engine = create_async_engine(
+        url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        echo=False
+    )
+    install_sqlite_functions(engine.sync_engine)
+    return engine
+
+
+# Асинхронный механизм работает с теми же моделями и базой, что и get_engine() из db.session
+_async_engine = LazyResource(lambda: create_pooled_async_engine(
+    Config.ASYNC_DATABASE_URL or async_database_url(Config.SQLALCHEMY_DATABASE_URI)
+))
+
+# Реплики в том же порядке, что и get_replica_engines(), чтобы номер от replica_router подходил к обоим спискам
+_async_replica_engines = LazyResource(
+    lambda: [create_pooled_async_engine(async_database_url(url)) for url in Config.DATABASE_REPLICA_URLS]
+)
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Возвращает асинхронный механизм основной базы, создавая его при первом вызове.
+
+    Returns:
+        AsyncEngine: Асинхронный механизм SQLAlchemy.
+    """
+    return _async_engine.get()
+
+
+def get_async_replica_engines() -> List[AsyncEngine]:
+    """
+    Возвращает асинхронные механизмы реплик в порядке DATABASE_REPLICA_URLS.
+
+    Returns:
+        List[AsyncEngine]: Механизмы реплик; пустой список, если реплик нет.
+    """
+    return _async_replica_engines.get()
+
+
+async def dispose_async_engines():
+    """
+    Закрывает пулы уже созданных асинхронных механизмов.
+
+    Notes:
+        Потоки соединений aiosqlite держат процесс, пока механизм не закрыт.
+        Механизмы, к которым процесс не обращался, не создаются.
+    """
+    engines = []
+    if _async_engine.created:
+        engines.append(_async_engine.get())
+    if _async_replica_engines.created:
+        engines.extend(_async_replica_engines.get())
+    for engine in engines:
+        await engine.dispose()
+
+
+class PrimaryAsyncSession(AsyncSession):
+    """
+    Асинхронная сессия основной базы; механизм по умолчанию создается при первой сессии.
+    """
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind or get_async_engine(), **kwargs)
+
+
+AsyncSessionLocal = async_sessionmaker(class_=PrimaryAsyncSession, expire_on_commit=False, autoflush=False)
+
+
+def async_read_session() -> AsyncSession:
+    """
+    Создает асинхронную сессию для чтения: с реплики, если она не отстает, иначе с основной базы.
+
+    Returns:
+        AsyncSession: Сессия, которую нужно закрыть (async with).
+
+    Notes:
+        Cookie-сессии у асинхронных маршрутов нет, поэтому учитывается только
+        отставание реплик и недавние изменения каталога в процессе.
+    """
+    replica = replica_router.pick()
+    if replica is None:
+        return AsyncSessionLocal()
+    return AsyncSessionLocal(bind=get_async_replica_engines()[replica])
+
+
+
+async def gather_bounded(aws: Iterable[Awaitable], limit: int) -> List:
+    """
+    Выполняет корутины конкурентно, но не больше limit одновременно.
+
+    Args:
+        aws (Iterable[Awaitable]): Корутины, например запросы с отдельными сессиями.
+        limit (int): Максимальное количество одновременно выполняемых корутин.
+
+    Returns:
+        List: Результаты в порядке корутин.
+
+    Raises:
+        ValueError: Если limit меньше 1.
+
+    Notes:
+        Пул соединений ограничивает только число соединений процесса: веерный
+        запрос без ограничения занимает весь пул и оставляет остальные запросы
+        ждать соединения до DB_POOL_TIMEOUT. С limit меньше размера пула часть
+        соединений всегда остается другим запросам.
+    """
+    if limit < 1:
+        raise ValueError('limit должен быть не меньше 1')
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(aw: Awaitable):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws))
@@ -0,0 +1,227 @@
+import csv
+import io
+import json
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import sqlalchemy as sa
+from loguru import logger
+from sqlalchemy.orm import Session
+
+from common.cache import catalog_cache
+from common.hashing import MAX_PASSWORD_BYTES, hash_passwords, password_too_long
+from common.images import image_pipeline
+from db.crud import insert_users, upsert_cheeses
+from db.models import User
+
+CHEESE_FIELDS = ('name', 'description', 'image_path')
+USER_FIELDS = ('username', 'password')
+
+
+def iter_catalog_file(stream: io.TextIOBase, file_format: str) -> Iterator[Dict[str, Optional[str]]]:
+    """
+    Построчно читает каталог сыров из CSV или JSONL.
+
+    Args:
+        stream (io.TextIOBase): Открытый текстовый поток.
+        file_format (str): Формат файла: csv (с заголовком) или jsonl.
+
+    Yields:
+        Dict[str, Optional[str]]: Запись с ключами name, description и image_path.
+
+    Raises:
+        ValueError: Если формат неизвестен или у записи нет названия.
+    """
+    if file_format == 'csv':
+        records: Iterable[dict] = csv.DictReader(stream)
+    elif file_format == 'jsonl':
+        records = (json.loads(line) for line in stream if line.strip())
+    else:
+        raise ValueError('Неизвестный формат каталога: {0}'.format(file_format))
+    for number, record in enumerate(records, start=1):
+        if not record.get('name'):
+            raise ValueError('Запись {0}: не указано название сыра'.format(number))
+        yield {field: record.get(field) or None for field in CHEESE_FIELDS}
+
+
+def iter_user_file(stream: io.TextIOBase, file_format: str) -> Iterator[Dict[str, str]]:
+    """
+    Построчно читает пользователей из CSV или JSONL.
+
+    Args:
+        stream (io.TextIOBase): Открытый текстовый поток.
+        file_format (str): Формат файла: csv (с заголовком) или jsonl.
+
+    Yields:
+        Dict[str, str]: Запись с ключами username и password (в открытом виде).
+
+    Raises:
+        ValueError: Если формат неизвестен, у записи нет имени или пароля или пароль
+            длиннее MAX_PASSWORD_BYTES байт.
+    """
+    if file_format == 'csv':
+        records: Iterable[dict] = csv.DictReader(stream)
+    elif file_format == 'jsonl':
+        records = (json.loads(line) for line in stream if line.strip())
+    else:
+        raise ValueError('Неизвестный формат файла пользователей: {0}'.format(file_format))
+    for number, record in enumerate(records, start=1):
+        if not record.get('username') or not record.get('password'):
+            raise ValueError('Запись {0}: не указано имя пользователя или пароль'.format(number))
+        if password_too_long(record['password']):
+            raise ValueError('Запись {0}: пароль длиннее {1} байт'.format(number, MAX_PASSWORD_BYTES))
+        yield {field: record[field] for field in USER_FIELDS}
+
+
+def _batches(rows: Iterable[dict], batch_size: int) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_cheeses(
+    db_session: Session,
+    rows: Iterable[dict],
+    batch_size: int = 1000,
+    on_progress: Optional[Callable[[int, float], None]] = None,
+    ingest_images: bool = False
+) -> Dict[str, float]:
+    """
+    Загружает поток сыров пачками, фиксируя транзакцию после каждой пачки.
+
+    Args:
+        db_session (Session): Сессия базы данных.
+        rows (Iterable[dict]): Поток записей с ключами name, description и image_path.
+        batch_size (int): Количество записей в одном многострочном INSERT.
+        on_progress (Optional[Callable[[int, float], None]]): Вызывается после каждой пачки
+            с количеством обработанных записей и затраченным временем в секундах.
+        ingest_images (bool): Ставить ли изображения каждой пачки в очередь на загрузку
+            и создание уменьшенных вариантов.
+
+    Returns:
+        Dict[str, float]: Количество записей, пачек, время и пропускная способность (записей в секунду).
+
+    Notes:
+        В памяти одновременно находится не больше одной пачки, поэтому размер
+        файла не ограничен. Кэш каталога сбрасывается один раз после загрузки.
+    """
+    started = time.perf_counter()
+    processed = 0
+    batches = 0
+    try:
+        for batch in _batches(rows, batch_size):
+            upsert_cheeses(db_session, batch)
+            db_session.commit()
+            # Объекты не загружаются в сессию, но очистка не дает ей расти
+            db_session.expunge_all()
+            if ingest_images:
+                image_pipeline.schedule({row['image_path'] for row in batch})
+            processed += len(batch)
+            batches += 1
+            if on_progress is not None:
+                on_progress(processed, time.perf_counter() - started)
+    except Exception:
+        db_session.rollback()
+        raise
+    finally:
+        if processed:
+            catalog_cache.publish_change(db_session)
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': processed,
+        'batches': batches,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(processed / elapsed, 1) if elapsed else 0.0
+    }
+
+
+def import_users(
+    db_session: Session,
+    rows: Iterable[dict],
+    batch_size: int = 1000,
+    on_progress: Optional[Callable[[int, float], None]] = None
+) -> Dict[str, float]:
+    """
+    Создает поток пользователей пачками, фиксируя транзакцию после каждой пачки.
+
+    Args:
+        db_session (Session): Сессия базы данных.
+        rows (Iterable[dict]): Поток записей с ключами username и password (в открытом виде).
+        batch_size (int): Количество пользователей в одном многострочном INSERT.
+        on_progress (Optional[Callable[[int, float], None]]): Вызывается после каждой пачки
+            с количеством обработанных записей и затраченным временем в секундах.
+
+    Returns:
+        Dict[str, float]: Количество записей, созданных и пропущенных пользователей,
+        пачек, время и пропускная способность (записей в секунду).
+
+    Notes:
+        Пароли пачки хэшируются параллельно во всех процессах пула хэширования
+        (PASSWORD_HASH_WORKERS), это основная часть времени загрузки. Имена,
+        которые уже есть в базе или повторяются в пачке, отбрасываются до
+        хэширования, поэтому повторный запуск с тем же файлом почти ничего не
+        стоит. Вставка выполняется с ON CONFLICT DO NOTHING, так что имя,
+        занятое параллельной регистрацией, тоже пропускается.
+    """
+    started = time.perf_counter()
+    processed = 0
+    created = 0
+    batches = 0
+    try:
+        for batch in _batches(rows, batch_size):
+            unique = {}
+            for row in batch:
+                unique.setdefault(row['username'], row['password'])
+            existing = set(db_session.scalars(sa.select(User.username).where(User.username.in_(list(unique)))))
+            pending = [(username, password) for username, password in unique.items() if username not in existing]
+            hashes = hash_passwords([password for _, password in pending])
+            created += len(insert_users(db_session, [
+                {'username': username, 'password': hashed} for (username, _), hashed in zip(pending, hashes)
+            ]))
+            db_session.commit()
+            db_session.expunge_all()
+            processed += len(batch)
+            batches += 1
+            if on_progress is not None:
+                on_progress(processed, time.perf_counter() - started)
+    except Exception:
+        db_session.rollback()
+        raise
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': processed,
+        'created': created,
+        'skipped': processed - created,
+        'batches': batches,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(processed / elapsed, 1) if elapsed else 0.0
+    }
+
+
+def progress_logger(interval: float = 1.0) -> Callable[[int, float], None]:
+    """
+    Создает обработчик прогресса, пишущий в лог не чаще раза в interval секунд.
+
+    Args:
+        interval (float): Минимальный интервал между записями в лог.
+
+    Returns:
+        Callable[[int, float], None]: Обработчик для import_cheeses и import_users.
+    """
+    last_logged = [float('-inf')]
+
+    def log_progress(processed: int, elapsed: float):
+        if elapsed - last_logged[0] < interval:
+            return
+        last_logged[0] = elapsed
+        logger.info(
+            "Загружено {0} записей за {1:.1f} с ({2:.0f} записей/с)".format(
+                processed, elapsed, processed / elapsed if elapsed else 0
+            )
+        )
+    return log_progress
@@ -1,13 +1,37 @@
+import datetime
+import uuid
 from http import HTTPStatus
 from http.client import HTTPException
+from typing import Any, Iterator, List, Optional
 
 import sqlalchemy
-from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from werkzeug.security import generate_password_hash
 
-from db.models import Cheese, User
+from common.cache import catalog_cache
+from common.hashing import hash_password
+from common.images import image_pipeline
+from db.models import Cheese, RefreshToken, User, cheese_content_hash, cheese_images, uuid7
+
+
+def dialect_insert(db_session: Session, table: Any):
+    """
+    Возвращает INSERT с поддержкой ON CONFLICT для диалекта текущей сессии.
+
+    Args:
+        db_session (Session): Сессия базы данных.
+        table (Any): Модель или таблица, в которую выполняется вставка.
+
+    Returns:
+        Insert: Конструкция INSERT диалекта PostgreSQL или SQLite.
+    """
+    # Модули диалектов загружаются при создании механизма, а не при импорте приложения
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    if db_session.get_bind().dialect.name == 'sqlite':
+        return sqlite.insert(table)
+    return postgresql.insert(table)
 
 
 def create_user(db_session: Session, user: User):
@@ -25,35 +49,175 @@ def create_user(db_session: Session, user: User):
         dict: Словарь с сообщением о создании пользователя.
 
     Notes:
-        Если возникает исключение IntegrityError во время создания пользователя, 
-        то сессия db_session будет откатываться до начального состояния перед вызовом этой функции. 
-        Это предотвращает несогласованное состояние базы данных после ошибки.
-    """
-    existing_user = db_session.query(User).filter(
-        User.username == user.username
-    ).first()
-    if existing_user:
-        raise HTTPException(
-            HTTPStatus.CONFLICT,
-            "Пользователь с таким именем уже существует."
-        )
+        Пользователь создается одним INSERT ... ON CONFLICT (username) DO NOTHING
+        RETURNING по ограничению uq_user_username: занятое имя определяется по
+        пустому RETURNING, без отдельного SELECT и без гонки между проверкой и
+        вставкой. Пароль хэшируется до запроса, поэтому частоту попыток
+        ограничивает вызывающий код (см. common.ratelimit). При ошибке сессия
+        db_session откатывается до состояния перед вызовом этой функции.
+    """
+    insert_stmt = dialect_insert(db_session, User).values(
+        username=user.username,
+        password=hash_password(user.password)
+    )
     try:
-        db_session.add(
-            User(
-                username=user.username,
-                password=generate_password_hash(user.password)
-            )
-        )
-        db_session.commit()
+        created_id = db_session.execute(
+            insert_stmt.on_conflict_do_nothing(index_elements=['username']).returning(User.id)
+        ).scalar()
     except sqlalchemy.exc.IntegrityError as exc:
         db_session.rollback()
         raise HTTPException(
             HTTPStatus.CONFLICT,
             str(exc.orig)
         )
+    if created_id is None:
+        db_session.rollback()
+        raise HTTPException(
+            HTTPStatus.CONFLICT,
+            "Пользователь с таким именем уже существует."
+        )
+    db_session.commit()
     return {"message": 'Пользователь создан'}
 
 
+def insert_users(db_session: Session, rows: List[dict]) -> List[str]:
+    """
+    Создает несколько пользователей одним многострочным INSERT ... ON CONFLICT DO NOTHING.
+
+    Args:
+        db_session (Session): Сессия базы данных.
+        rows (List[dict]): Записи с ключами username и password (уже хэшированным).
+
+    Returns:
+        List[str]: Имена созданных пользователей; занятые имена пропускаются.
+
+    Notes:
+        Транзакция не фиксируется.
+    """
+    if not rows:
+        return []
+    insert_stmt = dialect_insert(db_session, User).values(rows)
+    return list(db_session.scalars(
+        insert_stmt.on_conflict_do_nothing(index_elements=['username']).returning(User.username)
+    ))
+
+
+def create_refresh_token(
+    db_session: Session,
+    user_id: uuid.UUID,
+    lifetime: datetime.timedelta,
+    family_id: Optional[uuid.UUID] = None
+) -> uuid.UUID:
+    """
+    Регистрирует новый токен обновления пользователя.
+
+    Args:
+        db_session (Session): Сессия базы данных.
+        user_id (uuid.UUID): Идентификатор пользователя.
+        lifetime (datetime.timedelta): Время жизни токена.
+        family_id (Optional[uuid.UUID]): Цепочка ротации; None - новый вход, новая цепочка.
+
+    Returns:
+        uuid.UUID: Идентификатор токена для claim jti.
+
+    Notes:
+        Транзакция не фиксируется. Заодно удаляются истекшие токены пользователя.
+    """
+    now = datetime.datetime.utcnow()
+    db_session.execute(
+        sqlalchemy.delete(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.expires_at <= now)
+    )
+    token = RefreshToken(
+        id=uuid7(),
+        user_id=user_id,
+        family_id=family_id or uuid7(),
+        expires_at=now + lifetime
+    )
+    db_session.add(token)
+    db_session.flush()
+    return token.id
+
+
+def rotate_refresh_token(db_session: Session, token_id: uuid.UUID, user_id: uuid.UUID) -> Optional[uuid.UUID]:
+    """
+    Погашает токен обновления перед выдачей новой пары.
+
+    Args:
+        db_session (Session): Сессия базы данных.
+        token_id (uuid.UUID): Claim jti предъявленного токена.
+        user_id (uuid.UUID): Claim sub предъявленного токена.
+
+    Returns:
+        Optional[uuid.UUID]: Цепочка токена, если он действовал, иначе None.
+
+    Notes:
+        Токен погашается условным UPDATE, поэтому из двух одновременных обменов
+        одного токена успешен только один. Повторное предъявление уже погашенного
+        токена означает, что он утек: отзывается вся цепочка, и владелец должен
+        войти заново. Транзакция с погашением не фиксируется, отзыв фиксируется сразу.
+    """
+    now = datetime.datetime.utcnow()
+    family_id = db_session.execute(
+        sqlalchemy.update(RefreshToken)
+        .where(
+            RefreshToken.id == token_id,
+            RefreshToken.user_id == user_id,
+            RefreshToken.used_at.is_(None),
+            RefreshToken.expires_at > now
+        )
+        .values(used_at=now)
+        .returning(RefreshToken.family_id)
+    ).scalar()
+    if family_id is not None:
+        return family_id
+    reused_family_id = db_session.scalar(
+        sqlalchemy.select(RefreshToken.family_id)
+        .where(RefreshToken.id == token_id, RefreshToken.user_id == user_id)
+    )
+    if reused_family_id is not None:
+        db_session.execute(
+            sqlalchemy.update(RefreshToken)
+            .where(RefreshToken.family_id == reused_family_id, RefreshToken.used_at.is_(None))
+            .values(used_at=now)
+        )
+    db_session.commit()
+    return None
+
+
+def upsert_cheeses(db_session: Session, rows: List[dict]):
+    """
+    Вставляет или обновляет несколько сыров одним многострочным INSERT ... ON CONFLICT.
+
+    Args:
+        db_session (Session): Сессия базы данных.
+        rows (List[dict]): Записи с ключами name, description и image_path.
+
+    Notes:
+        Транзакция не фиксируется. Ключ конфликта - content_hash (cheese_content_hash
+        от названия и описания) с компактным уникальным индексом вместо индекса по
+        неограниченному описанию. Повторы одного ключа внутри пачки схлопываются
+        (побеждает последняя запись), так как PostgreSQL не позволяет обновить
+        одну строку дважды в одном INSERT ... ON CONFLICT DO UPDATE.
+    """
+    unique_rows = list({
+        cheese_content_hash(row['name'], row['description']): row for row in rows
+    }.items())
+    if not unique_rows:
+        return
+    insert_stmt = dialect_insert(db_session, Cheese).values([
+        dict(row, content_hash=content_hash) for content_hash, row in unique_rows
+    ])
+
+    # Название и описание определяют ключ, поэтому при конфликте меняется только изображение
+    on_conflict_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=['content_hash'],
+        set_=dict(image_path=insert_stmt.excluded.image_path)
+    )
+
+    db_session.execute(on_conflict_stmt)
+
+
 def create_cheese(db_session: Session, name: str, description: str, image_path: str):
     """
     Создает или обновляет запись о сыре в базе данных.
@@ -66,25 +230,19 @@ def create_cheese(db_session: Session, name: str, description: str, image_path:
 
     Returns:
         dict: Словарь с сообщением о создании или обновлении записи о сыре.
+
+    Notes:
+        После фиксации транзакции версия каталога увеличивается, и остальные
+        процессы получают уведомление о необходимости сбросить кэш каталога.
+        Изображение загружается и уменьшается в фоне, не задерживая запрос.
     """
     try:
-        insert_stmt = insert(Cheese).values(
-            name=name,
-            description=description,
-            image_path=image_path
-        )
-
-        on_conflict_stmt = insert_stmt.on_conflict_do_update(
-            index_elements=['name', 'description'],
-            set_=dict(
-                name=insert_stmt.excluded.name,
-                description=insert_stmt.excluded.description,
-                image_path=insert_stmt.excluded.image_path
-            )
-        )
-
-        db_session.execute(on_conflict_stmt)
+        upsert_cheeses(db_session, [
+            dict(name=name, description=description, image_path=image_path)
+        ])
         db_session.commit()
+        catalog_cache.publish_change(db_session)
+        image_pipeline.schedule([image_path])
         return {"message": "Запись о сыре создана или обновлена"}
     except IntegrityError as exc:
         db_session.rollback()
@@ -92,3 +250,107 @@ def create_cheese(db_session: Session, name: str, description: str, image_path:
             HTTPStatus.CONFLICT,
             str(exc.orig)
         )
+
+
+def get_cheese_page(db_session: Session, limit: int, after: Optional[uuid.UUID] = None):
+    """
+    Возвращает страницу каталога сыров с курсорной (keyset) пагинацией.
+
+    Args:
+        db_session (Session): Сессия базы данных.
+        limit (int): Количество записей на странице.
+        after (Optional[uuid.UUID]): Идентификатор последней записи предыдущей страницы.
+
+    Returns:
+        tuple: Список сыров страницы и идентификатор для следующей страницы
+        (None, если страница последняя).
+
+    Notes:
+        Записи упорядочены по первичному ключу, поэтому запрос любой страницы
+        выполняется как поиск по индексу и не зависит от ее глубины, в отличие от OFFSET.
+        Ключи создаются uuid7 и растут со временем: новые сыры попадают в конец
+        каталога, а не между уже просмотренными страницами.
+    """
+    cheeses = db_session.scalars(cheese_page_statement(limit, after)).all()
+    return split_cheese_page(cheeses, limit)
+
+
+def cheese_page_statement(limit: int, after: Optional[uuid.UUID] = None) -> sqlalchemy.Select:
+    """
+    Строит запрос страницы каталога, общий для синхронной и асинхронной сессий.
+
+    Args:
+        limit (int): Количество записей на странице.
+        after (Optional[uuid.UUID]): Идентификатор последней записи предыдущей страницы.
+
+    Returns:
+        sqlalchemy.Select: Запрос limit + 1 сыров, по лишней записи определяется наличие следующей страницы.
+    """
+    statement = sqlalchemy.select(Cheese)
+    if after is not None:
+        statement = statement.where(Cheese.id > after)
+    return statement.order_by(Cheese.id).limit(limit + 1)
+
+
+def split_cheese_page(cheeses: List[Cheese], limit: int):
+    """
+    Отделяет лишнюю запись, выбранную cheese_page_statement.
+
+    Args:
+        cheeses (List[Cheese]): Результат запроса cheese_page_statement.
+        limit (int): Количество записей на странице.
+
+    Returns:
+        tuple: Список сыров страницы и идентификатор для следующей страницы (или None).
+    """
+    if len(cheeses) > limit:
+        return cheeses[:limit], cheeses[limit - 1].id
+    return cheeses, None
+
+
+async def get_cheese_page_async(db_session: AsyncSession, limit: int, after: Optional[uuid.UUID] = None):
+    """
+    Асинхронный вариант get_cheese_page.
+
+    Args:
+        db_session (AsyncSession): Асинхронная сессия базы данных.
+        limit (int): Количество записей на странице.
+        after (Optional[uuid.UUID]): Идентификатор последней записи предыдущей страницы.
+
+    Returns:
+        tuple: Список сыров страницы и идентификатор для следующей страницы (или None).
+    """
+    cheeses = (await db_session.scalars(cheese_page_statement(limit, after))).all()
+    return split_cheese_page(cheeses, limit)
+
+
+def iter_cheese_batches(db_session: Session, batch_size: int) -> Iterator[List[dict]]:
+    """
+    Читает весь каталог сыров пачками через серверный курсор.
+
+    Args:
+        db_session (Session): Сессия базы данных, используемая только для этого чтения.
+        batch_size (int): Количество строк, получаемых от базы данных за раз.
+
+    Yields:
+        List[dict]: Пачка сыров в публичном представлении, как у Cheese.to_dict.
+
+    Notes:
+        Выбираются только нужные колонки без создания ORM-объектов, а yield_per
+        включает stream_results, поэтому в памяти находится не больше одной пачки.
+    """
+    query = (
+        sqlalchemy.select(Cheese.name, Cheese.description, Cheese.image_path, Cheese.image_key)
+        .order_by(Cheese.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in db_session.execute(query).partitions():
+        yield [
+            {
+                "name": row.name,
+                "description": row.description,
+                "image_path": row.image_path,
+                "images": cheese_images(row.image_key)
+            }
+            for row in partition
+        ]
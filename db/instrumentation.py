@@ -0,0 +1,171 @@
+import contextvars
+import time
+from typing import Dict, Optional
+
+from flask import Flask, before_render_template, request, template_rendered
+from loguru import logger
+import sqlalchemy.engine
+from sqlalchemy import event
+
+from config import Config
+
+
+class RequestTimings:
+    """
+    Счетчики запросов к базе данных и рендеринга в рамках одного HTTP-запроса.
+
+    Attributes:
+        started (float): Момент начала запроса (time.perf_counter).
+        queries (int): Количество выполненных SQL-запросов.
+        db_seconds (float): Суммарное время SQL-запросов.
+        render_seconds (float): Суммарное время рендеринга шаблонов.
+        statements (Dict[str, int]): Количество выполнений каждого текста SQL-запроса.
+    """
+
+    __slots__ = ('started', 'queries', 'db_seconds', 'render_seconds', 'render_started', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_started: Optional[float] = None
+        self.statements: Dict[str, int] = {}
+
+    def server_timing(self) -> str:
+        """
+        Формирует значение заголовка Server-Timing.
+
+        Returns:
+            str: Метрики db, render и total в миллисекундах.
+        """
+        total = time.perf_counter() - self.started
+        return 'db;dur={0:.2f};desc="{1} queries", render;dur={2:.2f}, total;dur={3:.2f}'.format(
+            self.db_seconds * 1000, self.queries, self.render_seconds * 1000, total * 1000
+        )
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar('request_timings', default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """
+    Возвращает счетчики текущего HTTP-запроса.
+
+    Returns:
+        Optional[RequestTimings]: Счетчики или None вне запроса (например, в фоновых потоках).
+    """
+    return _current.get()
+
+
+def redact_parameters(parameters) -> str:
+    """
+    Описывает параметры SQL-запроса без их значений.
+
+    Args:
+        parameters: Параметры, переданные драйверу базы данных.
+
+    Returns:
+        str: Типы параметров, например '(str, UUID, int)'.
+    """
+    if isinstance(parameters, dict):
+        return '{' + ', '.join('{0}: {1}'.format(key, type(value).__name__) for key, value in parameters.items()) + '}'
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return '[{0} x {1}]'.format(len(parameters), redact_parameters(parameters[0]))
+        return '(' + ', '.join(type(value).__name__ for value in parameters) + ')'
+    return type(parameters).__name__
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    timings = _current.get()
+    if timings is not None:
+        timings.queries += 1
+        timings.db_seconds += elapsed
+        timings.statements[statement] = timings.statements.get(statement, 0) + 1
+    if elapsed * 1000 >= Config.SQL_SLOW_QUERY_MS:
+        logger.warning(
+            "Медленный SQL-запрос ({0:.1f} мс): {1} параметры: {2}".format(
+                elapsed * 1000, ' '.join(statement.split()), redact_parameters(parameters)
+            )
+        )
+
+
+def _handle_error(exception_context):
+    # Ошибочный запрос не доходит до after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+
+# Слушатели подключены к классу Engine: механизмы создаются лениво, и запросы к
+# репликам учитываются вместе с запросами к основной базе. Вне HTTP-запроса
+# (прогрев, фоновые потоки, асинхронные маршруты) в лог попадают только медленные запросы
+event.listen(sqlalchemy.engine.Engine, 'before_cursor_execute', _before_cursor_execute)
+event.listen(sqlalchemy.engine.Engine, 'after_cursor_execute', _after_cursor_execute)
+event.listen(sqlalchemy.engine.Engine, 'handle_error', _handle_error)
+
+
+def _start_request():
+    request.environ['request_timings_token'] = _current.set(RequestTimings())
+
+
+def _before_render(sender, template, context, **extra):
+    timings = _current.get()
+    if timings is not None:
+        timings.render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    timings = _current.get()
+    if timings is not None and timings.render_started is not None:
+        timings.render_seconds += time.perf_counter() - timings.render_started
+        timings.render_started = None
+
+
+def _add_server_timing(response):
+    timings = _current.get()
+    if timings is not None and Config.SERVER_TIMING:
+        response.headers['Server-Timing'] = timings.server_timing()
+    return response
+
+
+def _finish_request(exc=None):
+    timings = _current.get()
+    token = request.environ.pop('request_timings_token', None)
+    if token is not None:
+        _current.reset(token)
+    if timings is None:
+        return
+    for statement, count in timings.statements.items():
+        if count >= Config.SQL_N_PLUS_ONE_THRESHOLD:
+            logger.warning(
+                "Возможный N+1 в {0} {1}: запрос выполнен {2} раз: {3}".format(
+                    request.method, request.path, count, ' '.join(statement.split())
+                )
+            )
+
+
+def init_app(app: Flask):
+    """
+    Подключает учет SQL-запросов и заголовок Server-Timing к приложению.
+
+    Args:
+        app (Flask): Экземпляр приложения.
+
+    Notes:
+        На каждый SQL-запрос приходится два вызова perf_counter и увеличение
+        счетчика, поэтому учет можно оставлять включенным в production.
+        Повторы одного текста запроса не менее SQL_N_PLUS_ONE_THRESHOLD раз
+        за HTTP-запрос попадают в лог как вероятный N+1.
+    """
+    app.before_request(_start_request)
+    app.after_request(_add_server_timing)
+    app.teardown_request(_finish_request)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
@@ -1,11 +1,16 @@
+import datetime
+import hashlib
+import secrets
+import threading
+import time
 import uuid
-from typing import Any
+from typing import Any, Optional
 
 import flask_login
 import sqlalchemy as sa
-from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 
+from common.media import VARIANTS, media_url
 from config import UserConfig
 
 # Определение метаданных для таблиц
@@ -23,11 +28,53 @@ metadata = sa.MetaData(
 # Создание базового класса для всех сущностей базы данных
 Base: Any = declarative_base(metadata=metadata)
 
+class UUID7Generator:
+    """
+    Генератор UUID версии 7 (RFC 9562): 48 бит времени в миллисекундах, затем счетчик и случайные биты.
+
+    Значения растут со временем, поэтому новые строки попадают в конец индекса
+    первичного ключа, а не в случайные страницы, как при uuid4: меньше
+    расщеплений страниц и горячих страниц в кэше. 12 бит rand_a используются
+    как счетчик внутри миллисекунды (метод 1 RFC 9562) и начинаются со
+    случайного значения, поэтому идентификаторы одного процесса строго
+    возрастают. Между процессами порядок внутри миллисекунды не гарантирован,
+    а уникальность обеспечивают 62 случайных бита rand_b.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+
+    def __call__(self) -> uuid.UUID:
+        with self._lock:
+            timestamp_ms = time.time_ns() // 1_000_000
+            if timestamp_ms > self._last_ms:
+                self._last_ms = timestamp_ms
+                # Старший бит счетчика нулевой, чтобы в миллисекунде хватало места на 2048+ значений
+                self._counter = secrets.randbits(11)
+            else:
+                self._counter += 1
+                if self._counter > 0xFFF:
+                    # Счетчик исчерпан или часы пошли назад: время берется на 1 мс вперед
+                    self._last_ms += 1
+                    self._counter = secrets.randbits(11)
+            timestamp_ms, counter = self._last_ms, self._counter
+        value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+        value |= 0x7 << 76 | counter << 64
+        value |= 0b10 << 62 | secrets.randbits(62)
+        return uuid.UUID(int=value)
+
+
+# Первичные ключи упорядочены по времени создания; курсор пагинации по id дает тот же порядок
+uuid7 = UUID7Generator()
+
+
 class UUIDMixin:
     id = sa.Column(
-        UUID(as_uuid=True),
+        sa.Uuid(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
     )
 
 class User(flask_login.UserMixin, Base, UUIDMixin):
@@ -45,6 +92,67 @@ class User(flask_login.UserMixin, Base, UUIDMixin):
     password = sa.Column(sa.String(255), nullable=False)
     is_admin = sa.Column(sa.Boolean, default=False)
 
+class RefreshToken(Base, UUIDMixin):
+    """
+    Выданный API-клиенту токен обновления; id совпадает с claim jti токена.
+
+    Attributes:
+        user_id (uuid.UUID): Владелец токена.
+        family_id (uuid.UUID): Цепочка токенов, полученных друг из друга ротацией после одного входа.
+        expires_at (datetime): Время истечения токена.
+        used_at (datetime): Время обмена токена на новую пару или его отзыва; None - токен действует.
+    """
+    __tablename__ = "refresh_token"
+    __table_args__ = (
+        sa.Index('ix_refresh_token_family_id', 'family_id'),
+        sa.Index('ix_refresh_token_user_id_expires_at', 'user_id', 'expires_at'),
+    )
+
+    user_id = sa.Column(sa.Uuid(as_uuid=True), sa.ForeignKey(User.id, ondelete='CASCADE'), nullable=False)
+    family_id = sa.Column(sa.Uuid(as_uuid=True), nullable=False)
+    expires_at = sa.Column(sa.DateTime, nullable=False)
+    used_at = sa.Column(sa.DateTime)
+
+def cheese_content_hash(name: str, description: Optional[str]) -> str:
+    """
+    Вычисляет ключ дедупликации сыра по названию и описанию.
+
+    Args:
+        name (str): Название сыра.
+        description (Optional[str]): Описание сыра; отсутствующее и пустое описание совпадают.
+
+    Returns:
+        str: Первые 128 бит SHA-256 в hex (32 символа).
+
+    Notes:
+        Длина названия в начале строки разделяет название и описание без
+        служебного символа. Выражение миграции 6a2f8c1e9b47 для PostgreSQL
+        должно давать то же значение.
+    """
+    canonical = '{0}:{1}{2}'.format(len(name), name, description or '')
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+
+def cheese_images(image_key: Optional[str]) -> Optional[dict]:
+    """
+    Возвращает URL локальных вариантов изображения сыра.
+
+    Args:
+        image_key (Optional[str]): Хэш содержимого локальной копии изображения.
+
+    Returns:
+        Optional[dict]: URL вариантов из VARIANTS или None, пока они не созданы.
+    """
+    if not image_key:
+        return None
+    return {variant: media_url(image_key, variant) for variant in VARIANTS}
+
+
+def _default_content_hash(context) -> str:
+    parameters = context.get_current_parameters()
+    return cheese_content_hash(parameters['name'], parameters.get('description'))
+
+
 class Cheese(Base, UUIDMixin):
     """
     Модель сыра, представляющая информацию о различных сортах сыра.
@@ -53,9 +161,61 @@ class Cheese(Base, UUIDMixin):
         name (str): Название сорта сыра.
         description (str): Описание сорта сыра.
         image_path (str): Путь к изображению сыра.
+        image_key (str): Хэш содержимого локальной копии изображения, если она уже создана.
+        content_hash (str): Ключ дедупликации cheese_content_hash(name, description) с
+            уникальным индексом; по нему выполняется upsert каталога.
     """
     __tablename__ = "cheese"
+    __table_args__ = (
+        sa.Index('uq_cheese_content_hash', 'content_hash', unique=True),
+    )
 
     name = sa.Column(sa.String(100), nullable=False)
     description = sa.Column(sa.Text)
+    content_hash = sa.Column(sa.String(32), nullable=False, default=_default_content_hash)
     image_path = sa.Column(sa.String(255))
+    image_key = sa.Column(sa.String(64))
+
+    def to_dict(self) -> dict:
+        """
+        Возвращает публичное представление сыра для API.
+
+        Returns:
+            dict: Название, описание, путь к исходному изображению сыра и URL
+            локальных вариантов изображения (None, пока они не созданы).
+        """
+        return {
+            "name": self.name,
+            "description": self.description,
+            "image_path": self.image_path,
+            "images": cheese_images(self.image_key)
+        }
+
+class EmailOutbox(Base, UUIDMixin):
+    """
+    Очередь исходящих писем, обрабатываемая фоновыми отправителями.
+
+    Attributes:
+        recipient (str): Email-адрес получателя.
+        username (str): Имя пользователя, от имени которого оставлена обратная связь.
+        status (str): Состояние письма: pending, sending, sent или failed.
+        attempts (int): Количество выполненных попыток отправки.
+        next_attempt_at (datetime): Время следующей попытки; для писем в статусе sending -
+            момент, после которого незавершенная отправка считается брошенной.
+        last_error (str): Текст последней ошибки отправки.
+        created_at (datetime): Время постановки письма в очередь.
+        sent_at (datetime): Время успешной отправки.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        sa.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    recipient = sa.Column(sa.String(255), nullable=False)
+    username = sa.Column(sa.String(80), nullable=False)
+    status = sa.Column(sa.String(16), nullable=False, default='pending')
+    attempts = sa.Column(sa.Integer, nullable=False, default=0)
+    next_attempt_at = sa.Column(sa.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    last_error = sa.Column(sa.Text)
+    created_at = sa.Column(sa.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    sent_at = sa.Column(sa.DateTime)
@@ -0,0 +1,152 @@
+import re
+from typing import List, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from db.models import Cheese
+
+# Выражения должны совпадать с индексами из миграции 3b1f2a9c4d10,
+# иначе PostgreSQL не сможет использовать их при поиске
+SEARCH_CONFIG = 'simple'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query: str) -> List[str]:
+    """
+    Разбивает поисковый запрос на слова.
+
+    Args:
+        query (str): Строка, введенная пользователем.
+
+    Returns:
+        List[str]: Слова запроса в нижнем регистре.
+    """
+    return [token.lower() for token in _TOKEN_RE.findall(query)]
+
+
+def search_vector():
+    """
+    Возвращает выражение tsvector по названию и описанию сыра.
+
+    Returns:
+        ColumnElement: Взвешенный tsvector (название весит больше описания).
+    """
+    config = sa.literal_column("'{0}'".format(SEARCH_CONFIG))
+    empty = sa.literal_column("''")
+    return sa.func.setweight(
+        sa.func.to_tsvector(config, sa.func.coalesce(Cheese.name, empty)),
+        sa.literal_column("'A'")
+    ).op('||')(
+        sa.func.setweight(
+            sa.func.to_tsvector(config, sa.func.coalesce(Cheese.description, empty)),
+            sa.literal_column("'B'")
+        )
+    )
+
+
+def _search_postgresql(query: str, tokens: List[str], limit: int) -> sa.Select:
+    """
+    Полнотекстовый поиск по GIN-индексам PostgreSQL.
+
+    Каждое слово ищется как префикс (`слово:*`), что позволяет искать по мере ввода,
+    а триграммный оператор `%` по названию находит записи с опечатками.
+    """
+    ts_query = sa.func.to_tsquery(
+        SEARCH_CONFIG,
+        ' & '.join('{0}:*'.format(token) for token in tokens)
+    )
+    vector = search_vector()
+    similarity = sa.func.similarity(Cheese.name, query)
+    rank = sa.func.ts_rank(vector, ts_query) + similarity
+    return (
+        sa.select(Cheese)
+        .where(sa.or_(vector.op('@@')(ts_query), Cheese.name.op('%')(query)))
+        .order_by(rank.desc(), Cheese.name)
+        .limit(limit)
+    )
+
+
+def _search_fallback(tokens: List[str], limit: int) -> sa.Select:
+    """
+    Поиск через LIKE для баз без полнотекстового поиска (SQLite в локальных тестах).
+
+    Все слова должны встречаться в названии или описании; совпадения
+    с началом названия ранжируются выше.
+    """
+    conditions = [
+        sa.or_(
+            Cheese.name.icontains(token, autoescape=True),
+            Cheese.description.icontains(token, autoescape=True)
+        )
+        for token in tokens
+    ]
+    rank = sa.case(
+        (Cheese.name.istartswith(tokens[0], autoescape=True), 2),
+        (Cheese.name.icontains(tokens[0], autoescape=True), 1),
+        else_=0
+    )
+    return (
+        sa.select(Cheese)
+        .where(*conditions)
+        .order_by(rank.desc(), Cheese.name)
+        .limit(limit)
+    )
+
+
+def search_statement(dialect_name: str, query: str, limit: int) -> Optional[sa.Select]:
+    """
+    Строит поисковый запрос для диалекта базы данных.
+
+    Args:
+        dialect_name (str): Имя диалекта SQLAlchemy.
+        query (str): Поисковый запрос; последнее слово может быть введено не полностью.
+        limit (int): Максимальное количество результатов.
+
+    Returns:
+        Optional[sa.Select]: Запрос или None, если в строке нет ни одного слова.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    if dialect_name == 'postgresql':
+        return _search_postgresql(' '.join(tokens), tokens, limit)
+    return _search_fallback(tokens, limit)
+
+
+def search_cheese(db_session: Session, query: str, limit: int) -> List[Cheese]:
+    """
+    Ищет сыры по названию и описанию с ранжированием результатов.
+
+    Args:
+        db_session (Session): Сессия базы данных.
+        query (str): Поисковый запрос; последнее слово может быть введено не полностью.
+        limit (int): Максимальное количество результатов.
+
+    Returns:
+        List[Cheese]: Найденные сыры, отсортированные по релевантности.
+    """
+    statement = search_statement(db_session.get_bind().dialect.name, query, limit)
+    if statement is None:
+        return []
+    return list(db_session.scalars(statement).all())
+
+
+async def search_cheese_async(db_session: AsyncSession, query: str, limit: int) -> List[Cheese]:
+    """
+    Асинхронный вариант search_cheese.
+
+    Args:
+        db_session (AsyncSession): Асинхронная сессия базы данных.
+        query (str): Поисковый запрос.
+        limit (int): Максимальное количество результатов.
+
+    Returns:
+        List[Cheese]: Найденные сыры, отсортированные по релевантности.
+    """
+    statement = search_statement(db_session.bind.dialect.name, query, limit)
+    if statement is None:
+        return []
+    return list((await db_session.scalars(statement)).all())
@@ -1,15 +1,362 @@
-from typing import Generator
+import itertools
+import os
+import threading
+import time
+from typing import Callable, Dict, Generator, List, Optional
 
 import sqlalchemy.engine
-from sqlalchemy.orm import sessionmaker
+from flask import Flask, g, has_request_context, session as flask_session
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
 
+from common.lazy import LazyResource
 from config import Config
 
-# Создаем SQLAlchemy механизм и устанавливаем соединение с базой данных
-engine = sqlalchemy.create_engine(Config.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, echo=False)
+# Ключ cookie-сессии с моментом (time.time()), до которого чтение идет с основной базы
+PRIMARY_UNTIL_KEY = 'db_primary_until'
+
+# Отставание реплики PostgreSQL в секундах; без входящего WAL реплика не отстает,
+# даже если последняя примененная транзакция была давно
+POSTGRES_LAG_QUERY = sqlalchemy.text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool, измеряющий время ожидания свободного соединения.
+
+    Attributes:
+        wait_count (int): Количество выдач соединений из пула.
+        wait_seconds (float): Суммарное время ожидания соединений.
+        max_wait_seconds (float): Максимальное время ожидания соединения.
+        timeouts (int): Количество превышений pool_timeout.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._pid = os.getpid()
+        self.wait_count = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sqlalchemy.exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.wait_count += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def recreate(self):
+        # Пул пересоздается после engine.dispose(). В том же процессе счетчики
+        # сохраняются; после fork новый пул начинает с нуля, иначе каждый рабочий
+        # процесс повторно учел бы ожидания родителя
+        new_pool = super().recreate()
+        if self._pid != new_pool._pid:
+            return new_pool
+        new_pool.wait_count = self.wait_count
+        new_pool.wait_seconds = self.wait_seconds
+        new_pool.max_wait_seconds = self.max_wait_seconds
+        new_pool.timeouts = self.timeouts
+        return new_pool
+
+
+def _unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def install_sqlite_functions(engine: sqlalchemy.engine.Engine):
+    """
+    Подключает к соединениям SQLite функции с семантикой PostgreSQL.
+
+    Args:
+        engine (sqlalchemy.engine.Engine): Механизм; для других баз ничего не делает.
+
+    Notes:
+        Встроенная lower() SQLite переводит в нижний регистр только ASCII, поэтому
+        поиск без учета регистра (ilike, icontains) не находил кириллицу в
+        другом регистре. Она заменяется на str.lower.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _register(dbapi_connection, connection_record):
+        dbapi_connection.create_function('lower', 1, _unicode_lower, deterministic=True)
+
+
+def create_pooled_engine(url: str) -> sqlalchemy.engine.Engine:
+    """
+    Создает механизм SQLAlchemy с общими настройками пула соединений.
+
+    Args:
+        url (str): URI базы данных.
+
+    Returns:
+        sqlalchemy.engine.Engine: Механизм с InstrumentedQueuePool.
+    """
+    engine = sqlalchemy.create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        echo=False
+    )
+    install_sqlite_functions(engine)
+    return engine
+
+
+# Механизмы создаются при первом обращении, поэтому импорт приложения не
+# разбирает URL базы данных и не создает пулы соединений
+_engine = LazyResource(lambda: create_pooled_engine(Config.SQLALCHEMY_DATABASE_URI))
+
+# Реплики только для чтения, у каждой свой пул соединений
+_replica_engines = LazyResource(lambda: [create_pooled_engine(url) for url in Config.DATABASE_REPLICA_URLS])
+
+
+def get_engine() -> sqlalchemy.engine.Engine:
+    """
+    Возвращает механизм основной базы данных, создавая его при первом вызове.
+
+    Returns:
+        sqlalchemy.engine.Engine: Механизм с InstrumentedQueuePool.
+    """
+    return _engine.get()
+
+
+def engine_created() -> bool:
+    """
+    Проверяет, создан ли в процессе механизм основной базы данных.
+
+    Returns:
+        bool: True, если процесс уже обращался к основной базе.
+    """
+    return _engine.created
+
+
+def get_replica_engines() -> List[sqlalchemy.engine.Engine]:
+    """
+    Возвращает механизмы реплик в порядке DATABASE_REPLICA_URLS.
+
+    Returns:
+        List[sqlalchemy.engine.Engine]: Механизмы реплик; пустой список, если реплик нет.
+    """
+    return _replica_engines.get()
+
+
+def dispose_engines(close: bool = True):
+    """
+    Сбрасывает пулы уже созданных механизмов основной базы и реплик.
+
+    Args:
+        close (bool): Закрывать ли соединения пула. После fork передается False:
+            соединения принадлежат родительскому процессу.
+
+    Notes:
+        Механизмы, к которым процесс еще не обращался, не создаются.
+    """
+    engines = []
+    if _engine.created:
+        engines.append(_engine.get())
+    if _replica_engines.created:
+        engines.extend(_replica_engines.get())
+    for engine in engines:
+        engine.dispose(close=close)
+
+
+class PrimarySession(Session):
+    """
+    Сессия основной базы данных; механизм по умолчанию создается при первой сессии.
+    """
+
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind or get_engine(), **kwargs)
+
 
 # Создаем фабрику сессий
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+SessionLocal = sessionmaker(class_=PrimarySession, autocommit=False, autoflush=False, expire_on_commit=False)
+
+# Фабрика сессий реплик; механизм выбирается при создании сессии
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
+
+
+def replica_lag(connection: sqlalchemy.engine.Connection) -> float:
+    """
+    Измеряет отставание реплики от основной базы.
+
+    Args:
+        connection (sqlalchemy.engine.Connection): Соединение с репликой.
+
+    Returns:
+        float: Отставание в секундах. Для баз без репликации (например, SQLite)
+        только проверяется доступность и возвращается 0.
+    """
+    if connection.dialect.name == 'postgresql':
+        return float(connection.execute(POSTGRES_LAG_QUERY).scalar())
+    connection.execute(sqlalchemy.text('SELECT 1'))
+    return 0.0
+
+
+class ReplicaRouter:
+    """
+    Выбор реплики для чтения с учетом отставания и недавних записей.
+
+    Фоновый поток процесса раз в check_interval секунд измеряет отставание каждой
+    реплики. Чтение уходит на основную базу, если нет реплики с отставанием не
+    больше max_lag, если клиент недавно писал (read-your-writes) или если в
+    процессе недавно изменился каталог.
+
+    Attributes:
+        engines (List[sqlalchemy.engine.Engine]): Механизмы реплик из engines_factory.
+        max_lag (float): Допустимое отставание реплики в секундах.
+        check_interval (float): Интервал проверки отставания в секундах.
+        lags (List[Optional[float]]): Последнее измеренное отставание реплик;
+            None - реплика недоступна или еще не проверена.
+        last_write (float): Момент (time.monotonic()) последнего известного изменения каталога.
+    """
+
+    def __init__(
+        self,
+        engines_factory: Callable[[], List[sqlalchemy.engine.Engine]],
+        max_lag: float,
+        check_interval: float
+    ):
+        self.engines_factory = engines_factory
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lags: List[Optional[float]] = []
+        self._unavailable: List[bool] = []
+        self.last_write = float('-inf')
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._monitor_pid: Optional[int] = None
+
+    @property
+    def sticky_seconds(self) -> float:
+        """
+        Время после записи, в течение которого чтение идет с основной базы.
+
+        Notes:
+            Реплика, отстающая не больше max_lag, через max_lag после записи уже
+            содержит ее. check_interval добавлен, так как отставание могло вырасти
+            после последнего измерения.
+        """
+        return self.max_lag + self.check_interval
+
+    @property
+    def engines(self) -> List[sqlalchemy.engine.Engine]:
+        """
+        Механизмы реплик; создаются при первом обращении к маршрутизатору.
+        """
+        return self.engines_factory()
+
+    def _ensure_monitor(self):
+        # Проверка pid перезапускает поток в дочерних процессах после fork
+        if self._monitor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._monitor_pid == os.getpid():
+                return
+            self._monitor_pid = os.getpid()
+            self.lags = [None] * len(self.engines)
+            self._unavailable = [False] * len(self.engines)
+        threading.Thread(target=self._monitor, name='replica-lag-monitor', daemon=True).start()
+
+    def _monitor(self):
+        while True:
+            self.check()
+            time.sleep(self.check_interval)
+
+    def check(self):
+        """
+        Измеряет отставание всех реплик.
+        """
+        for index, replica in enumerate(self.engines):
+            try:
+                with replica.connect() as connection:
+                    lag = replica_lag(connection)
+            except Exception as err:
+                # В лог попадает только переход в недоступное состояние, а не каждая проверка
+                if not self._unavailable[index]:
+                    logger.warning("Реплика {0} недоступна: {1}".format(index, err))
+                lag = None
+            self._unavailable[index] = lag is None
+            self.lags[index] = lag
+
+    def note_write(self):
+        """
+        Отмечает изменение каталога: процесс читает с основной базы sticky_seconds.
+        """
+        self.last_write = time.monotonic()
+
+    def pick(self, primary_until: float = 0.0) -> Optional[int]:
+        """
+        Выбирает реплику для чтения.
+
+        Args:
+            primary_until (float): Момент (time.time()), до которого клиент должен
+                читать с основной базы после своей записи.
+
+        Returns:
+            Optional[int]: Номер реплики в engines или None, если читать нужно с основной базы.
+        """
+        if not self.engines:
+            return None
+        self._ensure_monitor()
+        if time.time() < primary_until or time.monotonic() - self.last_write < self.sticky_seconds:
+            return None
+        fresh = [index for index, lag in enumerate(self.lags) if lag is not None and lag <= self.max_lag]
+        if not fresh:
+            return None
+        return fresh[next(self._counter) % len(fresh)]
+
+
+replica_router = ReplicaRouter(get_replica_engines, Config.REPLICA_MAX_LAG, Config.REPLICA_CHECK_INTERVAL)
+
+
+@event.listens_for(SessionLocal, 'after_flush')
+def _mark_flush(db_session, flush_context):
+    db_session.info['has_writes'] = True
+
+
+@event.listens_for(SessionLocal, 'do_orm_execute')
+def _mark_statement(orm_execute_state):
+    # INSERT/UPDATE/DELETE через session.execute проходят мимо flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['has_writes'] = True
+
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _stick_to_primary(db_session):
+    if db_session.info.pop('has_writes', False) and replica_router.engines and has_request_context():
+        flask_session[PRIMARY_UNTIL_KEY] = time.time() + replica_router.sticky_seconds
+
+
+@event.listens_for(SessionLocal, 'after_rollback')
+def _forget_writes(db_session):
+    db_session.info.pop('has_writes', None)
+
+
+@event.listens_for(ReplicaSessionLocal, 'before_flush')
+def _forbid_replica_writes(db_session, flush_context, instances):
+    raise sqlalchemy.exc.InvalidRequestError('Сессия реплики предназначена только для чтения')
+
 
 def get_db() -> Generator:
     """
@@ -29,3 +376,90 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+def get_request_db(read_only: bool = False) -> Session:
+    """
+    Возвращает сессию базы данных текущего запроса.
+
+    Args:
+        read_only (bool): Запрос только читает данные и может обслуживаться репликой.
+
+    Returns:
+        Session: Сессия, созданная при первом обращении в рамках запроса.
+
+    Notes:
+        Сессия создается лениво, поэтому запросы, обслуживаемые из кэша, не берут
+        соединение из пула. Чтение идет с основной базы, если реплик нет, если они
+        отстают больше REPLICA_MAX_LAG, если клиент писал в последние
+        sticky_seconds или если в этом запросе уже есть незафиксированные записи.
+        Закрываются сессии в close_request_db.
+    """
+    if read_only and replica_router.engines:
+        primary = g.get('db_session')
+        if primary is None or not primary.info.get('has_writes'):
+            replica = replica_router.pick(flask_session.get(PRIMARY_UNTIL_KEY, 0.0))
+            if replica is not None:
+                if 'db_replica_session' not in g:
+                    g.db_replica_session = ReplicaSessionLocal(bind=get_replica_engines()[replica])
+                return g.db_replica_session
+    if 'db_session' not in g:
+        g.db_session = SessionLocal()
+    return g.db_session
+
+
+def close_request_db(exc=None):
+    """
+    Закрывает сессии текущего запроса и возвращает соединения в пул.
+
+    Args:
+        exc: Исключение, которым завершился запрос, если оно было.
+
+    Notes:
+        Незафиксированная транзакция откатывается, поэтому состояние одного
+        запроса не может попасть в другой.
+    """
+    for key in ('db_session', 'db_replica_session'):
+        db_session = g.pop(key, None)
+        if db_session is None:
+            continue
+        try:
+            if exc is not None:
+                db_session.rollback()
+        finally:
+            db_session.close()
+
+
+def init_app(app: Flask):
+    """
+    Подключает управление сессиями базы данных к приложению.
+
+    Args:
+        app (Flask): Экземпляр приложения.
+    """
+    app.teardown_appcontext(close_request_db)
+
+
+def pool_stats() -> Dict[str, float]:
+    """
+    Возвращает метрики пула соединений.
+
+    Returns:
+        Dict[str, float]: Размер пула, количество выданных соединений, переполнение
+        и статистика ожидания соединений.
+
+    Notes:
+        Создает механизм, если его еще нет; для периодического сбора метрик
+        сначала проверьте engine_created().
+    """
+    pool = get_engine().pool
+    return {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'overflow': max(pool.overflow(), 0),
+        'checked_in': pool.checkedin(),
+        'wait_count': pool.wait_count,
+        'wait_seconds': pool.wait_seconds,
+        'max_wait_seconds': pool.max_wait_seconds,
+        'timeouts': pool.timeouts
+    }
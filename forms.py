@@ -1,6 +1,24 @@
 from flask_wtf import FlaskForm
 from wtforms import PasswordField, StringField, SubmitField, TextAreaField
-from wtforms.validators import DataRequired, Email
+from wtforms.validators import DataRequired, Email, ValidationError
+
+from common.hashing import MAX_PASSWORD_BYTES, password_too_long
+
+
+def password_length(form, field):
+    """
+    Отклоняет пароли, которые bcrypt учел бы не полностью.
+
+    Args:
+        form: Форма.
+        field: Поле пароля.
+
+    Raises:
+        ValidationError: Если пароль длиннее MAX_PASSWORD_BYTES байт в UTF-8.
+    """
+    if field.data and password_too_long(field.data):
+        raise ValidationError('Пароль не должен быть длиннее {0} байт.'.format(MAX_PASSWORD_BYTES))
+
 
 class LoginForm(FlaskForm):
     """
@@ -25,7 +43,7 @@ class RegistrationForm(FlaskForm):
         submit (SubmitField): Кнопка для отправки формы.
     """
     username = StringField('Логин', validators=[DataRequired()])
-    password = PasswordField('Пароль', validators=[DataRequired()])
+    password = PasswordField('Пароль', validators=[DataRequired(), password_length])
     submit = SubmitField('Зарегистрироваться')
 
 class FeedbackForm(FlaskForm):
@@ -0,0 +1,110 @@
+"""
+Конфигурация gunicorn для production.
+
+Запуск:
+    gunicorn -c gunicorn.conf.py app:app
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+
+Приложение загружается в мастер-процессе один раз (preload_app), а рабочие
+процессы получают его через fork. После fork каждый процесс сбрасывает
+унаследованный пул соединений и прогревается до приема запросов.
+
+Количество процессов задается WEB_CONCURRENCY, по умолчанию 2 * CPU + 1, но не
+больше, чем позволяет DB_MAX_CONNECTIONS при пуле DB_POOL_SIZE + DB_MAX_OVERFLOW
+на процесс. Каждый процесс держит и свой пул хэширования паролей из
+PASSWORD_HASH_WORKERS процессов (по умолчанию 1), так что всего на сервере
+workers * (1 + PASSWORD_HASH_WORKERS) процессов.
+
+Письма отправляет отдельный процесс mail_worker.py; с MAIL_SENDERS_ENABLED=true
+отправители запускаются в каждом рабочем процессе после инициализации.
+
+Перезагрузка без простоя:
+    kill -HUP <master>     перезапуск процессов с той же версией кода
+    kill -USR2 <master>    запуск нового мастера с новым кодом, затем
+    kill -WINCH <old>      плавная остановка процессов старого мастера и
+    kill -QUIT <old>       завершение старого мастера
+"""
+import glob
+import multiprocessing
+import os
+
+from config import Config, UserConfig
+
+bind = os.environ.get('APP_BIND', '0.0.0.0:5000')
+preload_app = True
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+
+def auto_workers() -> int:
+    """
+    Вычисляет количество рабочих процессов.
+
+    Returns:
+        int: WEB_CONCURRENCY, если задана, иначе 2 * CPU + 1 с учетом лимита
+        соединений базы данных DB_MAX_CONNECTIONS.
+    """
+    if os.environ.get('WEB_CONCURRENCY'):
+        return int(os.environ['WEB_CONCURRENCY'])
+    workers = multiprocessing.cpu_count() * 2 + 1
+    max_connections = int(os.environ.get('DB_MAX_CONNECTIONS', 0))
+    if max_connections:
+        per_worker = Config.DB_POOL_SIZE + Config.DB_MAX_OVERFLOW
+        workers = min(workers, max(1, max_connections // per_worker))
+    return workers
+
+
+workers = auto_workers()
+
+
+def prepare_metrics_dir():
+    """
+    Создает и очищает каталог метрик Prometheus до загрузки приложения.
+
+    Notes:
+        Конфигурация читается до preload_app и повторно при HUP. Очистка
+        выполняется один раз на запуск: мастер, запущенный через USR2, наследует
+        метку и не удаляет файлы процессов старого мастера.
+    """
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if not directory or os.environ.get('PROMETHEUS_MULTIPROC_DIR_PREPARED'):
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.db')):
+        os.remove(path)
+    os.environ['PROMETHEUS_MULTIPROC_DIR_PREPARED'] = '1'
+
+
+prepare_metrics_dir()
+
+
+def post_fork(server, worker):
+    # Соединения, открытые мастером, принадлежат ему: процесс создает свои
+    from db.session import dispose_engines
+    # Асинхронные механизмы не сбрасываются: мастер не выполняет асинхронных запросов,
+    # а пересоздание их пула заменяет асинхронную блокировку первого подключения
+    # обычной, и одновременные первые подключения останавливают цикл событий
+    dispose_engines(close=False)
+
+
+def post_worker_init(worker):
+    # Вызывается до основного цикла, поэтому процесс принимает запросы уже прогретым
+    from app import app
+    from common.warmup import warm_up
+    warm_up(app)
+    # Обычно письма отправляет mail_worker.py; потоки в мастере не запускаются,
+    # так как fork с работающими потоками может унаследовать захваченные ими блокировки
+    if UserConfig.MAIL_SENDERS_ENABLED:
+        from common.mailer import mail_outbox
+        mail_outbox.ensure_started()
+
+
+def child_exit(server, worker):
+    from common.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
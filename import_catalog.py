@@ -0,0 +1,50 @@
+"""
+Потоковая загрузка каталога сыров из CSV или JSONL.
+
+Запуск:
+    python import_catalog.py cheeses.csv
+    python import_catalog.py cheeses.jsonl --batch-size 5000
+    python import_catalog.py cheeses.csv --ingest-images
+    cat cheeses.jsonl | python import_catalog.py - --format jsonl
+
+CSV должен содержать заголовок с колонками name, description и image_path.
+"""
+import argparse
+import json
+import sys
+
+from loguru import logger
+
+from common.images import image_pipeline
+from db.bulk import import_cheeses, iter_catalog_file, progress_logger
+from db.session import get_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help="Путь к файлу каталога или '-' для чтения из stdin")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help='Формат файла; по умолчанию определяется по расширению')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--ingest-images', action='store_true', help='Загрузить изображения и создать их уменьшенные варианты')
+    args = parser.parse_args()
+
+    file_format = args.format or ('csv' if args.path.endswith('.csv') else 'jsonl')
+    stream = sys.stdin if args.path == '-' else open(args.path, newline='', encoding='utf-8')
+    try:
+        stats = import_cheeses(
+            next(get_db()),
+            iter_catalog_file(stream, file_format),
+            batch_size=args.batch_size,
+            on_progress=progress_logger(),
+            ingest_images=args.ingest_images
+        )
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    if args.ingest_images:
+        image_pipeline.wait()
+    logger.info("Загрузка завершена: {0}".format(json.dumps(stats)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
-from db.crud import create_cheese
+from common.images import image_pipeline
+from db.bulk import import_cheeses
 from db.session import get_db
 
 cheeses = [
@@ -57,5 +58,5 @@ cheeses = [
 
 db = next(get_db())
 
-for cheese in cheeses:
-    create_cheese(db, **cheese)
+import_cheeses(db, cheeses, ingest_images=True)
+image_pipeline.wait()
@@ -0,0 +1,41 @@
+"""
+Отдельный процесс отправки писем из очереди email_outbox.
+
+Запуск:
+    python mail_worker.py
+    MAIL_WORKERS=4 python mail_worker.py
+
+Процессы сервера только ставят письма в очередь, отправляют их MAIL_WORKERS
+потоков этого процесса. Достаточно одного процесса на установку; несколько
+процессов (например, на разных серверах) не мешают друг другу, так как письма
+забираются с SKIP LOCKED. Без этого процесса письма остаются в статусе pending,
+если только отправители не запущены в рабочих процессах gunicorn
+(MAIL_SENDERS_ENABLED=true).
+
+Процесс завершается по SIGTERM или SIGINT сразу: письма незавершенной пачки
+остаются в статусе sending и забираются снова через MAIL_CLAIM_TIMEOUT.
+"""
+import signal
+import sys
+import threading
+
+from loguru import logger
+
+from common.mailer import mail_outbox
+
+
+def main():
+    if mail_outbox.workers < 1:
+        logger.error("MAIL_WORKERS должно быть не меньше 1")
+        sys.exit(1)
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    mail_outbox.ensure_started()
+    logger.info("Запущено отправителей писем: {0}".format(mail_outbox.workers))
+    stop.wait()
+    logger.info("Отправка писем остановлена")
+
+
+if __name__ == '__main__':
+    main()
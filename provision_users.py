@@ -0,0 +1,53 @@
+"""
+Пакетное создание пользователей из CSV или JSONL.
+
+Запуск:
+    python provision_users.py partner_users.csv
+    python provision_users.py partner_users.jsonl --batch-size 2000
+    cat partner_users.jsonl | python provision_users.py - --format jsonl
+    PASSWORD_HASH_WORKERS=16 python provision_users.py partner_users.csv
+
+CSV должен содержать заголовок с колонками username и password, JSONL - объекты
+с теми же ключами. Пароли хэшируются параллельно в PASSWORD_HASH_WORKERS
+процессах (по умолчанию по числу ядер) и не должны быть длиннее 72 байт.
+Уже существующие имена пропускаются, поэтому загрузку можно безопасно
+повторить после сбоя.
+"""
+import argparse
+import json
+import os
+import sys
+
+# Процессу загрузки достаются все ядра, а не доля процесса сервера
+os.environ.setdefault('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1))
+
+from loguru import logger  # noqa: E402
+
+from db.bulk import import_users, iter_user_file, progress_logger  # noqa: E402
+from db.session import get_db  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help="Путь к файлу пользователей или '-' для чтения из stdin")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help='Формат файла; по умолчанию определяется по расширению')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    file_format = args.format or ('csv' if args.path.endswith('.csv') else 'jsonl')
+    stream = sys.stdin if args.path == '-' else open(args.path, newline='', encoding='utf-8')
+    try:
+        stats = import_users(
+            next(get_db()),
+            iter_user_file(stream, file_format),
+            batch_size=args.batch_size,
+            on_progress=progress_logger()
+        )
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    logger.info("Загрузка завершена: {0}".format(json.dumps(stats)))
+
+
+if __name__ == '__main__':
+    main()
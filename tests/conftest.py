@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+
+# Окружение задается до импорта модулей приложения: часть настроек Config читается при импорте
+TEST_DIR = tempfile.mkdtemp(prefix='cheese_tests_')
+
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///{0}'.format(os.path.join(TEST_DIR, 'primary.sqlite3')),
+    'SCHEMA_NAME': '',
+    'SECRET_KEY': 'test-secret',
+    'TEMPLATE_FOLDER': 'templates',
+    'SENDER': 'shop@example.com',
+    'PASSWORD_SENDER': '',
+    'DOMAIN': 'example.com',
+    'PORT': '25',
+    'SMTP_HOST': '127.0.0.1',
+    'SMTP_USE_TLS': 'false',
+    'SMTP_TIMEOUT': '5',
+    'MAIL_WORKERS': '0',
+    'PASSWORD_HASH_WORKERS': '0',
+    'PASSWORD_BCRYPT_ROUNDS': '4',
+    'AUTH_RATE_LIMIT_PER_USER': '0',
+    'AUTH_RATE_LIMIT_PER_IP': '0',
+    'AUTH_RATE_LIMIT_FILE': os.path.join(TEST_DIR, 'auth_limits.sqlite3'),
+    'CATALOG_VERSION_FILE': os.path.join(TEST_DIR, 'catalog_version'),
+    'MEDIA_ROOT': os.path.join(TEST_DIR, 'media'),
+    'ASSETS_ROOT': os.path.join(TEST_DIR, 'assets'),
+})
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+
+import pytest  # noqa: E402
+
+from db.models import Base  # noqa: E402
+from db.session import SessionLocal, dispose_engines, get_engine  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    """
+    Создает схему во временной базе SQLite на время тестов.
+    """
+    Base.metadata.create_all(get_engine())
+    yield get_engine()
+    dispose_engines()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog_cache():
+    """
+    Сбрасывает снимки каталога: тесты меняют таблицу cheese без publish_change.
+    """
+    from common.cache import catalog_cache
+
+    catalog_cache.invalidate()
+
+
+@pytest.fixture
+def db_session():
+    """
+    Сессия основной базы данных, закрываемая после теста.
+    """
+    db_session = SessionLocal()
+    try:
+        yield db_session
+    finally:
+        db_session.close()
+
+
+@pytest.fixture(scope='session')
+def app():
+    """
+    Приложение без CSRF-проверки форм.
+    """
+    from app import create_app
+
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
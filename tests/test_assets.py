@@ -0,0 +1,188 @@
+import gzip
+import json
+import os
+import sys
+
+import pytest
+from werkzeug.http import parse_accept_header
+
+from common.assets import (BUNDLES, MANIFEST_NAME, PREVIOUS_MANIFEST_NAME, AssetManifest, brotli,
+                           build_assets, minify_css, select_encoding)
+from config import Config
+
+STYLES = {
+    'header.css': 'header {\n    font-family: \'Roboto\', sans-serif;\n}\n',
+    'index.css': '/* витрина */\n.card > img {\n    background: url( "a  b.png" ) no-repeat;\n}\n',
+    'footer.css': 'footer:after {\n    content: "  /* не комментарий */  ";\n}\n',
+    'login.css': '.login { margin : 0 ; }',
+    'profile.css': '.profile { padding: 0; }',
+    'register.css': '.register { padding: 0; }',
+}
+
+
+def accept(header: str):
+    return parse_accept_header(header)
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    path = tmp_path / 'styles'
+    path.mkdir()
+    for name, css in STYLES.items():
+        (path / name).write_text(css, encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    return tmp_path / 'dist'
+
+
+def read_manifest(output_dir, name=MANIFEST_NAME) -> dict:
+    return json.loads((output_dir / name).read_text(encoding='utf-8'))
+
+
+def test_minify_removes_comments_and_whitespace():
+    assert minify_css('a , b > c {\n  color : red ;\n  margin: 0;\n} /* x */') == 'a,b>c{color :red;margin:0}'
+
+
+def test_minify_keeps_strings_and_urls():
+    css = 'a { content: "x  /* y */  z"; quotes: \'«  »\'; background: url( a  b.png ) ; }'
+
+    assert minify_css(css) == 'a{content:"x  /* y */  z";quotes:\'«  »\';background:url( a  b.png )}'
+
+
+def test_build_writes_hashed_bundles_and_compressed_copies(source_dir, output_dir):
+    manifest = build_assets(str(source_dir), str(output_dir))
+
+    assert sorted(manifest) == sorted(BUNDLES)
+    assert read_manifest(output_dir) == manifest
+    data = (output_dir / manifest['index.css']).read_bytes()
+    assert data.decode('utf-8') == '\n'.join([
+        "header{font-family:'Roboto',sans-serif}",
+        '.card>img{background:url( "a  b.png" ) no-repeat}',
+        'footer:after{content:"  /* не комментарий */  "}',
+    ])
+    assert gzip.decompress((output_dir / (manifest['index.css'] + '.gz')).read_bytes()) == data
+    if brotli is not None:
+        assert brotli.decompress((output_dir / (manifest['index.css'] + '.br')).read_bytes()) == data
+
+
+def test_bundle_name_depends_only_on_content(source_dir, output_dir):
+    first = build_assets(str(source_dir), str(output_dir))
+    assert build_assets(str(source_dir), str(output_dir)) == first
+    assert not (output_dir / PREVIOUS_MANIFEST_NAME).exists()
+
+    (source_dir / 'login.css').write_text('.login { margin: 1px; }', encoding='utf-8')
+    second = build_assets(str(source_dir), str(output_dir))
+
+    assert second['login.css'] != first['login.css']
+    assert second['profile.css'] == first['profile.css']
+    # Файлы и манифест прошлой сборки остаются для страниц, отданных до выкладки
+    assert (output_dir / first['login.css']).is_file()
+    assert read_manifest(output_dir, PREVIOUS_MANIFEST_NAME) == first
+
+
+def test_is_built_accepts_only_manifest_bundles(source_dir, output_dir):
+    first = build_assets(str(source_dir), str(output_dir))
+    (source_dir / 'login.css').write_text('.login { margin: 1px; }', encoding='utf-8')
+    second = build_assets(str(source_dir), str(output_dir))
+    (output_dir / 'stray.css').write_text('a{}', encoding='utf-8')
+    manifest = AssetManifest(str(output_dir))
+
+    assert manifest.is_built(second['login.css'])
+    assert manifest.is_built(first['login.css'])
+    assert not manifest.is_built(second['login.css'] + '.gz')
+    assert not manifest.is_built(second['login.css'] + '.br')
+    assert not manifest.is_built(MANIFEST_NAME)
+    assert not manifest.is_built(PREVIOUS_MANIFEST_NAME)
+    assert not manifest.is_built('stray.css')
+
+
+def test_is_built_sees_bundles_built_after_process_start(source_dir, output_dir):
+    build_assets(str(source_dir), str(output_dir))
+    manifest = AssetManifest(str(output_dir))
+    manifest.url('login.css')
+
+    (source_dir / 'login.css').write_text('.login { margin: 1px; }', encoding='utf-8')
+    rebuilt = build_assets(str(source_dir), str(output_dir))
+
+    assert manifest.is_built(rebuilt['login.css'])
+
+
+def test_manifest_builds_on_first_use(source_dir, output_dir, monkeypatch):
+    monkeypatch.setattr(Config, 'ASSETS_SOURCE_DIR', str(source_dir))
+    manifest = AssetManifest(str(output_dir))
+
+    url = manifest.url('index.css')
+
+    assert url == '/assets/' + read_manifest(output_dir)['index.css']
+    with pytest.raises(KeyError):
+        manifest.url('missing.css')
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('br, gzip', 'br'),
+    ('gzip', 'gzip'),
+    ('gzip, br;q=0', 'gzip'),
+    ('identity', None),
+    ('', None),
+])
+def test_select_encoding_prefers_brotli(tmp_path, header, expected):
+    for name in ('index.css', 'index.css.gz', 'index.css.br'):
+        (tmp_path / name).write_bytes(b'')
+
+    filename, encoding = select_encoding('index.css', str(tmp_path), accept(header))
+
+    assert encoding == expected
+    assert filename == {'br': 'index.css.br', 'gzip': 'index.css.gz', None: 'index.css'}[expected]
+
+
+def test_select_encoding_skips_missing_copies(tmp_path):
+    (tmp_path / 'index.css').write_bytes(b'')
+    (tmp_path / 'index.css.gz').write_bytes(b'')
+
+    assert select_encoding('index.css', str(tmp_path), accept('br, gzip')) == ('index.css.gz', 'gzip')
+
+
+@pytest.fixture
+def built(source_dir, output_dir, monkeypatch) -> dict:
+    manifest = build_assets(str(source_dir), str(output_dir))
+    monkeypatch.setattr(Config, 'ASSETS_ROOT', str(output_dir))
+    monkeypatch.setattr(sys.modules['app'], 'asset_manifest', AssetManifest(str(output_dir)))
+    return manifest
+
+
+def test_assets_route_serves_compressed_bundle(client, built, output_dir):
+    filename = built['index.css']
+
+    response = client.get('/assets/' + filename, headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/css'
+    assert response.content_encoding == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert response.cache_control.immutable
+    assert gzip.decompress(response.data) == (output_dir / filename).read_bytes()
+
+
+def test_assets_route_serves_plain_bundle(client, built, output_dir):
+    filename = built['index.css']
+
+    response = client.get('/assets/' + filename, headers={'Accept-Encoding': 'identity'})
+
+    assert response.content_encoding is None
+    assert response.data == (output_dir / filename).read_bytes()
+
+
+@pytest.mark.parametrize('suffix', ['.gz', '.br'])
+def test_assets_route_hides_compressed_copies(client, built, suffix):
+    assert client.get('/assets/' + built['index.css'] + suffix).status_code == 404
+
+
+def test_assets_route_hides_manifest_and_unknown_files(client, built, output_dir):
+    (output_dir / 'stray.css').write_text('a{}', encoding='utf-8')
+
+    assert client.get('/assets/' + MANIFEST_NAME).status_code == 404
+    assert client.get('/assets/stray.css').status_code == 404
+    assert client.get('/assets/' + os.path.join('..', 'styles', 'index.css')).status_code == 404
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+import sqlalchemy as sa
+
+from db.async_session import async_read_session, dispose_async_engines, gather_bounded, get_async_engine
+from db.crud import upsert_cheeses
+from db.models import Cheese
+from db.search import search_cheese_async
+
+
+class InFlight:
+    def __init__(self):
+        self.now = 0
+        self.peak = 0
+
+    async def task(self, value: int, delay: float = 0.01) -> int:
+        self.now += 1
+        self.peak = max(self.peak, self.now)
+        try:
+            await asyncio.sleep(delay)
+            return value
+        finally:
+            self.now -= 1
+
+
+@pytest.mark.parametrize('limit', [1, 3, 10])
+def test_in_flight_never_exceeds_limit(limit):
+    counter = InFlight()
+
+    results = asyncio.run(gather_bounded((counter.task(number) for number in range(25)), limit))
+
+    assert results == list(range(25))
+    assert counter.peak == min(limit, 25)
+
+
+def test_results_keep_order_when_tasks_finish_out_of_order():
+    counter = InFlight()
+    delays = [0.05, 0.01, 0.03, 0.0]
+
+    results = asyncio.run(gather_bounded(
+        (counter.task(number, delay) for number, delay in enumerate(delays)), 2
+    ))
+
+    assert results == [0, 1, 2, 3]
+    assert counter.peak == 2
+
+
+def test_error_propagates():
+    async def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError, match='boom'):
+        asyncio.run(gather_bounded([fail()], 1))
+
+
+def test_limit_must_be_positive():
+    with pytest.raises(ValueError):
+        asyncio.run(gather_bounded([], 0))
+
+
+def test_fan_out_queries_hold_at_most_limit_connections(db_session):
+    db_session.execute(sa.delete(Cheese))
+    upsert_cheeses(db_session, [
+        {'name': 'Cheese {0:02d}'.format(number), 'description': None, 'image_path': None}
+        for number in range(12)
+    ])
+    db_session.commit()
+    peak = [0]
+
+    async def query(number: int) -> list:
+        async with async_read_session() as db:
+            found = await search_cheese_async(db, 'Cheese {0:02d}'.format(number), 5)
+            peak[0] = max(peak[0], get_async_engine().pool.checkedout())
+            return [cheese.name for cheese in found]
+
+    async def main():
+        try:
+            return await gather_bounded((query(number) for number in range(12)), 3)
+        finally:
+            await dispose_async_engines()
+
+    results = asyncio.run(main())
+
+    assert results == [['Cheese {0:02d}'.format(number)] for number in range(12)]
+    assert 1 <= peak[0] <= 3
@@ -0,0 +1,143 @@
+import io
+import json
+import sys
+
+import pytest
+import sqlalchemy as sa
+
+import import_catalog
+from common.cache import catalog_cache
+from db.bulk import import_cheeses, iter_catalog_file
+from db.models import Cheese
+
+CSV = (
+    'name,description,image_path\n'
+    'Бри,Мягкий,\n'
+    'Гауда,,/images/gouda.png\n'
+    '"Сыр, копченый","С запятой, в описании",\n'
+)
+
+
+def catalog_rows(count: int, image_path=None) -> list:
+    return [
+        {'name': 'Сыр {0:03d}'.format(number), 'description': 'Описание {0}'.format(number), 'image_path': image_path}
+        for number in range(count)
+    ]
+
+
+def stored(db_session) -> dict:
+    return {
+        cheese.name: cheese
+        for cheese in db_session.execute(sa.select(Cheese)).scalars()
+    }
+
+
+@pytest.fixture
+def empty_catalog(db_session):
+    db_session.execute(sa.delete(Cheese))
+    db_session.commit()
+    return db_session
+
+
+def test_reads_csv_with_empty_values_as_none():
+    assert list(iter_catalog_file(io.StringIO(CSV), 'csv')) == [
+        {'name': 'Бри', 'description': 'Мягкий', 'image_path': None},
+        {'name': 'Гауда', 'description': None, 'image_path': '/images/gouda.png'},
+        {'name': 'Сыр, копченый', 'description': 'С запятой, в описании', 'image_path': None},
+    ]
+
+
+def test_reads_jsonl_skipping_blank_lines():
+    stream = io.StringIO('{"name": "Бри", "extra": 1}\n\n{"name": "Гауда", "description": "Твердый"}\n')
+
+    assert list(iter_catalog_file(stream, 'jsonl')) == [
+        {'name': 'Бри', 'description': None, 'image_path': None},
+        {'name': 'Гауда', 'description': 'Твердый', 'image_path': None},
+    ]
+
+
+def test_rejects_unknown_format_and_missing_name():
+    with pytest.raises(ValueError, match='формат'):
+        list(iter_catalog_file(io.StringIO(''), 'xml'))
+    with pytest.raises(ValueError, match='Запись 2'):
+        list(iter_catalog_file(io.StringIO('{"name": "Бри"}\n{"description": "Без названия"}\n'), 'jsonl'))
+
+
+def test_import_commits_in_batches_and_reports_progress(empty_catalog):
+    progress = []
+
+    stats = import_cheeses(empty_catalog, catalog_rows(25), batch_size=10,
+                           on_progress=lambda processed, elapsed: progress.append(processed))
+
+    assert stats['rows'] == 25
+    assert stats['batches'] == 3
+    assert progress == [10, 20, 25]
+    assert len(stored(empty_catalog)) == 25
+
+
+def test_reimport_is_idempotent_and_updates_images(empty_catalog):
+    import_cheeses(empty_catalog, catalog_rows(12), batch_size=5)
+    ids = {name: cheese.id for name, cheese in stored(empty_catalog).items()}
+
+    import_cheeses(empty_catalog, catalog_rows(12, image_path='/images/new.png'), batch_size=5)
+
+    cheeses = stored(empty_catalog)
+    assert {name: cheese.id for name, cheese in cheeses.items()} == ids
+    assert {cheese.image_path for cheese in cheeses.values()} == {'/images/new.png'}
+
+
+def test_duplicates_within_batch_keep_last_record(empty_catalog):
+    rows = [
+        {'name': 'Бри', 'description': None, 'image_path': '/images/old.png'},
+        {'name': 'Бри', 'description': None, 'image_path': '/images/new.png'},
+    ]
+
+    import_cheeses(empty_catalog, rows)
+
+    assert stored(empty_catalog)['Бри'].image_path == '/images/new.png'
+
+
+def test_failed_batch_keeps_committed_batches(empty_catalog):
+    def rows():
+        yield from catalog_rows(4)
+        raise ValueError('Запись 5: не указано название сыра')
+
+    with pytest.raises(ValueError):
+        import_cheeses(empty_catalog, rows(), batch_size=2)
+
+    assert len(stored(empty_catalog)) == 4
+
+
+def test_import_invalidates_catalog_cache_once(empty_catalog):
+    version = catalog_cache.stats()['version']
+
+    import_cheeses(empty_catalog, catalog_rows(6), batch_size=2)
+
+    assert catalog_cache.stats()['version'] == version + 1
+
+
+def test_empty_import_keeps_catalog_cache(empty_catalog):
+    version = catalog_cache.stats()['version']
+
+    assert import_cheeses(empty_catalog, [])['rows'] == 0
+    assert catalog_cache.stats()['version'] == version
+
+
+def test_import_catalog_script(empty_catalog, tmp_path, monkeypatch):
+    path = tmp_path / 'cheeses.csv'
+    path.write_text(CSV, encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ['import_catalog.py', str(path), '--batch-size', '2'])
+
+    import_catalog.main()
+    import_catalog.main()
+
+    assert sorted(stored(empty_catalog)) == ['Бри', 'Гауда', 'Сыр, копченый']
+
+
+def test_import_catalog_script_reads_stdin(empty_catalog, monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['import_catalog.py', '-', '--format', 'jsonl'])
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(json.dumps({'name': 'Бри'}) + '\n'))
+
+    import_catalog.main()
+
+    assert list(stored(empty_catalog)) == ['Бри']
@@ -0,0 +1,210 @@
+import multiprocessing
+import os
+import threading
+from time import sleep as _sleep
+
+import pytest
+
+from common.cache import CatalogCache, FileNotifier
+
+
+class IdleNotifier:
+    """
+    Рассылка без других процессов: слушатель ждет вечно, публикации запоминаются.
+    """
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, db_session):
+        self.published.append(db_session)
+
+    def listen(self, callback):
+        threading.Event().wait()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        # Слушатели FileNotifier из других тестов продолжают опрос через тот же модуль
+        _sleep(seconds)
+
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return ('snapshot', self.calls)
+
+
+@pytest.fixture
+def notifier():
+    return IdleNotifier()
+
+
+@pytest.fixture
+def cache(notifier):
+    return CatalogCache(lambda: notifier, max_entries=3, max_staleness=30)
+
+
+@pytest.fixture
+def version_path(tmp_path):
+    return str(tmp_path / 'catalog.version')
+
+
+def _publish_many(path: str, count: int):
+    notifier = FileNotifier(path)
+    for _ in range(count):
+        notifier.publish(None)
+
+
+def test_publish_increments_version(version_path):
+    notifier = FileNotifier(version_path)
+
+    assert notifier._read() == (0, 0)
+    for expected in range(1, 4):
+        notifier.publish(None)
+        assert notifier._read() == (expected, os.getpid())
+
+
+def test_concurrent_threads_lose_no_increment(version_path):
+    threads = [threading.Thread(target=_publish_many, args=(version_path, 25)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert FileNotifier(version_path)._read()[0] == 200
+
+
+def test_concurrent_processes_lose_no_increment(version_path):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_publish_many, args=(version_path, 25)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0] * 4
+    assert FileNotifier(version_path)._read()[0] == 100
+    # Временные файлы не остаются рядом с файлом версии
+    assert sorted(os.listdir(os.path.dirname(version_path))) == ['catalog.version', 'catalog.version.lock']
+
+
+def test_listener_reports_changes_from_other_processes(version_path):
+    notifier = FileNotifier(version_path, poll_interval=0.01)
+    changed = threading.Event()
+    threading.Thread(target=notifier.listen, args=(changed.set,), daemon=True).start()
+
+    # Слушатель запоминает версию при запуске, поэтому файл меняется, пока он не сообщит
+    for counter in range(1, 500):
+        with open(version_path, 'w') as version_file:
+            version_file.write('{0}:{1}'.format(counter, os.getpid() + 1))
+        if changed.wait(0.01):
+            break
+
+    assert changed.is_set()
+
+
+def test_listener_ignores_own_publications(version_path):
+    notifier = FileNotifier(version_path, poll_interval=0.01)
+    changed = threading.Event()
+    threading.Thread(target=notifier.listen, args=(changed.set,), daemon=True).start()
+
+    for _ in range(20):
+        notifier.publish(None)
+
+    assert not changed.wait(0.1)
+
+
+def test_get_caches_snapshot(cache):
+    loader = Loader()
+
+    first = cache.get('page', loader)
+
+    assert cache.get('page', loader) is first
+    assert loader.calls == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_invalidate_bumps_version_and_drops_snapshots(cache):
+    loader = Loader()
+    cache.get('page', loader)
+
+    cache.invalidate()
+
+    assert cache.stats()['version'] == 1
+    assert cache.stats()['entries'] == 0
+    assert cache.get('page', loader) == ('snapshot', 2)
+
+
+def test_snapshot_loaded_across_version_change_is_not_stored(cache):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) == 1:
+            # Каталог изменился, пока снимок читался из базы
+            cache.invalidate()
+        return len(calls)
+
+    assert cache.get('page', loader) == 1
+    assert cache.stats()['entries'] == 0
+    assert cache.get('page', loader) == 2
+    assert cache.get('page', loader) == 2
+
+
+def test_snapshot_expires_after_max_staleness(monkeypatch, cache):
+    clock = FakeClock()
+    monkeypatch.setattr('common.cache.time', clock)
+    loader = Loader()
+    cache.get('page', loader)
+
+    clock.now += cache.max_staleness
+    assert cache.get('page', loader) == ('snapshot', 1)
+
+    clock.now += 0.001
+    assert cache.get('page', loader) == ('snapshot', 2)
+
+
+def test_least_recently_used_snapshot_is_evicted(cache):
+    loaders = {key: Loader() for key in 'abcd'}
+    for key in 'abc':
+        cache.get(key, loaders[key])
+    cache.get('a', loaders['a'])
+
+    cache.get('d', loaders['d'])
+
+    assert cache.stats()['entries'] == 3
+    cache.get('a', loaders['a'])
+    cache.get('b', loaders['b'])
+    assert loaders['a'].calls == 1
+    assert loaders['b'].calls == 2
+
+
+def test_publish_change_invalidates_and_notifies(cache, notifier):
+    cache.get('page', Loader())
+
+    cache.publish_change('session')
+
+    assert notifier.published == ['session']
+    assert cache.stats()['entries'] == 0
+
+
+def test_failed_notification_still_invalidates_locally(cache, notifier, monkeypatch):
+    def fail(db_session):
+        raise OSError('read-only file system')
+
+    monkeypatch.setattr(notifier, 'publish', fail)
+
+    cache.publish_change(None)
+
+    assert cache.stats()['version'] == 1
@@ -0,0 +1,106 @@
+import hashlib
+import importlib.util
+import os
+import pathlib
+
+import pytest
+import sqlalchemy as sa
+
+from db.crud import upsert_cheeses
+from db.models import Cheese, cheese_content_hash
+
+MIGRATION = pathlib.Path(__file__).resolve().parent.parent / 'alembic' / 'versions' / '6a2f8c1e9b47_add_cheese_content_hash.py'
+
+CASES = [
+    ('Бри', 'Мягкий сыр с белой плесенью'),
+    ('Бри', None),
+    ('Бри', ''),
+    ('Gouda', 'Hard'),
+    ('Goud', 'aHard'),
+    ('1:a', 'b'),
+    ('1', ':ab'),
+    ('Сыр «Российский» 🧀', 'Описание\nв две строки'),
+    ('', ''),
+]
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location('content_hash_migration', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def hash_query(expression: str) -> sa.TextClause:
+    return sa.text(
+        'SELECT {0} FROM (SELECT CAST(:name AS text) AS name, CAST(:description AS text) AS description) AS cheese'
+        .format(expression)
+    )
+
+
+def postgres_functions(dbapi_connection, connection_record):
+    # Функции PostgreSQL из выражения миграции с той же семантикой
+    dbapi_connection.create_function('char_length', 1, len, deterministic=True)
+    dbapi_connection.create_function('convert_to', 2, lambda text, encoding: text.encode('utf-8'), deterministic=True)
+    dbapi_connection.create_function('sha256', 1, lambda data: hashlib.sha256(data).digest(), deterministic=True)
+    dbapi_connection.create_function('encode', 2, lambda data, encoding: data.hex(), deterministic=True)
+    dbapi_connection.create_function('pg_left', 2, lambda text, length: text[:length], deterministic=True)
+
+
+@pytest.fixture(scope='module')
+def expression() -> str:
+    return load_migration().content_hash()
+
+
+@pytest.fixture(scope='module')
+def sqlite_engine():
+    engine = sa.create_engine('sqlite://')
+    sa.event.listen(engine, 'connect', postgres_functions)
+    yield engine
+    engine.dispose()
+
+
+def test_hash_separates_name_and_description():
+    hashes = {cheese_content_hash(name, description) for name, description in CASES}
+
+    # Пустое и отсутствующее описание - один ключ, остальные пары различаются
+    assert len(hashes) == len(CASES) - 1
+    assert all(len(value) == 32 for value in hashes)
+
+
+@pytest.mark.parametrize('name, description', CASES)
+def test_migration_expression_matches_python(sqlite_engine, expression, name, description):
+    # В SQLite нет приведения ::text (число || и так приводит к строке), а left - ключевое слово
+    query = hash_query(expression.replace('::text', '').replace('left(', 'pg_left('))
+
+    with sqlite_engine.connect() as connection:
+        value = connection.execute(query, {'name': name, 'description': description}).scalar()
+
+    assert value == cheese_content_hash(name, description)
+
+
+@pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'), reason='TEST_POSTGRES_URL не задан')
+def test_migration_expression_matches_python_on_postgres(expression):
+    engine = sa.create_engine(os.environ['TEST_POSTGRES_URL'])
+    try:
+        with engine.connect() as connection:
+            for name, description in CASES:
+                value = connection.execute(hash_query(expression), {'name': name, 'description': description}).scalar()
+                assert value == cheese_content_hash(name, description), (name, description)
+    finally:
+        engine.dispose()
+
+
+def test_upsert_stores_content_hash(db_session):
+    db_session.execute(sa.delete(Cheese))
+    upsert_cheeses(db_session, [
+        {'name': 'Бри', 'description': None, 'image_path': None},
+        {'name': 'Бри', 'description': '', 'image_path': 'brie.jpg'},
+    ])
+    db_session.commit()
+
+    cheeses = db_session.execute(sa.select(Cheese)).scalars().all()
+
+    assert len(cheeses) == 1
+    assert cheeses[0].content_hash == cheese_content_hash('Бри', None)
+    assert cheeses[0].image_path == 'brie.jpg'
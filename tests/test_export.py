@@ -0,0 +1,96 @@
+import gzip
+import json
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+from config import Config
+from db.bulk import import_cheeses
+from db.crud import create_user, iter_cheese_batches
+from db.models import Cheese, User, cheese_images
+
+COUNT = 23
+
+
+@pytest.fixture
+def catalog(db_session) -> list:
+    db_session.execute(sa.delete(Cheese))
+    db_session.commit()
+    rows = [
+        {'name': 'Сыр {0:02d}'.format(number), 'description': 'Описание {0}'.format(number) if number % 3 else None,
+         'image_path': None}
+        for number in range(COUNT)
+    ]
+    # Пачки по 5 строк: порядок выгрузки не зависит от разбиения загрузки
+    import_cheeses(db_session, rows, batch_size=5)
+    db_session.execute(sa.update(Cheese).where(Cheese.name == 'Сыр 07').values(image_key='abc'))
+    db_session.commit()
+    return [dict(row, images=cheese_images('abc') if row['name'] == 'Сыр 07' else None) for row in rows]
+
+
+@pytest.fixture
+def auth_header(client, db_session) -> dict:
+    username = 'export-{0}'.format(uuid.uuid4().hex[:8])
+    create_user(db_session, User(username=username, password='export-password'))
+    tokens = client.post('/api/token', json={'username': username, 'password': 'export-password'}).get_json()
+    return {'Authorization': 'Bearer ' + tokens['access_token']}
+
+
+def parse_ndjson(data: bytes) -> list:
+    lines = data.decode('utf-8').split('\n')
+    assert lines[-1] == ''
+    return [json.loads(line) for line in lines[:-1]]
+
+
+@pytest.mark.parametrize('batch_size', [1, 7, COUNT, 100])
+def test_batches_cover_catalog_in_id_order(catalog, db_session, batch_size):
+    batches = list(iter_cheese_batches(db_session, batch_size))
+
+    assert [cheese for batch in batches for cheese in batch] == catalog
+    assert all(len(batch) <= batch_size for batch in batches)
+    assert len(batches) == -(-COUNT // batch_size)
+
+
+def test_batches_of_empty_catalog(db_session):
+    db_session.execute(sa.delete(Cheese))
+    db_session.commit()
+
+    assert list(iter_cheese_batches(db_session, 10)) == []
+
+
+def test_export_streams_whole_catalog(client, catalog, auth_header, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPORT_BATCH_SIZE', 4)
+
+    response = client.get('/cheese/api/export', headers={**auth_header, 'Accept-Encoding': 'identity'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    assert response.content_encoding is None
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert parse_ndjson(response.data) == catalog
+
+
+def test_export_compresses_with_gzip(client, catalog, auth_header, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPORT_BATCH_SIZE', 4)
+
+    response = client.get('/cheese/api/export', headers={**auth_header, 'Accept-Encoding': 'gzip'})
+
+    assert response.content_encoding == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert parse_ndjson(gzip.decompress(response.data)) == catalog
+
+
+def test_export_chunks_follow_batches(client, catalog, auth_header, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPORT_BATCH_SIZE', 10)
+
+    response = client.get('/cheese/api/export', headers={**auth_header, 'Accept-Encoding': 'identity'})
+
+    chunks = list(response.response)
+    assert [chunk.count(b'\n') for chunk in chunks] == [10, 10, 3]
+    response.close()
+
+
+def test_export_requires_token(client, catalog):
+    assert client.get('/cheese/api/export').status_code == 401
@@ -0,0 +1,167 @@
+import pytest
+import sqlalchemy as sa
+from jinja2 import DictLoader, Environment
+from markupsafe import Markup
+
+from common.fragments import FragmentCache, FragmentCacheExtension, fragment_cache
+from db.bulk import import_cheeses
+from db.models import Cheese
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class Renderer:
+    def __init__(self, html: str = '<p>сыр</p>'):
+        self.html = html
+        self.calls = 0
+
+    def __call__(self) -> str:
+        self.calls += 1
+        return self.html
+
+
+@pytest.fixture
+def version():
+    return [0]
+
+
+@pytest.fixture
+def cache(version):
+    return FragmentCache(max_bytes=100, max_age=30, version=lambda: version[0])
+
+
+def test_fragment_hit_skips_render(cache):
+    render = Renderer()
+
+    first = cache.get('grid', render)
+
+    assert isinstance(first, Markup)
+    assert cache.get('grid', render) == first
+    assert render.calls == 1
+    assert cache.stats() == {'bytes': len('<p>сыр</p>'.encode('utf-8')), 'entries': 1, 'hits': 1, 'misses': 1}
+
+
+def test_catalog_version_change_clears_fragments(cache, version):
+    render = Renderer()
+    cache.get('grid', render)
+
+    version[0] += 1
+
+    cache.get('grid', render)
+    assert render.calls == 2
+    assert cache.stats()['entries'] == 1
+
+
+def test_fragment_rendered_across_version_change_is_not_stored(cache, version):
+    def render():
+        version[0] += 1
+        return '<p>старый каталог</p>'
+
+    cache.get('grid', render)
+
+    assert cache.stats()['entries'] == 0
+
+
+def test_fragment_expires_after_max_age(cache, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr('common.fragments.time', clock)
+    render = Renderer()
+    cache.get('grid', render)
+
+    clock.now += cache.max_age
+    cache.get('grid', render)
+    assert render.calls == 1
+
+    clock.now += 0.001
+    cache.get('grid', render)
+    assert render.calls == 2
+
+
+def test_size_limit_evicts_least_recently_used(cache):
+    renders = {key: Renderer('x' * 40) for key in 'abc'}
+    cache.get('a', renders['a'])
+    cache.get('b', renders['b'])
+    cache.get('a', renders['a'])
+
+    cache.get('c', renders['c'])
+
+    assert cache.stats()['bytes'] == 80
+    cache.get('a', renders['a'])
+    cache.get('b', renders['b'])
+    assert renders['a'].calls == 1
+    assert renders['b'].calls == 2
+
+
+def test_oversized_fragment_is_not_stored(cache):
+    render = Renderer('x' * 101)
+
+    cache.get('huge', render)
+
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['bytes'] == 0
+
+
+def make_environment(cache):
+    environment = Environment(extensions=[FragmentCacheExtension], loader=DictLoader({
+        'page.html': '<h1>{{ title }}</h1>{% cache page %}<ul>{% for item in items %}<li>{{ item }}</li>{% endfor %}</ul>{% endcache %}'
+    }))
+    environment.fragment_cache = cache
+    return environment
+
+
+def test_cache_tag_keys_by_template_and_arguments(cache):
+    template = make_environment(cache).get_template('page.html')
+
+    assert template.render(title='A', page=1, items=[1, 2]) == '<h1>A</h1><ul><li>1</li><li>2</li></ul>'
+    # Вне блока рендерится заново, блок берется из кэша по ключу ('page.html', 1)
+    assert template.render(title='B', page=1, items=[3]) == '<h1>B</h1><ul><li>1</li><li>2</li></ul>'
+    assert template.render(title='C', page=2, items=[3]) == '<h1>C</h1><ul><li>3</li></ul>'
+    assert cache.stats()['entries'] == 2
+
+
+def test_cache_tag_without_cache_always_renders():
+    template = make_environment(None).get_template('page.html')
+
+    template.render(title='A', page=1, items=[1])
+    assert template.render(title='A', page=1, items=[2]) == '<h1>A</h1><ul><li>2</li></ul>'
+
+
+@pytest.fixture
+def catalog(db_session):
+    db_session.execute(sa.delete(Cheese))
+    db_session.commit()
+    import_cheeses(db_session, [{'name': 'Бри', 'description': 'Мягкий', 'image_path': None}])
+    return db_session
+
+
+def test_index_grid_is_cached_until_catalog_changes(client, catalog):
+    misses = fragment_cache.stats()['misses']
+
+    first = client.get('/')
+    hits = fragment_cache.stats()['hits']
+    second = client.get('/')
+
+    assert 'Бри' in first.get_data(as_text=True)
+    assert second.get_data(as_text=True) == first.get_data(as_text=True)
+    assert fragment_cache.stats()['hits'] == hits + 1
+    assert fragment_cache.stats()['misses'] == misses + 1
+
+    import_cheeses(catalog, [{'name': 'Гауда', 'description': None, 'image_path': None}])
+
+    assert 'Гауда' in client.get('/').get_data(as_text=True)
+    assert fragment_cache.stats()['misses'] == misses + 2
+
+
+def test_index_pages_are_cached_separately(client, catalog):
+    assert client.get('/', query_string={'limit': 1}).status_code == 200
+    misses = fragment_cache.stats()['misses']
+
+    client.get('/', query_string={'limit': 2})
+
+    assert fragment_cache.stats()['misses'] == misses + 1
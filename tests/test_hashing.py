@@ -0,0 +1,115 @@
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+import common.hashing
+from common.hashing import (HASHERS, MAX_PASSWORD_BYTES, BcryptHasher, WerkzeugHasher, hash_password,
+                            hash_passwords, password_too_long, verify_password)
+from config import Config
+from db.models import User
+
+# 37 кириллических символов - 74 байта в UTF-8
+LONG_PASSWORD = 'п' * 37
+PBKDF2 = WerkzeugHasher(1000)
+
+
+def bcrypt_cost(hashed: str) -> int:
+    return int(hashed.split('$')[2])
+
+
+def test_hash_uses_default_scheme_and_cost():
+    hashed = hash_password('secret')
+
+    assert hashed.startswith('$2b$')
+    assert bcrypt_cost(hashed) == Config.PASSWORD_BCRYPT_ROUNDS
+    assert verify_password('secret', hashed) == (True, None)
+
+
+def test_wrong_password_is_rejected():
+    assert verify_password('wrong', hash_password('secret')) == (False, None)
+
+
+def test_unknown_hash_format_is_rejected():
+    assert verify_password('secret', 'md5$abc') == (False, None)
+
+
+def test_hash_passwords_keeps_order():
+    hashes = hash_passwords(['a', 'b', 'c'])
+
+    assert [verify_password(password, hashed)[0] for password, hashed in zip('abc', hashes)] == [True] * 3
+    assert verify_password('a', hashes[1]) == (False, None)
+
+
+def test_cost_change_triggers_rehash():
+    hashed = BcryptHasher(Config.PASSWORD_BCRYPT_ROUNDS + 1).hash('secret')
+
+    is_valid, new_hash = verify_password('secret', hashed)
+
+    assert is_valid
+    assert bcrypt_cost(new_hash) == Config.PASSWORD_BCRYPT_ROUNDS
+    assert verify_password('secret', new_hash) == (True, None)
+
+
+def test_scheme_change_triggers_rehash():
+    is_valid, new_hash = verify_password('secret', PBKDF2.hash('secret'))
+
+    assert is_valid
+    assert new_hash.startswith('$2b$')
+
+
+def test_pbkdf2_iterations_change_triggers_rehash(monkeypatch):
+    monkeypatch.setattr(common.hashing, 'default_hasher', HASHERS['pbkdf2'])
+
+    is_valid, new_hash = verify_password('secret', PBKDF2.hash('secret'))
+
+    assert is_valid
+    assert new_hash.startswith(HASHERS['pbkdf2'].method + '$')
+    assert not HASHERS['pbkdf2'].needs_rehash(new_hash)
+
+
+def test_wrong_password_is_not_rehashed():
+    assert verify_password('wrong', PBKDF2.hash('secret')) == (False, None)
+
+
+def test_password_length_is_counted_in_bytes():
+    assert len(LONG_PASSWORD) < MAX_PASSWORD_BYTES
+    assert password_too_long(LONG_PASSWORD)
+    assert not password_too_long('п' * 36)
+
+
+def test_bcrypt_rejects_long_password():
+    with pytest.raises(ValueError):
+        hash_password(LONG_PASSWORD)
+
+
+def test_long_password_is_not_truncated_by_rehash():
+    hashed = PBKDF2.hash(LONG_PASSWORD)
+
+    # Пересчет в bcrypt отбросил бы хвост пароля: прежний хэш остается
+    assert verify_password(LONG_PASSWORD, hashed) == (True, None)
+    assert verify_password(LONG_PASSWORD[:36], hashed) == (False, None)
+
+
+def test_registration_rejects_long_password(client, db_session):
+    username = 'long-{0}'.format(uuid.uuid4().hex[:8])
+
+    response = client.post('/register', data={'username': username, 'password': LONG_PASSWORD})
+
+    assert response.status_code == 200
+    assert 'не должен быть длиннее 72 байт'.encode('utf-8') in response.data
+    assert db_session.execute(sa.select(User).filter_by(username=username)).scalar() is None
+
+
+def test_login_stores_rehashed_password(client, db_session):
+    username = 'legacy-{0}'.format(uuid.uuid4().hex[:8])
+    db_session.add(User(username=username, password=PBKDF2.hash('secret')))
+    db_session.commit()
+
+    response = client.post('/login', data={'username': username, 'password': 'secret'})
+
+    assert response.status_code == 302
+    db_session.expire_all()
+    stored = db_session.execute(sa.select(User.password).filter_by(username=username)).scalar()
+    assert stored.startswith('$2b$')
+    assert verify_password('secret', stored) == (True, None)
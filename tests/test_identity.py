@@ -0,0 +1,147 @@
+import uuid
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy import event
+
+from common.identity import UserIdentity, UserIdentityCache, user_identities
+from db.crud import create_user
+from db.models import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class Loader:
+    def __init__(self, user):
+        self.user = user
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.user
+
+
+def make_user(**fields) -> User:
+    return User(id=uuid.uuid4(), username=fields.pop('username', 'alice'), password='x', **fields)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr('common.identity.time', clock)
+    return clock
+
+
+@pytest.fixture
+def cache():
+    return UserIdentityCache(ttl=60, max_size=2)
+
+
+def test_identity_hit_skips_loader(cache):
+    user = make_user(is_admin=True)
+    loader = Loader(user)
+
+    first = cache.get(user.id, loader)
+    second = cache.get(user.id, loader)
+
+    assert second is first
+    assert (first.id, first.username, first.is_admin) == (user.id, 'alice', True)
+    assert loader.calls == 1
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1}
+
+
+def test_missing_user_is_not_cached(cache):
+    loader = Loader(None)
+
+    assert cache.get(uuid.uuid4(), loader) is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_identity_expires_after_ttl(cache, clock):
+    user = make_user()
+    loader = Loader(user)
+    cache.get(user.id, loader)
+
+    clock.now += cache.ttl - 0.001
+    cache.get(user.id, loader)
+    assert loader.calls == 1
+
+    clock.now += 0.001
+    cache.get(user.id, loader)
+    assert loader.calls == 2
+
+
+def test_least_recently_used_identity_is_evicted(cache):
+    users = [make_user(username=name) for name in 'abc']
+    loaders = [Loader(user) for user in users]
+    cache.get(users[0].id, loaders[0])
+    cache.get(users[1].id, loaders[1])
+    cache.get(users[0].id, loaders[0])
+
+    cache.put(UserIdentity.from_user(users[2]))
+
+    assert cache.stats()['entries'] == 2
+    cache.get(users[0].id, loaders[0])
+    cache.get(users[1].id, loaders[1])
+    assert [loader.calls for loader in loaders] == [1, 2, 0]
+
+
+def test_invalidate_drops_identity(cache):
+    user = make_user()
+    loader = Loader(user)
+    cache.get(user.id, loader)
+
+    cache.invalidate(user.id)
+
+    cache.get(user.id, loader)
+    assert loader.calls == 2
+
+
+@pytest.fixture
+def stored_user(db_session) -> User:
+    username = 'identity-{0}'.format(uuid.uuid4().hex[:8])
+    create_user(db_session, User(username=username, password='secret'))
+    return db_session.execute(sa.select(User).filter_by(username=username)).scalar_one()
+
+
+def test_orm_update_invalidates_identity(db_session, stored_user):
+    user_identities.put(UserIdentity.from_user(stored_user))
+
+    stored_user.is_admin = True
+    db_session.commit()
+
+    identity = user_identities.get(stored_user.id, lambda: db_session.get(User, stored_user.id))
+    assert identity.is_admin
+
+
+def test_orm_delete_invalidates_identity(db_session, stored_user):
+    user_identities.put(UserIdentity.from_user(stored_user))
+
+    db_session.delete(stored_user)
+    db_session.commit()
+
+    assert user_identities.get(stored_user.id, lambda: None) is None
+
+
+def test_logged_in_requests_do_not_query_users(client, stored_user):
+    response = client.post('/login', data={'username': stored_user.username, 'password': 'secret'})
+    assert response.status_code == 302
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(sa.engine.Engine, 'before_cursor_execute', record)
+    try:
+        for _ in range(3):
+            assert client.get('/').status_code == 200
+    finally:
+        event.remove(sa.engine.Engine, 'before_cursor_execute', record)
+
+    assert not [statement for statement in statements if 'FROM user' in statement.replace('"', '')]
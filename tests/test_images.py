@@ -0,0 +1,116 @@
+import os
+
+import pytest
+import sqlalchemy as sa
+from PIL import Image
+
+from common.cache import catalog_cache
+from common.images import ImagePipeline, ingest_image, media_path
+from common.media import VARIANTS, media_url
+from db.crud import upsert_cheeses
+from db.models import Cheese, cheese_images
+
+
+def make_image(path, size, color) -> str:
+    Image.new('RGB', size, color).save(path, 'PNG')
+    return str(path)
+
+
+@pytest.fixture
+def publishes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(catalog_cache, 'publish_change', lambda db_session: calls.append(db_session))
+    return calls
+
+
+def test_ingest_creates_downscaled_variants(tmp_path):
+    source = make_image(tmp_path / 'large.png', (2000, 1000), 'orange')
+
+    key = ingest_image(source)
+
+    for variant, width in VARIANTS.items():
+        with Image.open(media_path(key, variant)) as image:
+            assert image.format == 'WEBP'
+            assert image.size == (width, width // 2)
+
+
+def test_small_image_is_not_upscaled(tmp_path):
+    source = make_image(tmp_path / 'small.png', (100, 50), 'yellow')
+
+    key = ingest_image(source)
+
+    with Image.open(media_path(key, 'full')) as image:
+        assert image.size == (100, 50)
+
+
+def test_key_depends_only_on_content(tmp_path):
+    first = make_image(tmp_path / 'first.png', (300, 300), 'white')
+    second = make_image(tmp_path / 'second.png', (300, 300), 'white')
+    other = make_image(tmp_path / 'other.png', (300, 300), 'black')
+
+    key = ingest_image(first)
+    modified = os.path.getmtime(media_path(key, 'thumb'))
+
+    assert ingest_image(second) == key
+    assert ingest_image(other) != key
+    # Варианты уже есть, повторно они не пишутся
+    assert os.path.getmtime(media_path(key, 'thumb')) == modified
+
+
+def test_pipeline_publishes_once_per_batch_and_only_on_change(tmp_path, db_session, publishes):
+    shared = make_image(tmp_path / 'shared.png', (640, 480), 'red')
+    single = make_image(tmp_path / 'single.png', (640, 480), 'blue')
+    db_session.execute(sa.delete(Cheese))
+    upsert_cheeses(db_session, [
+        {'name': 'Чеддер', 'description': None, 'image_path': shared},
+        {'name': 'Гауда', 'description': None, 'image_path': shared},
+        {'name': 'Бри', 'description': None, 'image_path': single},
+    ])
+    db_session.commit()
+    pipeline = ImagePipeline(workers=2, publish_interval=60)
+
+    futures = pipeline.schedule([shared, shared, single, None])
+    pipeline.wait()
+
+    assert sorted(futures) == sorted([shared, single])
+    keys = dict(db_session.execute(sa.select(Cheese.name, Cheese.image_key)).all())
+    assert keys['Чеддер'] == keys['Гауда'] == ingest_image(shared)
+    assert keys['Бри'] == ingest_image(single)
+    assert len(publishes) == 1
+
+    pipeline.schedule([shared, single])
+    pipeline.wait()
+
+    # image_key не изменился: кэши процессов не сбрасываются
+    assert len(publishes) == 1
+
+
+def test_broken_image_is_skipped(tmp_path, db_session, publishes):
+    broken = tmp_path / 'broken.png'
+    broken.write_bytes(b'not an image')
+    db_session.execute(sa.delete(Cheese))
+    upsert_cheeses(db_session, [{'name': 'Рокфор', 'description': None, 'image_path': str(broken)}])
+    db_session.commit()
+    pipeline = ImagePipeline(workers=1)
+
+    pipeline.schedule([str(broken)])
+    pipeline.wait()
+
+    assert db_session.execute(sa.select(Cheese.image_key)).scalar() is None
+    assert publishes == []
+
+
+def test_media_route_serves_variant(tmp_path, client):
+    key = ingest_image(make_image(tmp_path / 'served.png', (200, 100), 'green'))
+
+    response = client.get(media_url(key, 'thumb'))
+
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    with open(media_path(key, 'thumb'), 'rb') as variant:
+        assert response.data == variant.read()
+
+
+def test_cheese_images_match_served_variants():
+    assert cheese_images(None) is None
+    assert cheese_images('abc') == {variant: media_url('abc', variant) for variant in VARIANTS}
@@ -0,0 +1,120 @@
+import re
+import uuid
+
+import pytest
+import sqlalchemy as sa
+from flask import Flask
+from loguru import logger
+
+from config import Config
+from db.instrumentation import current_timings, init_app, redact_parameters
+from db.session import SessionLocal
+
+SERVER_TIMING = re.compile(r'^db;dur=[\d.]+;desc="(\d+) queries", render;dur=[\d.]+, total;dur=[\d.]+$')
+
+
+@pytest.fixture
+def warnings():
+    messages = []
+    handler_id = logger.add(messages.append, level='WARNING', format='{message}')
+    yield messages
+    logger.remove(handler_id)
+
+
+@pytest.fixture
+def instrumented_client():
+    app = Flask(__name__)
+    init_app(app)
+
+    @app.route('/items/<int:count>')
+    def items(count: int):
+        with SessionLocal() as db_session:
+            for number in range(count):
+                db_session.execute(sa.text('SELECT :number'), {'number': number})
+        return 'ok'
+
+    @app.route('/static-page')
+    def static_page():
+        return 'ok'
+
+    return app.test_client()
+
+
+def query_count(response) -> int:
+    match = SERVER_TIMING.match(response.headers['Server-Timing'])
+    assert match is not None
+    return int(match.group(1))
+
+
+def test_server_timing_counts_queries(instrumented_client):
+    assert query_count(instrumented_client.get('/items/3')) == 3
+    assert query_count(instrumented_client.get('/static-page')) == 0
+
+
+def test_server_timing_can_be_disabled(instrumented_client, monkeypatch):
+    monkeypatch.setattr(Config, 'SERVER_TIMING', False)
+
+    assert 'Server-Timing' not in instrumented_client.get('/items/1').headers
+
+
+def test_app_responses_carry_server_timing(client):
+    response = client.get('/')
+
+    assert response.status_code == 200
+    assert query_count(response) >= 0
+    assert 'render;dur=' in response.headers['Server-Timing']
+
+
+def test_repeated_query_is_reported_as_n_plus_one(instrumented_client, warnings):
+    instrumented_client.get('/items/{0}'.format(Config.SQL_N_PLUS_ONE_THRESHOLD))
+
+    reports = [message for message in warnings if 'N+1' in message]
+    assert len(reports) == 1
+    assert 'GET /items/{0}'.format(Config.SQL_N_PLUS_ONE_THRESHOLD) in reports[0]
+    assert 'выполнен {0} раз'.format(Config.SQL_N_PLUS_ONE_THRESHOLD) in reports[0]
+
+
+def test_few_repeats_are_not_reported(instrumented_client, warnings):
+    instrumented_client.get('/items/{0}'.format(Config.SQL_N_PLUS_ONE_THRESHOLD - 1))
+
+    assert not [message for message in warnings if 'N+1' in message]
+
+
+def test_slow_query_log_hides_parameter_values(monkeypatch, warnings):
+    monkeypatch.setattr(Config, 'SQL_SLOW_QUERY_MS', 0)
+    secret = uuid.uuid4().hex
+
+    with SessionLocal() as db_session:
+        db_session.execute(sa.text('SELECT :token'), {'token': secret})
+
+    slow = [message for message in warnings if 'Медленный SQL-запрос' in message]
+    assert slow
+    assert not [message for message in slow if secret in message]
+    # Драйвер SQLite получает позиционные параметры
+    assert slow[-1].rstrip().endswith('параметры: (str)')
+
+
+def test_queries_outside_request_are_not_counted():
+    with SessionLocal() as db_session:
+        db_session.execute(sa.text('SELECT 1'))
+
+    assert current_timings() is None
+
+
+def test_failed_query_does_not_break_timing(instrumented_client):
+    with pytest.raises(sa.exc.OperationalError):
+        with SessionLocal() as db_session:
+            db_session.execute(sa.text('SELECT * FROM missing_table'))
+
+    assert query_count(instrumented_client.get('/items/2')) == 2
+
+
+@pytest.mark.parametrize('parameters, expected', [
+    ({'name': 'Бри', 'limit': 5}, '{name: str, limit: int}'),
+    (('Бри', 5), '(str, int)'),
+    ([{'name': 'Бри'}, {'name': 'Гауда'}], '[2 x {name: str}]'),
+    ([('Бри',), ('Гауда',)], '[2 x (str)]'),
+    (None, 'NoneType'),
+])
+def test_redact_parameters(parameters, expected):
+    assert redact_parameters(parameters) == expected
@@ -0,0 +1,201 @@
+import datetime
+import socket
+import threading
+
+import pytest
+import sqlalchemy as sa
+from aiosmtpd.controller import Controller
+
+from common.mailer import MailOutbox
+from db.models import EmailOutbox
+from db.session import SessionLocal
+
+RETRY_BACKOFF = 10.0
+MAX_BACKOFF = 25.0
+MAX_ATTEMPTS = 3
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class RecordingHandler:
+    """
+    Обработчик локального SMTP-сервера: принимает письма, кроме адресов reject@ (550) и later@ (451).
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('reject@'):
+            return '550 5.1.1 Mailbox unavailable'
+        if address.startswith('later@'):
+            return '451 4.7.1 Try again later'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 Message accepted for delivery'
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    port = free_port()
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    monkeypatch.setenv('PORT', str(port))
+    try:
+        yield handler
+    finally:
+        controller.stop()
+
+
+@pytest.fixture
+def outbox():
+    with SessionLocal() as db_session:
+        db_session.execute(sa.delete(EmailOutbox))
+        db_session.commit()
+    return MailOutbox(
+        workers=0,
+        batch_size=10,
+        max_attempts=MAX_ATTEMPTS,
+        retry_backoff=RETRY_BACKOFF,
+        max_backoff=MAX_BACKOFF,
+        claim_timeout=60,
+        poll_interval=0.01,
+        idle_timeout=0
+    )
+
+
+def enqueue(outbox: MailOutbox, *recipients: str):
+    with SessionLocal() as db_session:
+        for recipient in recipients:
+            outbox.enqueue(db_session, recipient.split('@')[0], recipient)
+
+
+def outbox_rows() -> dict:
+    with SessionLocal() as db_session:
+        return {row.recipient: row for row in db_session.execute(sa.select(EmailOutbox)).scalars()}
+
+
+def make_due():
+    with SessionLocal() as db_session:
+        db_session.execute(
+            sa.update(EmailOutbox)
+            .where(EmailOutbox.status == 'pending')
+            .values(next_attempt_at=datetime.datetime.utcnow() - datetime.timedelta(seconds=1))
+        )
+        db_session.commit()
+
+
+def retry_delay(row: EmailOutbox) -> float:
+    return (row.next_attempt_at - datetime.datetime.utcnow()).total_seconds()
+
+
+def test_delivers_batch_over_one_connection(smtp_server, outbox):
+    enqueue(outbox, 'alice@example.com', 'bob@example.com')
+
+    assert outbox.deliver_pending(0) == 2
+
+    rows = outbox_rows()
+    assert {row.status for row in rows.values()} == {'sent'}
+    assert {row.attempts for row in rows.values()} == {1}
+    assert sorted(address for envelope in smtp_server.messages for address in envelope.rcpt_tos) == [
+        'alice@example.com', 'bob@example.com'
+    ]
+    assert outbox.stats()['connections'] == 1
+
+
+def test_permanent_rejection_fails_without_retry(smtp_server, outbox):
+    enqueue(outbox, 'reject@example.com', 'alice@example.com')
+
+    outbox.deliver_pending(0)
+
+    rows = outbox_rows()
+    assert rows['reject@example.com'].status == 'failed'
+    assert rows['reject@example.com'].attempts == 1
+    assert '550' in rows['reject@example.com'].last_error
+    # Отказ по одному адресу не мешает остальным письмам пачки
+    assert rows['alice@example.com'].status == 'sent'
+
+
+def test_temporary_rejection_retries_with_backoff_until_max_attempts(smtp_server, outbox):
+    enqueue(outbox, 'later@example.com')
+
+    for attempt in range(1, MAX_ATTEMPTS):
+        outbox.deliver_pending(0)
+        row = outbox_rows()['later@example.com']
+        assert row.status == 'pending'
+        assert row.attempts == attempt
+        assert retry_delay(row) == pytest.approx(RETRY_BACKOFF * 2 ** (attempt - 1), abs=2)
+        # Отложенное письмо не забирается до next_attempt_at
+        assert outbox.deliver_pending(0) == 0
+        make_due()
+
+    outbox.deliver_pending(0)
+    row = outbox_rows()['later@example.com']
+    assert row.status == 'failed'
+    assert row.attempts == MAX_ATTEMPTS
+    assert smtp_server.messages == []
+
+
+def test_unreachable_server_does_not_count_attempts(monkeypatch, outbox):
+    monkeypatch.setenv('PORT', str(free_port()))
+    enqueue(outbox, 'alice@example.com')
+
+    delays = []
+    for _ in range(MAX_ATTEMPTS + 1):
+        with pytest.raises(OSError):
+            outbox.deliver_pending(0)
+        row = outbox_rows()['alice@example.com']
+        assert row.status == 'pending'
+        assert row.attempts == 0
+        delays.append(retry_delay(row))
+        make_due()
+
+    expected = [RETRY_BACKOFF, RETRY_BACKOFF * 2, MAX_BACKOFF, MAX_BACKOFF]
+    assert delays == pytest.approx(expected, abs=2)
+
+
+def test_delivers_after_server_recovers(monkeypatch, smtp_server, outbox):
+    port = str(free_port())
+    with monkeypatch.context() as patch:
+        patch.setenv('PORT', port)
+        enqueue(outbox, 'alice@example.com')
+        with pytest.raises(OSError):
+            outbox.deliver_pending(0)
+    make_due()
+
+    outbox.deliver_pending(0)
+
+    row = outbox_rows()['alice@example.com']
+    assert row.status == 'sent'
+    assert row.attempts == 1
+    assert len(smtp_server.messages) == 1
+
+
+def test_requests_do_not_start_senders(monkeypatch, client):
+    from common.mailer import mail_outbox
+
+    monkeypatch.setattr(mail_outbox, 'workers', 1)
+    monkeypatch.setattr(mail_outbox, '_started_pid', None)
+
+    client.get('/metrics')
+    client.get('/')
+
+    assert mail_outbox._started_pid is None
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith('mail-outbox-')]
+
+
+def test_enqueue_does_not_start_senders(monkeypatch, outbox):
+    monkeypatch.setattr(outbox, 'workers', 1)
+
+    enqueue(outbox, 'alice@example.com')
+
+    assert outbox._started_pid is None
+    assert outbox_rows()['alice@example.com'].status == 'pending'
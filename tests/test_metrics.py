@@ -0,0 +1,42 @@
+import pytest
+from prometheus_client import REGISTRY
+
+import common.metrics
+import db.session
+from common.lazy import LazyResource
+
+
+def gauge(state: str) -> float:
+    return REGISTRY.get_sample_value('db_pool_connections', {'state': state})
+
+
+@pytest.fixture
+def no_engine(monkeypatch):
+    def fail():
+        raise AssertionError('механизм не должен создаваться')
+
+    monkeypatch.setattr(db.session, '_engine', LazyResource(fail))
+
+
+def test_pool_metrics_skip_process_without_engine(no_engine, monkeypatch):
+    monkeypatch.setattr(common.metrics, '_last_pool_update', [0.0])
+
+    common.metrics.update_pool_metrics(force=True)
+
+    assert not db.session.engine_created()
+
+
+def test_request_without_database_does_not_create_engine(no_engine, client):
+    assert client.get('/no-such-page').status_code == 404
+
+    assert not db.session.engine_created()
+
+
+def test_pool_metrics_reflect_existing_engine(db_session):
+    db_session.connection()
+
+    common.metrics.update_pool_metrics(force=True)
+
+    assert db.session.engine_created()
+    assert gauge('size') == db.session.pool_stats()['size']
+    assert gauge('checked_out') >= 1
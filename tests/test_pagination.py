@@ -0,0 +1,77 @@
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+from common.pagination import decode_cursor, encode_cursor, parse_limit
+from config import Config
+from db.crud import get_cheese_page, upsert_cheeses
+from db.models import Cheese
+
+
+def test_cursor_round_trip():
+    cheese_id = uuid.uuid4()
+
+    cursor = encode_cursor(cheese_id)
+
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == cheese_id
+
+
+@pytest.mark.parametrize('cursor', [None, ''])
+def test_missing_cursor_is_first_page(cursor):
+    assert decode_cursor(cursor) is None
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    'AAAA',
+    encode_cursor(uuid.uuid4()) + 'AAAA',
+    'сыр',
+    'A',
+])
+def test_decode_cursor_rejects_bad_input(cursor):
+    with pytest.raises(ValueError, match='Некорректный курсор'):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('raw_limit, expected', [
+    (None, Config.CATALOG_PAGE_SIZE),
+    ('', Config.CATALOG_PAGE_SIZE),
+    ('10', 10),
+    ('0', 1),
+    ('-5', 1),
+    (str(Config.CATALOG_MAX_PAGE_SIZE + 1), Config.CATALOG_MAX_PAGE_SIZE),
+])
+def test_parse_limit_clamps_to_page_bounds(raw_limit, expected):
+    assert parse_limit(raw_limit) == expected
+
+
+@pytest.mark.parametrize('raw_limit', ['ten', '1.5', '10; DROP TABLE cheese'])
+def test_parse_limit_rejects_non_integers(raw_limit):
+    with pytest.raises(ValueError):
+        parse_limit(raw_limit)
+
+
+def test_pages_cover_catalog_once(db_session):
+    db_session.execute(sa.delete(Cheese))
+    upsert_cheeses(db_session, [
+        {'name': 'Сыр {0}'.format(number), 'description': None, 'image_path': None}
+        for number in range(7)
+    ])
+    db_session.commit()
+
+    seen, after = [], None
+    while True:
+        cheeses, after = get_cheese_page(db_session, 3, after)
+        seen.extend(cheese.name for cheese in cheeses)
+        if after is None:
+            break
+
+    assert sorted(seen) == sorted('Сыр {0}'.format(number) for number in range(7))
+    assert len(seen) == len(set(seen))
+
+
+@pytest.mark.parametrize('query', ['after=broken!', 'limit=many'])
+def test_catalog_page_rejects_bad_parameters(client, query):
+    assert client.get('/?' + query).status_code == 400
@@ -0,0 +1,104 @@
+import gzip
+import json
+import uuid
+
+import pytest
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from common.payload import EncodedPayload, brotli
+from common.utils import generate_token
+
+DATA = {'cheeses': [{'name': 'Сыр {0}'.format(number), 'description': 'Выдержанный ' * 10} for number in range(20)]}
+
+
+def accept(header: str) -> Accept:
+    return parse_accept_header(header, Accept)
+
+
+@pytest.fixture
+def payload():
+    return EncodedPayload(DATA)
+
+
+def test_body_is_canonical_json(payload):
+    assert json.loads(payload.body) == DATA
+    assert EncodedPayload(dict(reversed(list(DATA.items())))).etag == payload.etag
+    assert EncodedPayload({'cheeses': []}).etag != payload.etag
+
+
+@pytest.mark.parametrize('if_none_match', [
+    '"{etag}"',
+    'W/"{etag}"',
+    '"{etag}-gzip"',
+    '"{etag}-br"',
+    '"stale", "{etag}"',
+    '*',
+])
+def test_matches_current_etag_in_any_form(payload, if_none_match):
+    assert payload.matches(if_none_match.format(etag=payload.etag))
+
+
+@pytest.mark.parametrize('if_none_match', ['"stale"', '', '"{etag}x"', 'W/"stale-gzip"'])
+def test_does_not_match_other_etags(payload, if_none_match):
+    assert not payload.matches(if_none_match.format(etag=payload.etag))
+
+
+def test_negotiate_identity(payload):
+    status, headers, body = payload.negotiate(accept(''), None)
+
+    assert status == 200
+    assert body == payload.body
+    assert headers['ETag'] == '"{0}"'.format(payload.etag)
+    assert 'Content-Encoding' not in headers
+    assert headers['Vary'] == 'Accept-Encoding'
+
+
+def test_negotiate_gzip(payload):
+    status, headers, body = payload.negotiate(accept('gzip, br;q=0'), None)
+
+    assert status == 200
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['ETag'] == '"{0}-gzip"'.format(payload.etag)
+    assert gzip.decompress(body) == payload.body
+
+
+@pytest.mark.skipif(brotli is None, reason='brotli не установлен')
+def test_negotiate_prefers_brotli(payload):
+    status, headers, body = payload.negotiate(accept('gzip, br'), None)
+
+    assert headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(body) == payload.body
+
+
+def test_negotiate_not_modified(payload):
+    _, headers, _ = payload.negotiate(accept('gzip'), None)
+
+    status, not_modified_headers, body = payload.negotiate(accept('gzip'), headers['ETag'])
+
+    assert status == 304
+    assert body == b''
+    assert not_modified_headers['ETag'] == headers['ETag']
+
+
+def test_small_body_is_not_compressed():
+    payload = EncodedPayload({})
+
+    status, headers, body = payload.negotiate(accept('gzip, br'), None)
+
+    assert payload.variants == {}
+    assert 'Content-Encoding' not in headers
+    assert body == b'{}'
+
+
+def test_api_revalidation(client):
+    headers = {'Authorization': 'Bearer ' + generate_token(uuid.uuid4())}
+
+    response = client.get('/cheese/api', headers=headers)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = client.get('/cheese/api', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
@@ -0,0 +1,118 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+from common.ratelimit import AuthRateLimiter
+from db.crud import create_user
+from db.models import User
+from tests.conftest import TEST_DIR
+
+PERIOD = 60.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr('common.ratelimit.time', clock)
+    return clock
+
+
+@pytest.fixture
+def limiter():
+    path = os.path.join(TEST_DIR, 'limits-{0}.sqlite3'.format(uuid.uuid4().hex))
+    return AuthRateLimiter(path, per_user=2, per_ip=5, period=PERIOD)
+
+
+def test_user_bucket_denies_with_retry_after(clock, limiter):
+    assert limiter.acquire('login', 'alice', '10.0.0.1') == 0
+    assert limiter.acquire('login', 'alice', '10.0.0.2') == 0
+
+    retry_after = limiter.acquire('login', 'alice', '10.0.0.3')
+
+    # Корзина из двух попыток наполняется за PERIOD: токен появляется через PERIOD / 2
+    assert retry_after == pytest.approx(PERIOD / 2)
+    # Другое имя с того же адреса не ограничено корзиной alice
+    assert limiter.acquire('login', 'bob', '10.0.0.3') == 0
+
+
+def test_bucket_refills_over_time(clock, limiter):
+    for _ in range(2):
+        limiter.acquire('login', 'alice', '10.0.0.1')
+    assert limiter.acquire('login', 'alice', '10.0.0.1') > 0
+
+    clock.now += PERIOD / 2
+
+    assert limiter.acquire('login', 'alice', '10.0.0.1') == 0
+    assert limiter.acquire('login', 'alice', '10.0.0.1') > 0
+
+
+def test_ip_bucket_limits_many_usernames(clock, limiter):
+    for number in range(5):
+        assert limiter.acquire('login', 'user{0}'.format(number), '10.0.0.1') == 0
+
+    assert limiter.acquire('login', 'someone', '10.0.0.1') == pytest.approx(PERIOD / 5)
+    assert limiter.acquire('login', 'someone', '10.0.0.2') == 0
+
+
+def test_denied_attempt_spends_no_tokens(clock, limiter):
+    for number in range(5):
+        limiter.acquire('login', 'user{0}'.format(number), '10.0.0.1')
+    limiter.acquire('login', 'alice', '10.0.0.1')
+
+    # Отказ по адресу не тратит токены из корзины имени
+    assert limiter.acquire('login', 'alice', '10.0.0.2') == 0
+    assert limiter.acquire('login', 'alice', '10.0.0.2') == 0
+
+
+def test_reset_user_refills_user_bucket(clock, limiter):
+    for _ in range(2):
+        limiter.acquire('login', 'alice', '10.0.0.1')
+
+    limiter.reset_user('alice')
+
+    assert limiter.acquire('login', 'alice', '10.0.0.1') == 0
+
+
+def test_unavailable_state_file_allows_attempts(tmp_path):
+    limiter = AuthRateLimiter(str(tmp_path / 'missing' / 'limits.sqlite3'), per_user=1, per_ip=1, period=PERIOD)
+
+    assert limiter.acquire('login', 'alice', '10.0.0.1') == 0
+    assert limiter.acquire('login', 'alice', '10.0.0.1') == 0
+
+
+def test_api_token_returns_429_with_retry_after(monkeypatch, clock, client, db_session, limiter):
+    monkeypatch.setattr(sys.modules['app'], 'auth_limiter', limiter)
+    username = 'limited-{0}'.format(uuid.uuid4().hex[:8])
+    create_user(db_session, User(username=username, password='correct-password'))
+
+    for _ in range(2):
+        response = client.post('/api/token', json={'username': username, 'password': 'wrong'})
+        assert response.status_code == 401
+
+    response = client.post('/api/token', json={'username': username, 'password': 'correct-password'})
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) == PERIOD / 2
+
+
+def test_successful_login_resets_user_bucket(monkeypatch, clock, client, db_session, limiter):
+    monkeypatch.setattr(sys.modules['app'], 'auth_limiter', limiter)
+    username = 'limited-{0}'.format(uuid.uuid4().hex[:8])
+    create_user(db_session, User(username=username, password='correct-password'))
+
+    assert client.post('/api/token', json={'username': username, 'password': 'wrong'}).status_code == 401
+    assert client.post('/api/token', json={'username': username, 'password': 'correct-password'}).status_code == 200
+
+    for _ in range(2):
+        response = client.post('/api/token', json={'username': username, 'password': 'wrong'})
+        assert response.status_code == 401
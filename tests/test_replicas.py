@@ -0,0 +1,138 @@
+import time
+
+import pytest
+import sqlalchemy as sa
+from flask import session as flask_session
+
+import db.session
+from db.crud import upsert_cheeses
+from db.models import Base, Cheese
+from db.session import PRIMARY_UNTIL_KEY, ReplicaRouter, create_pooled_engine, get_request_db
+
+
+def make_replica(path, name: str) -> sa.engine.Engine:
+    engine = create_pooled_engine('sqlite:///{0}'.format(path))
+    Base.metadata.create_all(engine)
+    with sa.orm.Session(engine) as replica_session:
+        upsert_cheeses(replica_session, [{'name': name, 'description': None, 'image_path': None}])
+        replica_session.commit()
+    return engine
+
+
+def wait_checked(router: ReplicaRouter):
+    # Первая проверка отставания выполняется фоновым потоком сразу после запуска
+    router.pick()
+    deadline = time.monotonic() + 5
+    while any(lag is None for lag in router.lags) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    engines = [make_replica(tmp_path / 'replica{0}.sqlite3'.format(number), 'replica-{0}'.format(number)) for number in range(2)]
+    yield engines
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def router(replicas):
+    router = ReplicaRouter(lambda: replicas, max_lag=5, check_interval=60)
+    wait_checked(router)
+    return router
+
+
+def test_reads_round_robin_over_fresh_replicas(router):
+    assert router.lags == [0.0, 0.0]
+    assert sorted(router.pick() for _ in range(4)) == [0, 0, 1, 1]
+
+
+def test_lagging_replica_is_skipped(router):
+    router.lags[0] = router.max_lag + 1
+
+    assert {router.pick() for _ in range(4)} == {1}
+
+    router.lags[1] = None
+
+    assert router.pick() is None
+
+
+def test_unavailable_replica_is_skipped(tmp_path):
+    broken = create_pooled_engine('sqlite:///{0}'.format(tmp_path / 'missing' / 'replica.sqlite3'))
+    router = ReplicaRouter(lambda: [broken], max_lag=5, check_interval=60)
+    router.pick()
+    router.check()
+
+    assert router.lags == [None]
+    assert router.pick() is None
+    broken.dispose()
+
+
+def test_no_replicas_reads_primary():
+    router = ReplicaRouter(lambda: [], max_lag=5, check_interval=60)
+
+    assert router.pick() is None
+
+
+def test_catalog_write_reads_primary_for_sticky_seconds(router):
+    router.note_write()
+
+    assert router.pick() is None
+
+    router.last_write = time.monotonic() - router.sticky_seconds - 0.1
+
+    assert router.pick() is not None
+
+
+def test_client_write_reads_primary_until_deadline(router):
+    assert router.pick(primary_until=time.time() + 10) is None
+    assert router.pick(primary_until=time.time() - 1) is not None
+
+
+@pytest.fixture
+def request_router(monkeypatch, replicas):
+    # Одна реплика, чтобы чтение с нее было однозначным
+    router = ReplicaRouter(lambda: replicas[:1], max_lag=5, check_interval=60)
+    wait_checked(router)
+    monkeypatch.setattr(db.session, 'replica_router', router)
+    monkeypatch.setattr(db.session, 'get_replica_engines', lambda: replicas[:1])
+    return router
+
+
+def catalog_names(db_session) -> set:
+    return set(db_session.execute(sa.select(Cheese.name)).scalars())
+
+
+def test_request_reads_replica_until_it_writes(app, request_router):
+    with app.test_request_context('/'):
+        assert catalog_names(get_request_db(read_only=True)) == {'replica-0'}
+
+        primary = get_request_db()
+        upsert_cheeses(primary, [{'name': 'primary-write', 'description': None, 'image_path': None}])
+
+        # Незафиксированная запись видна только в сессии основной базы
+        assert get_request_db(read_only=True) is primary
+        assert 'primary-write' in catalog_names(get_request_db(read_only=True))
+
+        primary.commit()
+        primary_until = flask_session[PRIMARY_UNTIL_KEY]
+
+    assert primary_until == pytest.approx(time.time() + request_router.sticky_seconds, abs=1)
+
+    # Следующий запрос клиента с той же cookie-сессией читает свою запись с основной базы
+    with app.test_request_context('/'):
+        flask_session[PRIMARY_UNTIL_KEY] = primary_until
+        assert 'primary-write' in catalog_names(get_request_db(read_only=True))
+
+    with app.test_request_context('/'):
+        flask_session[PRIMARY_UNTIL_KEY] = time.time() - 1
+        assert catalog_names(get_request_db(read_only=True)) == {'replica-0'}
+
+
+def test_replica_session_is_read_only(app, request_router):
+    with app.test_request_context('/'):
+        replica = get_request_db(read_only=True)
+        replica.add(Cheese(name='nope', content_hash='0' * 32))
+
+        with pytest.raises(sa.exc.InvalidRequestError):
+            replica.flush()
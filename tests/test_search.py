@@ -0,0 +1,151 @@
+import os
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from config import Config
+from db.crud import upsert_cheeses
+from db.models import Cheese
+from db.search import search_cheese, search_statement, tokenize
+
+CATALOG = [
+    ('Чеддер', 'Твердый английский сыр'),
+    ('Моцарелла', 'Мягкий итальянский'),
+    ('Сыр косичка', 'Копченый'),
+    ('Козий сыр', None),
+    ('Camembert', 'Мягкий сыр с белой плесенью'),
+    ('Дор блю', 'С голубой плесенью'),
+    ('Пармезан', 'Твердый, выдержанный 24 месяца'),
+]
+
+
+def names(cheeses) -> list:
+    return [cheese.name for cheese in cheeses]
+
+
+@pytest.fixture
+def catalog(db_session):
+    db_session.execute(sa.delete(Cheese))
+    upsert_cheeses(db_session, [
+        {'name': name, 'description': description, 'image_path': None} for name, description in CATALOG
+    ])
+    db_session.commit()
+    return db_session
+
+
+def test_tokenize_splits_words_and_lowercases():
+    assert tokenize('  Дор-Блю, 24 мес.') == ['дор', 'блю', '24', 'мес']
+
+
+@pytest.mark.parametrize('query', ['', '   ', '!!!', ' - , '])
+def test_query_without_words_builds_no_statement(query):
+    assert search_statement('sqlite', query, 10) is None
+    assert search_statement('postgresql', query, 10) is None
+
+
+@pytest.mark.parametrize('query', ['', '   \t', '%%'])
+def test_empty_query_finds_nothing(catalog, query):
+    assert search_cheese(catalog, query, 10) == []
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('чед', ['Чеддер']),
+    ('ЧЕДД', ['Чеддер']),
+    ('моц', ['Моцарелла']),
+    ('camem', ['Camembert']),
+    ('выдерж', ['Пармезан']),
+])
+def test_prefix_matches_name_or_description(catalog, query, expected):
+    assert names(search_cheese(catalog, query, 10)) == expected
+
+
+def test_all_words_must_match(catalog):
+    assert names(search_cheese(catalog, 'мягкий плес', 10)) == ['Camembert']
+    assert names(search_cheese(catalog, 'мягкий голуб', 10)) == []
+
+
+def test_like_wildcards_are_literal(catalog):
+    assert search_cheese(catalog, '_', 10) == []
+
+
+def test_name_prefix_ranks_above_name_and_description_matches(catalog):
+    # Начало названия, затем вхождение в название, затем только описание (по алфавиту внутри группы)
+    assert names(search_cheese(catalog, 'сыр', 10)) == ['Сыр косичка', 'Козий сыр', 'Camembert', 'Чеддер']
+
+
+def test_limit_bounds_results(catalog):
+    assert names(search_cheese(catalog, 'сыр', 2)) == ['Сыр косичка', 'Козий сыр']
+
+
+def test_search_route(client, catalog):
+    response = client.get('/cheese/search', query_string={'q': ' плесень '})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['query'] == 'плесень'
+    assert [item['name'] for item in data['items']] == ['Camembert', 'Дор блю']
+
+
+@pytest.mark.parametrize('limit, expected', [('1', 1), ('0', 1), ('1000', 4)])
+def test_search_route_clamps_limit(client, catalog, monkeypatch, limit, expected):
+    monkeypatch.setattr(Config, 'SEARCH_MAX_RESULTS', 4)
+
+    response = client.get('/cheese/search', query_string={'q': 'с', 'limit': limit})
+
+    assert len(response.get_json()['items']) == expected
+
+
+def test_search_route_rejects_bad_limit(client):
+    assert client.get('/cheese/search', query_string={'q': 'сыр', 'limit': 'many'}).status_code == 400
+
+
+def test_search_route_whitespace_query(client, catalog):
+    response = client.get('/cheese/search', query_string={'q': '   '})
+
+    assert response.get_json() == {'query': '', 'items': []}
+
+
+def test_postgresql_statement_uses_full_text_and_trigram_indexes():
+    statement = search_statement('postgresql', 'Дор бл', 5)
+
+    compiled = statement.compile(dialect=postgresql.dialect())
+    sql, params = str(compiled), compiled.params
+
+    # Выражения совпадают с индексами миграции: tsvector по весам A/B и триграммы по названию
+    assert "setweight(to_tsvector('simple', coalesce(cheese.name, '')), 'A')" in sql
+    assert "setweight(to_tsvector('simple', coalesce(cheese.description, '')), 'B')" in sql
+    assert '@@ to_tsquery(' in sql
+    assert 'cheese.name %' in sql
+    assert 'similarity(cheese.name' in sql
+    assert set(params.values()) >= {'simple', 'дор:* & бл:*', 'дор бл', 5}
+
+
+@pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'), reason='TEST_POSTGRES_URL не задан')
+def test_postgresql_search_executes():
+    engine = sa.create_engine(os.environ['TEST_POSTGRES_URL'])
+    try:
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            try:
+                connection.execute(sa.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+                connection.execute(sa.text('CREATE SCHEMA search_test'))
+                connection.execute(sa.text('SET LOCAL search_path TO search_test, public'))
+                Cheese.__table__.create(connection)
+                db_session = Session(bind=connection)
+                upsert_cheeses(db_session, [
+                    {'name': name, 'description': description, 'image_path': None}
+                    for name, description in CATALOG
+                ])
+                db_session.flush()
+
+                assert names(search_cheese(db_session, 'чед', 10)) == ['Чеддер']
+                assert names(search_cheese(db_session, 'мягкий плес', 10)) == ['Camembert']
+                # Триграммы находят название с опечаткой
+                assert 'Моцарелла' in names(search_cheese(db_session, 'Моцарела', 10))
+                assert len(search_cheese(db_session, 'сыр', 2)) == 2
+            finally:
+                transaction.rollback()
+    finally:
+        engine.dispose()
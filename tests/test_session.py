@@ -0,0 +1,148 @@
+import multiprocessing
+import os
+import sqlite3
+
+import pytest
+import sqlalchemy as sa
+from flask import g
+
+import common.metrics
+from db.crud import upsert_cheeses
+from db.models import Cheese
+from db.session import InstrumentedQueuePool, close_request_db, get_engine, get_request_db
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / 'pool.sqlite3')
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(path, check_same_thread=False),
+                                 pool_size=1, max_overflow=0, timeout=0.01)
+    yield pool
+    pool.dispose()
+
+
+def counters(pool) -> tuple:
+    return pool.wait_count, pool.timeouts
+
+
+def checkout_twice(pool):
+    connection = pool.connect()
+    connection.close()
+    pool.connect().close()
+
+
+def test_pool_counts_checkouts_and_timeouts(pool):
+    checkout_twice(pool)
+    assert counters(pool) == (2, 0)
+
+    held = pool.connect()
+    with pytest.raises(sa.exc.TimeoutError):
+        pool.connect()
+    held.close()
+
+    assert counters(pool) == (4, 1)
+    assert pool.wait_seconds >= 0.01
+    assert pool.max_wait_seconds >= 0.01
+
+
+def test_recreated_pool_keeps_counters_in_same_process(pool):
+    checkout_twice(pool)
+
+    recreated = pool.recreate()
+
+    assert counters(recreated) == (2, 0)
+    recreated.dispose()
+
+
+def _recreate_in_child(pool, connection):
+    recreated = pool.recreate()
+    connection.send(counters(recreated))
+    recreated.dispose()
+
+
+def test_recreated_pool_starts_from_zero_after_fork(pool):
+    checkout_twice(pool)
+    context = multiprocessing.get_context('fork')
+    parent, child = context.Pipe()
+
+    process = context.Process(target=_recreate_in_child, args=(pool, child))
+    process.start()
+    result = parent.recv()
+    process.join()
+
+    # Иначе каждый рабочий процесс gunicorn повторно учел бы ожидания мастера
+    assert result == (0, 0)
+    assert counters(pool) == (2, 0)
+
+
+def _update_metrics_in_child(connection):
+    common.metrics._last_pool_totals.update(wait_count=10 ** 6)
+    common.metrics.update_pool_metrics(force=True)
+    connection.send(dict(common.metrics._last_pool_totals))
+
+
+def test_pool_metric_totals_restart_after_fork(db_session):
+    db_session.connection()
+    common.metrics.update_pool_metrics(force=True)
+    context = multiprocessing.get_context('fork')
+    parent, child = context.Pipe()
+
+    process = context.Process(target=_update_metrics_in_child, args=(child,))
+    process.start()
+    totals = parent.recv()
+    process.join()
+
+    assert totals['pid'] == process.pid
+    assert totals['wait_count'] < 10 ** 6
+
+
+@pytest.fixture
+def empty_catalog(db_session):
+    db_session.execute(sa.delete(Cheese))
+    db_session.commit()
+
+
+def test_request_session_is_created_lazily_and_reused(app):
+    with app.test_request_context('/'):
+        assert 'db_session' not in g
+
+        db_session = get_request_db()
+
+        assert get_request_db() is db_session
+        # Без реплик чтение идет через ту же сессию основной базы
+        assert get_request_db(read_only=True) is db_session
+
+
+def test_close_request_db_returns_connection_to_pool(app):
+    pool = get_engine().pool
+    with app.test_request_context('/'):
+        checked_out = pool.checkedout()
+        get_request_db().execute(sa.text('SELECT 1'))
+        assert pool.checkedout() == checked_out + 1
+
+        close_request_db()
+
+        assert 'db_session' not in g
+        assert pool.checkedout() == checked_out
+        # Повторное закрытие без сессии ничего не делает
+        close_request_db()
+
+
+def test_close_request_db_rolls_back_on_error(app, empty_catalog):
+    with app.test_request_context('/'):
+        upsert_cheeses(get_request_db(), [{'name': 'Бри', 'description': None, 'image_path': None}])
+        get_request_db().flush()
+
+        close_request_db(RuntimeError('boom'))
+
+    with app.test_request_context('/'):
+        assert get_request_db().execute(sa.select(sa.func.count()).select_from(Cheese)).scalar() == 0
+
+
+def test_request_sessions_are_independent(app, empty_catalog):
+    with app.test_request_context('/'):
+        first = get_request_db()
+        close_request_db()
+
+    with app.test_request_context('/'):
+        assert get_request_db() is not first
@@ -0,0 +1,67 @@
+import uuid
+
+import pytest
+
+from db.crud import create_user
+from db.models import User
+
+
+@pytest.fixture
+def credentials(db_session) -> dict:
+    username = 'api-{0}'.format(uuid.uuid4().hex[:8])
+    create_user(db_session, User(username=username, password='api-password'))
+    return {'username': username, 'password': 'api-password'}
+
+
+def issue(client, credentials) -> dict:
+    response = client.post('/api/token', json=credentials)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def refresh(client, refresh_token: str):
+    return client.post('/api/token/refresh', json={'refresh_token': refresh_token})
+
+
+def test_issued_access_token_opens_api(client, credentials):
+    tokens = issue(client, credentials)
+
+    assert tokens['token_type'] == 'Bearer'
+    response = client.get('/cheese/api', headers={'Authorization': 'Bearer ' + tokens['access_token']})
+    assert response.status_code == 200
+
+
+def test_wrong_password_is_rejected(client, credentials):
+    response = client.post('/api/token', json={**credentials, 'password': 'wrong'})
+
+    assert response.status_code == 401
+
+
+def test_refresh_rotates_token(client, credentials):
+    tokens = issue(client, credentials)
+
+    response = refresh(client, tokens['refresh_token'])
+
+    assert response.status_code == 200
+    rotated = response.get_json()
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    assert refresh(client, rotated['refresh_token']).status_code == 200
+
+
+def test_reused_refresh_token_revokes_family(client, credentials):
+    tokens = issue(client, credentials)
+    rotated = refresh(client, tokens['refresh_token']).get_json()
+
+    # Повторное предъявление погашенного токена - признак утечки
+    assert refresh(client, tokens['refresh_token']).status_code == 401
+    assert refresh(client, rotated['refresh_token']).status_code == 401
+
+    # Другие входы того же пользователя не затронуты
+    assert refresh(client, issue(client, credentials)['refresh_token']).status_code == 200
+
+
+def test_access_token_is_not_a_refresh_token(client, credentials):
+    tokens = issue(client, credentials)
+
+    assert refresh(client, tokens['access_token']).status_code == 401
+    assert refresh(client, 'garbage').status_code == 401
@@ -0,0 +1,136 @@
+import io
+import json
+import sys
+import uuid
+from http import HTTPStatus
+from http.client import HTTPException
+
+import pytest
+import sqlalchemy as sa
+
+import provision_users
+from common.hashing import hash_password, verify_password
+from db.bulk import import_users, iter_user_file
+from db.crud import create_user, insert_users
+from db.models import User
+
+
+def unique_name(prefix: str) -> str:
+    return '{0}-{1}'.format(prefix, uuid.uuid4().hex[:8])
+
+
+def passwords(db_session, usernames) -> dict:
+    return dict(db_session.execute(
+        sa.select(User.username, User.password).where(User.username.in_(list(usernames)))
+    ).all())
+
+
+def test_create_user_stores_hashed_password(db_session):
+    username = unique_name('alice')
+
+    assert create_user(db_session, User(username=username, password='secret')) == {'message': 'Пользователь создан'}
+
+    stored = passwords(db_session, [username])[username]
+    assert stored != 'secret'
+    assert verify_password('secret', stored) == (True, None)
+
+
+def test_create_user_conflict(db_session):
+    username = unique_name('alice')
+    create_user(db_session, User(username=username, password='first'))
+
+    # Пустой RETURNING у INSERT ... ON CONFLICT DO NOTHING - имя занято
+    with pytest.raises(HTTPException) as error:
+        create_user(db_session, User(username=username, password='second'))
+
+    assert error.value.args[0] == HTTPStatus.CONFLICT
+    assert verify_password('first', passwords(db_session, [username])[username])[0]
+    # Сессия пригодна для следующих запросов
+    assert db_session.execute(sa.select(sa.func.count()).select_from(User)).scalar() >= 1
+
+
+def test_register_route_reports_taken_name(client, db_session):
+    username = unique_name('taken')
+    create_user(db_session, User(username=username, password='first'))
+
+    response = client.post('/register', data={'username': username, 'password': 'second'}, follow_redirects=True)
+
+    assert 'уже существует'.encode('utf-8') in response.data
+
+
+def test_insert_users_skips_taken_names(db_session):
+    taken, fresh = unique_name('taken'), unique_name('fresh')
+    insert_users(db_session, [{'username': taken, 'password': hash_password('old')}])
+
+    created = insert_users(db_session, [
+        {'username': taken, 'password': hash_password('new')},
+        {'username': fresh, 'password': hash_password('new')},
+    ])
+    db_session.commit()
+
+    assert created == [fresh]
+    assert verify_password('old', passwords(db_session, [taken])[taken])[0]
+
+
+def test_insert_users_without_rows(db_session):
+    assert insert_users(db_session, []) == []
+
+
+def test_reads_user_files():
+    csv_stream = io.StringIO('username,password,comment\nalice,secret,x\n')
+    jsonl_stream = io.StringIO('{"username": "bob", "password": "pw"}\n\n')
+
+    assert list(iter_user_file(csv_stream, 'csv')) == [{'username': 'alice', 'password': 'secret'}]
+    assert list(iter_user_file(jsonl_stream, 'jsonl')) == [{'username': 'bob', 'password': 'pw'}]
+
+
+@pytest.mark.parametrize('line, message', [
+    ('{"username": "alice"}', 'не указано'),
+    ('{"password": "secret"}', 'не указано'),
+    (json.dumps({'username': 'alice', 'password': 'п' * 37}), '72 байт'),
+])
+def test_rejects_invalid_user_records(line, message):
+    with pytest.raises(ValueError, match=message):
+        list(iter_user_file(io.StringIO(line + '\n'), 'jsonl'))
+
+
+def test_import_users_skips_existing_and_repeated_names(db_session):
+    existing = unique_name('existing')
+    create_user(db_session, User(username=existing, password='old'))
+    names = [unique_name('user') for _ in range(5)]
+    rows = [{'username': name, 'password': 'pw-' + name} for name in names]
+    rows += [{'username': names[0], 'password': 'repeated'}, {'username': existing, 'password': 'new'}]
+
+    stats = import_users(db_session, rows, batch_size=3)
+
+    assert stats['rows'] == 7
+    assert stats['created'] == 5
+    assert stats['skipped'] == 2
+    assert stats['batches'] == 3
+    stored = passwords(db_session, names + [existing])
+    assert all(verify_password('pw-' + name, stored[name])[0] for name in names)
+    assert verify_password('old', stored[existing])[0]
+
+
+def test_import_users_rerun_creates_nothing(db_session):
+    rows = [{'username': unique_name('user'), 'password': 'pw'} for _ in range(4)]
+    import_users(db_session, rows, batch_size=2)
+    before = passwords(db_session, [row['username'] for row in rows])
+
+    stats = import_users(db_session, rows, batch_size=2)
+
+    assert stats['created'] == 0
+    assert stats['skipped'] == 4
+    assert passwords(db_session, before) == before
+
+
+def test_provision_users_script(db_session, tmp_path, monkeypatch):
+    names = [unique_name('partner') for _ in range(3)]
+    path = tmp_path / 'users.csv'
+    path.write_text('username,password\n' + ''.join('{0},pw\n'.format(name) for name in names), encoding='utf-8')
+    monkeypatch.setattr(sys, 'argv', ['provision_users.py', str(path), '--batch-size', '2'])
+
+    provision_users.main()
+    provision_users.main()
+
+    assert sorted(passwords(db_session, names)) == sorted(names)
@@ -0,0 +1,55 @@
+import time
+import uuid
+
+from db.models import UUID7Generator, uuid7
+
+
+def timestamp_ms(value: uuid.UUID) -> int:
+    return value.int >> 80
+
+
+def test_version_and_variant_bits():
+    for value in (uuid7() for _ in range(100)):
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+
+
+def test_timestamp_is_unix_milliseconds():
+    before = time.time_ns() // 1_000_000
+    value = uuid7()
+    after = time.time_ns() // 1_000_000
+
+    assert before <= timestamp_ms(value) <= after
+
+
+def test_values_strictly_increase():
+    values = [uuid7() for _ in range(10000)]
+
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    # Порядок байтов совпадает с порядком значений, поэтому индекс по uuid тоже упорядочен по времени
+    assert [value.bytes for value in values] == sorted(value.bytes for value in values)
+
+
+def test_counter_overflow_within_millisecond_keeps_order(monkeypatch):
+    generator = UUID7Generator()
+    monkeypatch.setattr(time, 'time_ns', lambda: 1_700_000_000_000 * 1_000_000)
+
+    values = [generator() for _ in range(5000)]
+
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    # 12-битного счетчика не хватает на 5000 значений: время уходит вперед, а не назад
+    assert timestamp_ms(values[0]) == 1_700_000_000_000
+    assert timestamp_ms(values[-1]) > 1_700_000_000_000
+
+
+def test_clock_going_backwards_keeps_order(monkeypatch):
+    generator = UUID7Generator()
+    now = [1_700_000_000_000 * 1_000_000]
+    monkeypatch.setattr(time, 'time_ns', lambda: now[0])
+    first = generator()
+
+    now[0] -= 5_000 * 1_000_000
+
+    assert generator() > first